@@ -1,21 +1,70 @@
 """Main Flask application"""
+import atexit
+import threading
 from flask import Flask, jsonify
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
 from utils.storage import StorageService
+from utils.json_codec import FastJSONProvider
+from utils.questionnaire_loader import get_questionnaire
+from utils import metrics
+from utils.sessions import sessions
 from routes.health import health_bp
 from routes.auth import auth_bp
 from routes.questionnaire import questionnaire_bp
 from routes.results import results_bp
+from routes.metrics import metrics_bp
+from services.analysis_jobs import analysis_jobs
+from services.llm_client import llm_clients
 
 app = Flask(__name__)
-CORS(app)  # Enable CORS for frontend communication
+app.json = FastJSONProvider(app)
+app.config['MAX_CONTENT_LENGTH'] = Config.MAX_REQUEST_BYTES
+if Config.TRUSTED_PROXIES > 0:
+    # Take the client address from the proxies' X-Forwarded-* headers (used for rate limits)
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=Config.TRUSTED_PROXIES,
+                            x_proto=Config.TRUSTED_PROXIES, x_host=Config.TRUSTED_PROXIES)
+CORS(app, expose_headers=['Retry-After'])  # Enable CORS for frontend communication
+metrics.init_app(app)  # Per-request timing (no-op when METRICS_ENABLED is off)
 
 # Register blueprints
 app.register_blueprint(health_bp)
 app.register_blueprint(auth_bp)
 app.register_blueprint(questionnaire_bp)
 app.register_blueprint(results_bp)
+app.register_blueprint(metrics_bp)
+
+_shutdown_lock = threading.Lock()
+_shut_down = False
+
+
+def on_startup():
+    """One-time process setup, run when the app is created"""
+    StorageService.ensure_directories()
+    # Compile the questionnaire once at startup instead of on the first request
+    get_questionnaire()
+    # Record analyses lost with a previous worker even if nobody polls them
+    analysis_jobs.start_recovery(Config.ANALYSIS_RECOVERY_INTERVAL)
+
+
+def on_shutdown():
+    """Finish queued work and flush in-memory state (safe to call more than once)"""
+    global _shut_down
+    with _shutdown_lock:
+        if _shut_down:
+            return
+        _shut_down = True
+    
+    # Running analyses still write results and statistics, so they go first
+    analysis_jobs.shutdown(wait=True)
+    StorageService.close()
+    llm_clients.close()
+    sessions.close()
+
+
+on_startup()
+atexit.register(on_shutdown)
 
 
 @app.errorhandler(404)
@@ -23,16 +72,18 @@ def not_found(error):
     return jsonify({'error': 'Endpoint not found'}), 404
 
 
+@app.errorhandler(413)
+def request_too_large(error):
+    return jsonify({'error': f'Request body too large (max {Config.MAX_REQUEST_BYTES} bytes)'}), 413
+
+
 @app.errorhandler(500)
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
 
 if __name__ == '__main__':
-    # Ensure data directories exist
-    StorageService.ensure_directories()
-    
-    # Run the application
+    # Development server; use wsgi.py with gunicorn in production
     app.run(
         host=Config.HOST,
         port=Config.PORT,
@@ -0,0 +1,131 @@
+"""
+JSON encoding benchmark
+
+Compares the previous encoding (Flask's default provider for responses,
+``json.dump(..., indent=2)`` for storage) with ``utils.json_codec`` on
+realistic submit and questionnaire payloads.
+
+Usage (from the backend directory):
+    python benchmarks/json_benchmark.py [--iterations N]
+    JSON_BACKEND=stdlib python benchmarks/json_benchmark.py   # codec without orjson
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from services.scoring_service import ScoringService
+from utils import json_codec
+from utils.json_codec import FastJSONProvider
+from utils.questionnaire_loader import get_questionnaire
+
+
+def build_payloads():
+    questionnaire = get_questionnaire()
+    rng = random.Random(42)
+    answers = {question['id']: rng.randint(1, 4) for question in questionnaire.questions}
+    scores = ScoringService.calculate_scores(answers, questionnaire.sections)
+    user = {'full_name': 'Jane Doe', 'email': 'jane@example.com', 'gender': 'Female', 'age_group': '26-35'}
+    llm_analysis = {
+        'driving_style': 'You are a confident driver with good vehicle control. '
+                         'Your reaction speed is above average, though spatial awareness could improve.',
+        'recommended_course': 'Advanced Spatial Awareness Course - focuses on mirror use, blind spots and lane positioning.'
+    }
+
+    submit_response = {
+        'user': user,
+        'scores': scores,
+        'analysis_id': 'a3f1c9e2-6b7d-4e5f-8a9b-0c1d2e3f4a5b',
+        'analysis_status': 'pending',
+        'completed_at': '2026-10-18T12:00:00.000000'
+    }
+    questionnaire_response = {
+        'questions': [dict(question) for question in questionnaire.questions],
+        'answers': questionnaire.answers,
+        'total_questions': questionnaire.total_questions
+    }
+    result_record = {
+        'id': 'a3f1c9e2-6b7d-4e5f-8a9b-0c1d2e3f4a5b',
+        'timestamp': '2026-10-18T12:00:00.000000',
+        'user': user,
+        'answers': answers,
+        'scores': scores,
+        'llm_analysis': llm_analysis
+    }
+    statistics = {
+        'total_started': 1200,
+        'total_completions': 1000,
+        'completion_rate': 83.33,
+        'average_scores': {name: 2.5 for name in scores},
+        'score_totals': {name: {'sum': 2500.0, 'count': 1000} for name in scores},
+        'driver_styles': {f'Style {i} ' + llm_analysis['driving_style']: i for i in range(20)},
+        'last_updated': '2026-10-18T12:00:00.000000'
+    }
+    return submit_response, questionnaire_response, result_record, statistics
+
+
+def per_call_us(func, iterations):
+    return min(timeit.repeat(func, number=iterations, repeat=5)) / iterations * 1e6
+
+
+def report(name, before, after):
+    print(f"{name:<34} {before:>9.1f} us {after:>9.1f} us {before / after:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark JSON encoding of API payloads')
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+    n = args.iterations
+
+    submit_response, questionnaire_response, result_record, statistics = build_payloads()
+
+    default_app = Flask('default')
+    default_app.json = DefaultJSONProvider(default_app)
+    fast_app = Flask('fast')
+    fast_app.json = FastJSONProvider(fast_app)
+
+    print(f"json_codec backend: {json_codec.BACKEND}\n")
+    print(f"{'':<34} {'before':>12} {'after':>12} {'speedup':>8}")
+
+    # Responses: full jsonify() round through a response object
+    with default_app.app_context():
+        submit_before = per_call_us(lambda: default_app.json.response(submit_response).get_data(), n)
+        questionnaire_before = per_call_us(lambda: default_app.json.response(questionnaire_response).get_data(), n)
+    with fast_app.app_context():
+        submit_after = per_call_us(lambda: fast_app.json.response(submit_response).get_data(), n)
+        questionnaire_after = per_call_us(lambda: fast_app.json.response(questionnaire_response).get_data(), n)
+    report('submit response', submit_before, submit_after)
+    report('questionnaire response', questionnaire_before, questionnaire_after)
+
+    # Storage: encode + write one file / line
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'out.json')
+
+        def write_indented(obj):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(obj, f, indent=2, ensure_ascii=False)
+
+        def write_compact(obj):
+            with open(path, 'wb') as f:
+                f.write(json_codec.dumps_bytes(obj))
+
+        report('result record write', per_call_us(lambda: write_indented(result_record), n),
+               per_call_us(lambda: write_compact(result_record), n))
+        report('statistics snapshot write', per_call_us(lambda: write_indented(statistics), n),
+               per_call_us(lambda: write_compact(statistics), n))
+
+    indented = len(json.dumps(result_record, indent=2, ensure_ascii=False).encode('utf-8'))
+    compact = len(json_codec.dumps_bytes(result_record))
+    print(f"\nresult record size: {indented} bytes indented, {compact} bytes compact")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,411 @@
+"""
+End-to-end load test of the API with a stubbed LLM
+
+Each virtual user runs the full client flow:
+
+    register -> questionnaire -> save-progress (xN, delta mode) -> submit
+    -> analysis (long poll) -> statistics
+
+and the run reports throughput and p50/p95/p99 latency per endpoint. After the
+run, the ``total_started`` / ``total_completions`` counters are checked
+against the number of users, through the API and in the flushed
+``statistics.json``, to catch lost updates.
+
+By default the app runs in-process (Flask test client, data in a temporary
+directory, LLM replaced by a local stub server). ``--url`` targets a running
+server instead; start that server with ``OPENAI_BASE_URL`` pointing at
+``python benchmarks/load_test.py --stub-only`` and with
+``RATE_LIMIT_REGISTER_PER_MINUTE=0`` (every virtual user registers from the
+same address, so the per-IP register limit would reject most of them).
+
+Usage (from the backend directory):
+    python benchmarks/load_test.py --users 200 --concurrency 16
+    python benchmarks/load_test.py --save-baseline benchmarks/baseline.json
+    python benchmarks/load_test.py --baseline benchmarks/baseline.json   # exit 1 on regression
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+# --- Stub LLM ----------------------------------------------------------------
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """Minimal chat completions endpoint returning a fixed analysis"""
+
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        content = json.dumps({
+            'driving_style': 'Load test driving style.',
+            'recommended_course': 'Load test course'
+        })
+        if body.get('stream'):
+            self._stream(body, content)
+            return
+        if self.latency:
+            time.sleep(self.latency)
+        payload = json.dumps({
+            'id': 'load-test', 'object': 'chat.completion', 'created': 0, 'model': body['model'],
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content},
+                         'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, body: dict, content: str):
+        # Chunks spread evenly over ``latency``, like tokens being generated
+        pieces = [content[i:i + 8] for i in range(0, len(content), 8)]
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        for piece in pieces:
+            if self.latency:
+                time.sleep(self.latency / len(pieces))
+            chunk = {
+                'id': 'load-test', 'object': 'chat.completion.chunk', 'created': 0, 'model': body['model'],
+                'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]
+            }
+            self.wfile.write(b'data: ' + json.dumps(chunk).encode('utf-8') + b'\n\n')
+            self.wfile.flush()
+        self.wfile.write(b'data: [DONE]\n\n')
+        self.close_connection = True
+
+
+def start_stub_llm(port: int, latency: float) -> Tuple[ThreadingHTTPServer, str]:
+    handler = type('Handler', (StubLLMHandler,), {'latency': latency})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='stub-llm', daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/v1'
+
+
+# --- Clients -----------------------------------------------------------------
+
+class InProcessClient:
+    """Flask test client (one per thread)"""
+
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method: str, path: str, payload: Optional[dict] = None) -> Tuple[int, Any]:
+        response = self._client.open(path, method=method, json=payload)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HTTPClient:
+    """Keep-alive HTTP connection to a running server (one per thread)"""
+
+    def __init__(self, url: str):
+        parsed = urlparse(url)
+        self._host, self._port = parsed.hostname, parsed.port or 80
+        self._conn = http.client.HTTPConnection(self._host, self._port, timeout=60)
+
+    def request(self, method: str, path: str, payload: Optional[dict] = None) -> Tuple[int, Any]:
+        body = json.dumps(payload) if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        try:
+            self._conn.request(method, path, body, headers)
+            response = self._conn.getresponse()
+        except (http.client.HTTPException, OSError):
+            # Server closed the keep-alive connection: reconnect once
+            self._conn.close()
+            self._conn = http.client.HTTPConnection(self._host, self._port, timeout=60)
+            self._conn.request(method, path, body, headers)
+            response = self._conn.getresponse()
+        data = response.read()
+        try:
+            return response.status, json.loads(data) if data else None
+        except ValueError:
+            return response.status, None
+
+
+# --- Load test ---------------------------------------------------------------
+
+class LoadTest:
+    """Runs virtual users and records latency per endpoint"""
+
+    def __init__(self, make_client, users: int, concurrency: int, saves: int, seed: int):
+        self.make_client = make_client
+        self.users = users
+        self.concurrency = concurrency
+        self.saves = saves
+        self.seed = seed
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.failed_users = 0
+
+    def _client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.make_client()
+        return client
+
+    def _call(self, name: str, method: str, path: str, payload: Optional[dict] = None,
+              expected: Tuple[int, ...] = (200,)) -> Any:
+        start = time.perf_counter()
+        status, data = self._client().request(method, path, payload)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.latencies[name].append(elapsed)
+            if status not in expected:
+                self.errors[name] += 1
+        if status not in expected:
+            raise RuntimeError(f"{name}: HTTP {status} {data}")
+        return data
+
+    def run_user(self, index: int):
+        rng = random.Random(self.seed * 100003 + index)
+        try:
+            session_id = self._call('register', 'POST', '/api/register', {
+                'full_name': f'Load Test {index}',
+                'email': f'load{index}@example.com',
+                'gender': rng.choice(['Male', 'Female']),
+                'age_group': rng.choice(['18-25', '26-35', '36-45', '46-55', '56+'])
+            }, expected=(201,))['session_id']
+
+            questions = self._call('questionnaire', 'GET',
+                                   f'/api/questionnaire?session_id={session_id}')['questions']
+            answers = {question['id']: rng.randint(1, 4) for question in questions}
+
+            # Save progress in roughly even chunks, like a client saving as it goes
+            ids = list(answers)
+            version = 0
+            chunk = max(1, -(-len(ids) // max(self.saves, 1)))
+            for i in range(self.saves):
+                delta = {q_id: answers[q_id] for q_id in ids[i * chunk:(i + 1) * chunk]}
+                version = self._call('save-progress', 'POST', '/api/save-progress', {
+                    'session_id': session_id,
+                    'answers_delta': delta,
+                    'version': version,
+                    'current_question_index': min((i + 1) * chunk, len(ids))
+                })['version']
+
+            self._call('submit', 'POST', '/api/submit',
+                       {'session_id': session_id, 'answers': answers}, expected=(200, 202))
+            analysis = self._call('analysis', 'GET', f'/api/analysis/{session_id}?wait=30')
+            if analysis.get('status') != 'complete':
+                raise RuntimeError(f"analysis still {analysis.get('status')}")
+
+            self._call('statistics', 'GET', '/api/statistics')
+        except Exception as e:
+            with self._lock:
+                self.failed_users += 1
+            print(f"user {index} failed: {e}")
+
+    def run(self) -> float:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(self.run_user, range(self.users)))
+        return time.perf_counter() - start
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-int(pct * len(sorted_values)) // 100))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(test: LoadTest, elapsed: float) -> Dict[str, Any]:
+    endpoints = {}
+    for name, values in test.latencies.items():
+        values = sorted(values)
+        endpoints[name] = {
+            'requests': len(values),
+            'errors': test.errors.get(name, 0),
+            'p50_ms': round(percentile(values, 50) * 1000, 2),
+            'p95_ms': round(percentile(values, 95) * 1000, 2),
+            'p99_ms': round(percentile(values, 99) * 1000, 2)
+        }
+    total = sum(e['requests'] for e in endpoints.values())
+    return {
+        'elapsed_seconds': round(elapsed, 2),
+        'requests': total,
+        'throughput_rps': round(total / elapsed, 1) if elapsed else 0,
+        'users_per_second': round(test.users / elapsed, 2) if elapsed else 0,
+        'failed_users': test.failed_users,
+        'endpoints': endpoints
+    }
+
+
+def print_summary(summary: Dict[str, Any]):
+    print(f"\n{summary['requests']} requests in {summary['elapsed_seconds']}s: "
+          f"{summary['throughput_rps']} req/s, {summary['users_per_second']} users/s, "
+          f"{summary['failed_users']} failed users\n")
+    print(f"{'endpoint':<15} {'requests':>9} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, e in summary['endpoints'].items():
+        print(f"{name:<15} {e['requests']:>9} {e['errors']:>7} "
+              f"{e['p50_ms']:>9.2f} {e['p95_ms']:>9.2f} {e['p99_ms']:>9.2f}")
+
+
+def compare_to_baseline(summary: Dict[str, Any], baseline: Dict[str, Any], tolerance: float,
+                        min_delta_ms: float) -> List[str]:
+    """
+    Return regressions relative to the baseline
+
+    Throughput, errors and p50 latency are gated; p95/p99 are reported only,
+    as background analysis threads make the tail too noisy to gate on. A p50
+    counts as regressed when it is more than ``tolerance`` (fraction) and more
+    than ``min_delta_ms`` above the baseline.
+    """
+    regressions = []
+    allowed = 1 + tolerance
+    if summary['throughput_rps'] * allowed < baseline['throughput_rps']:
+        regressions.append(f"throughput {summary['throughput_rps']} req/s < baseline {baseline['throughput_rps']}")
+    for name, base in baseline['endpoints'].items():
+        current = summary['endpoints'].get(name)
+        if current is None:
+            regressions.append(f"{name}: missing from this run")
+            continue
+        if current['errors'] > base['errors']:
+            regressions.append(f"{name}: {current['errors']} errors (baseline {base['errors']})")
+        if current['p50_ms'] > base['p50_ms'] * allowed and current['p50_ms'] - base['p50_ms'] > min_delta_ms:
+            regressions.append(f"{name}: p50_ms {current['p50_ms']} > baseline {base['p50_ms']}")
+    return regressions
+
+
+def isolate_data_dir(directory: str):
+    """Point every data file and directory in Config into ``directory``"""
+    from config import Config
+    shutil.copy(Config.QUESTIONNAIRE_PATH, directory)
+    data_dir = Config.DATA_DIR
+    for name in list(vars(Config)):
+        value = getattr(Config, name)
+        if (name.endswith('_PATH') or name.endswith('_DIR') or name.endswith('_CHECKPOINT')) \
+                and isinstance(value, str) and value.startswith(data_dir):
+            setattr(Config, name, os.path.join(directory, os.path.relpath(value, data_dir)))
+    Config.DATA_DIR = directory
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end API load test with a stubbed LLM')
+    parser.add_argument('--users', type=int, default=200, help='virtual users (full flows)')
+    parser.add_argument('--concurrency', type=int, default=16, help='users running at once')
+    parser.add_argument('--saves', type=int, default=8, help='save-progress calls per user')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--llm-latency', type=float, default=0.05, help='stub LLM response time (s)')
+    parser.add_argument('--llm-cache', action='store_true', help='keep the LLM analysis cache enabled')
+    parser.add_argument('--url', help='target a running server instead of the in-process app')
+    parser.add_argument('--stub-only', action='store_true', help='only run the stub LLM (for --url targets)')
+    parser.add_argument('--stub-port', type=int, default=0)
+    parser.add_argument('--save-baseline', metavar='PATH', help='write the results as a baseline')
+    parser.add_argument('--baseline', metavar='PATH', help='compare against a baseline; exit 1 on regression')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed regression (fraction)')
+    parser.add_argument('--min-delta-ms', type=float, default=2.0,
+                        help='ignore p50 increases smaller than this')
+    args = parser.parse_args()
+
+    stub, stub_url = start_stub_llm(args.stub_port, args.llm_latency)
+    if args.stub_only:
+        print(f"Stub LLM listening; start the server with OPENAI_BASE_URL={stub_url} "
+              f"RATE_LIMIT_REGISTER_PER_MINUTE=0")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            return
+
+    data_dir = None
+    app_module = None
+    if args.url:
+        make_client = lambda: HTTPClient(args.url)
+        print("Note: all users register from this machine's address; run the server with "
+              "RATE_LIMIT_REGISTER_PER_MINUTE=0 (or above the user count) or registrations get 429")
+    else:
+        data_dir = tempfile.mkdtemp(prefix='load-test-')
+        isolate_data_dir(data_dir)
+        from config import Config
+        Config.OPENAI_API_KEY = 'load-test'
+        Config.OPENAI_BASE_URL = stub_url
+        Config.LLM_CACHE_ENABLED = args.llm_cache
+        # Every virtual user registers from the same address
+        Config.RATE_LIMIT_REGISTER_PER_MINUTE = 0
+        import app as app_module
+        make_client = lambda: InProcessClient(app_module.app)
+
+    before = make_client().request('GET', '/api/statistics')[1]
+    test = LoadTest(make_client, args.users, args.concurrency, args.saves, args.seed)
+    print(f"Running {args.users} users, concurrency {args.concurrency}, {args.saves} saves each "
+          f"({'in-process' if not args.url else args.url})")
+    elapsed = test.run()
+    summary = summarize(test, elapsed)
+    after = make_client().request('GET', '/api/statistics')[1]
+
+    # Lost-update checks: every started and completed flow must be counted exactly once
+    completed = args.users - test.failed_users
+    problems = []
+    for counter, expected in (('total_started', args.users), ('total_completions', completed)):
+        delta = after[counter] - before[counter]
+        if delta != expected:
+            problems.append(f"{counter} via API grew by {delta}, expected {expected}")
+    if app_module is not None:
+        app_module.on_shutdown()
+        with open(app_module.Config.STATISTICS_PATH, 'rb') as f:
+            snapshot = json.loads(f.read())
+        for counter in ('total_started', 'total_completions'):
+            if snapshot[counter] != after[counter]:
+                problems.append(f"statistics.json {counter}={snapshot[counter]}, API reported {after[counter]}")
+        shutil.rmtree(data_dir, ignore_errors=True)
+    stub.shutdown()
+
+    summary['config'] = {
+        'users': args.users, 'concurrency': args.concurrency, 'saves': args.saves,
+        'llm_latency': args.llm_latency, 'llm_cache': args.llm_cache,
+        'target': args.url or 'in-process'
+    }
+    summary['lost_updates'] = problems
+    print_summary(summary)
+    print(f"\nLost-update check: {'OK' if not problems else 'FAILED'}")
+    for problem in problems:
+        print(f"  {problem}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+            f.write('\n')
+        print(f"\nBaseline written to {args.save_baseline}")
+
+    exit_code = 1 if problems or test.failed_users else 0
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(summary, baseline, args.tolerance, args.min_delta_ms)
+        print(f"\nBaseline comparison ({args.baseline}, tolerance {args.tolerance:.0%}): "
+              f"{'OK' if not regressions else 'REGRESSED'}")
+        for regression in regressions:
+            print(f"  {regression}")
+        if regressions:
+            exit_code = 1
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
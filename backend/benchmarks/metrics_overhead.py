@@ -0,0 +1,47 @@
+"""
+Cost of the metrics instrumentation
+
+Times a bare request round trip through the Flask test client, and the
+span / histogram / counter primitives on their own. Run it once with the
+default settings and once with METRICS_ENABLED=False to compare.
+
+Usage (from the backend directory):
+    python benchmarks/metrics_overhead.py
+    METRICS_ENABLED=False python benchmarks/metrics_overhead.py
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import metrics
+
+
+def per_call_us(func, iterations):
+    return min(timeit.repeat(func, number=iterations, repeat=5)) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure metrics instrumentation overhead')
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+    n = args.iterations
+
+    from app import app
+    client = app.test_client()
+
+    def timed_span():
+        with metrics.span('benchmark'):
+            pass
+
+    print(f"metrics enabled: {metrics.ENABLED}\n")
+    print(f"{'span()':<32} {per_call_us(timed_span, n):>8.2f} us")
+    print(f"{'Histogram.observe':<32} {per_call_us(lambda: metrics.STAGE_DURATION.observe(0.001, 'benchmark'), n):>8.2f} us")
+    print(f"{'Counter.inc':<32} {per_call_us(lambda: metrics.LLM_FALLBACKS.inc('benchmark'), n):>8.2f} us")
+    print(f"{'GET /api/analysis/<id> (404)':<32} {per_call_us(lambda: client.get('/api/analysis/unknown'), n // 10):>8.2f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""
+Health latency and shedding while streaming submits flood the server
+
+The app is served from a fixed pool of ``--threads`` request threads, like a
+gunicorn gthread worker. ``--clients`` users register and submit through
+``/api/submit/stream`` in a loop against a stub LLM that takes
+``--llm-latency`` seconds, while a probe times ``GET /api/health``. The run is
+repeated with admission control as configured and with the limits lifted, and
+reports health latency, peak concurrent LLM calls and how streams ended
+('queued' when a stream was refused and the analysis went to the background
+queue instead; those clients poll ``GET /api/analysis/<id>`` every
+``POLL_INTERVAL`` seconds until it is done, then note whether it was the fallback).
+
+Usage (from the backend directory):
+    python benchmarks/overload.py --clients 32 --threads 8 --seconds 10
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+from statistics import median
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import StubLLMHandler, isolate_data_dir  # noqa: E402
+
+POLL_INTERVAL = 0.5
+STUB_DRIVING_STYLE = 'Load test driving style.'
+
+
+class CountingStub(StubLLMHandler):
+    """Stub LLM that records the peak number of concurrent calls"""
+
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+
+    def do_POST(self):
+        cls = CountingStub
+        with cls.lock:
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        try:
+            super().do_POST()
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+
+def pooled_server(app, threads: int):
+    """Werkzeug server handling connections on a fixed thread pool"""
+    from werkzeug.serving import BaseWSGIServer
+
+    class PooledWSGIServer(BaseWSGIServer):
+        def __init__(self):
+            super().__init__('127.0.0.1', 0, app)
+            self.pool = ThreadPoolExecutor(threads, thread_name_prefix='request')
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    return PooledWSGIServer()
+
+
+def call(port: int, method: str, path: str, payload=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    try:
+        body = json.dumps(payload) if payload is not None else None
+        conn.request(method, path, body, {'Content-Type': 'application/json'} if body else {})
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def stream_user(port: int, index: int, question_ids, rng) -> str:
+    status, body = call(port, 'POST', '/api/register', {
+        'full_name': f'Overload {index}', 'email': f'overload{index}@example.com',
+        'gender': 'Female', 'age_group': '26-35'
+    })
+    if status != 201:
+        return f'register {status}'
+    session_id = json.loads(body)['session_id']
+    status, body = call(port, 'POST', '/api/submit/stream', {
+        'session_id': session_id, 'answers': {q_id: rng.randint(1, 4) for q_id in question_ids}
+    })
+    if status == 202:
+        analysis_id = json.loads(body)['analysis_id']
+        while True:
+            time.sleep(POLL_INTERVAL)
+            status, body = call(port, 'GET', f'/api/analysis/{analysis_id}')
+            if status != 200:
+                return f'queued, HTTP {status}'
+            analysis = json.loads(body)
+            if analysis['status'] != 'pending':
+                break
+        from_stub = analysis['llm_analysis']['driving_style'] == STUB_DRIVING_STYLE
+        return 'queued llm' if from_stub else 'queued fallback'
+    if status != 200:
+        return f'HTTP {status}'
+    for line in body.split(b'\n'):
+        if line.startswith(b'data: ') and b'"fallback"' in line:
+            return 'fallback' if json.loads(line[6:])['fallback'] else 'llm'
+    return 'no analysis'
+
+
+def run(port: int, clients: int, seconds: float, question_ids):
+    CountingStub.peak = 0
+    outcomes = Counter()
+    health = []
+    deadline = time.monotonic() + seconds
+    counter = iter(range(10 ** 9))
+    lock = threading.Lock()
+
+    def client(worker):
+        rng = random.Random(worker)
+        while time.monotonic() < deadline:
+            with lock:
+                index = next(counter)
+            outcome = stream_user(port, index, question_ids, rng)
+            with lock:
+                outcomes[outcome] += 1
+
+    def probe():
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            call(port, 'GET', '/api/health')
+            health.append(time.perf_counter() - start)
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    threads.append(threading.Thread(target=probe))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    health.sort()
+    return outcomes, health
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Health latency under a streaming submit flood')
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--threads', type=int, default=8, help='request threads (gunicorn THREADS)')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--llm-latency', type=float, default=2.0)
+    args = parser.parse_args()
+
+    stub = ThreadingHTTPServer(('127.0.0.1', 0), type('Handler', (CountingStub,), {'latency': args.llm_latency}))
+    stub.daemon_threads = True
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+    data_dir = tempfile.mkdtemp(prefix='overload-')
+    isolate_data_dir(data_dir)
+    from config import Config
+    Config.OPENAI_API_KEY = 'overload'
+    Config.OPENAI_BASE_URL = f'http://127.0.0.1:{stub.server_address[1]}/v1'
+    Config.LLM_CACHE_ENABLED = False
+    Config.LLM_LATENCY_BUDGET_SECONDS = Config.LLM_TIMEOUT_SECONDS = args.llm_latency + 10
+    Config.LLM_MAX_CONNECTIONS = args.clients
+    # Every simulated user registers from the same address
+    Config.RATE_LIMIT_REGISTER_PER_MINUTE = 0
+
+    import app as app_module
+    from utils import admission
+    from utils.questionnaire_loader import get_questionnaire
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = pooled_server(app_module.app, args.threads)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    question_ids = get_questionnaire().question_ids
+
+    print(f"{args.clients} streaming clients, {args.threads} request threads, "
+          f"LLM latency {args.llm_latency}s, {args.seconds}s per run\n")
+    print(f"{'admission':<10} {'health p50 ms':>14} {'p95 ms':>9} {'max ms':>9} {'peak LLM':>9}  outcomes")
+    limit = admission.stream_slots.limit
+    try:
+        for name, stream_limit in (('on', limit), ('off', 10 ** 6)):
+            admission.stream_slots.limit = stream_limit
+            outcomes, health = run(server.server_port, args.clients, args.seconds, question_ids)
+            p95 = health[min(len(health) - 1, int(len(health) * 0.95))]
+            print(f"{name:<10} {median(health) * 1000:>14.1f} {p95 * 1000:>9.1f} {health[-1] * 1000:>9.1f} "
+                  f"{CountingStub.peak:>9}  {dict(outcomes)}")
+    finally:
+        admission.stream_slots.limit = limit
+        server.shutdown()
+        app_module.on_shutdown()
+        stub.shutdown()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
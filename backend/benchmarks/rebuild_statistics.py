@@ -0,0 +1,101 @@
+"""
+Throughput and correctness of the offline statistics rebuild
+
+Writes a synthetic archive of ``--results`` results through ``ResultsLog``
+(plus a few legacy per-result JSON files and update records) into a
+temporary directory, while feeding the same results to a
+``StatisticsAggregator`` as the live path would. It then rebuilds with each
+``--workers`` count, checks that every rebuild matches the live statistics,
+and reports throughput.
+
+Usage (from the backend directory):
+    python benchmarks/rebuild_statistics.py --results 200000 --workers 1 2 4
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.scoring_service import ScoringService
+from services.statistics_rebuild import rebuild
+from utils import json_codec
+from utils.questionnaire_loader import get_questionnaire
+from utils.results_store import ResultsLog
+from utils.statistics import StatisticsAggregator
+
+COMPARED = ('total_completions', 'average_scores', 'score_totals', 'score_histograms', 'driver_styles')
+
+
+def comparable(stats):
+    # The live aggregator sums floats; the rebuild sums exact hundredths
+    stats = {key: stats[key] for key in COMPARED}
+    stats['score_totals'] = {domain: {'sum': round(total['sum'], 2), 'count': total['count']}
+                             for domain, total in stats['score_totals'].items()}
+    return stats
+
+
+def build_archive(directory: str, results: int, seed: int) -> StatisticsAggregator:
+    rng = random.Random(seed)
+    questionnaire = get_questionnaire()
+    question_ids = questionnaire.question_ids
+    live = StatisticsAggregator(os.path.join(directory, 'live-statistics.json'), 10 ** 9, 10 ** 9)
+    log = ResultsLog(directory, 16 * 1024 * 1024, 10 ** 6, 10 ** 6)
+    user = {'full_name': 'Rebuild Test', 'email': 'rebuild@example.com',
+            'gender': 'Female', 'age_group': '26-35'}
+    analysis = {'driving_style': 'Synthetic style.', 'recommended_course': 'Synthetic course'}
+
+    batch = 1000
+    for offset in range(0, results, batch):
+        answer_sets = [{q_id: rng.randint(1, 4) for q_id in question_ids}
+                       for _ in range(min(batch, results - offset))]
+        for index, (answers, scores) in enumerate(zip(answer_sets, ScoringService.calculate_scores_batch(answer_sets))):
+            record = {'user': user, 'scores': scores, 'llm_analysis': analysis, 'answers': answers}
+            if offset + index < 20:
+                # A few results in the legacy one-file-per-result layout
+                with open(os.path.join(directory, f'legacy-{offset + index}.json'), 'wb') as f:
+                    f.write(json_codec.dumps_bytes(record))
+            else:
+                result_id = log.append(record)
+                if rng.random() < 0.01:
+                    log.append_update(result_id, {'llm_analysis': analysis})
+            live.record_completion({name: data['score'] for name, data in scores.items()},
+                                   ScoringService.style_class(scores))
+    log.close()
+    return live
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the offline statistics rebuild')
+    parser.add_argument('--results', type=int, default=100000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    parser.add_argument('--chunk-mb', type=float, default=8)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='rebuild-statistics-')
+    try:
+        start = time.perf_counter()
+        live = build_archive(directory, args.results, args.seed)
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+                   if name.endswith('.json') or name.endswith('.jsonl'))
+        print(f"Archive: {args.results} results, {size / 1e6:.0f} MB "
+              f"(written in {time.perf_counter() - start:.1f}s); {os.cpu_count()} CPU(s)\n")
+
+        expected = comparable(live.snapshot())
+        print(f"{'workers':>7} {'seconds':>9} {'results/s':>11} {'MB/s':>7}  matches live")
+        for workers in args.workers:
+            total, elapsed = rebuild(directory, workers, int(args.chunk_mb * 1024 * 1024))
+            matches = comparable(total.snapshot(0)) == expected
+            print(f"{workers:>7} {elapsed:>9.2f} {total.completions / elapsed:>11,.0f} "
+                  f"{total.bytes_read / 1e6 / elapsed:>7.1f}  {'yes' if matches else 'NO'}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Memory footprint per session
+
+Stores N sessions in three states (just registered, half answered, completed
+with an analysis) and measures the allocated memory with tracemalloc, once as
+plain dicts (the previous in-memory representation) and once through
+MemorySessionStore's compact records.
+
+Usage (from the backend directory):
+    python benchmarks/session_memory.py [--sessions N]
+"""
+import argparse
+import copy
+import os
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import json_codec
+from utils.questionnaire_loader import get_questionnaire
+from utils.sessions import MemorySessionStore
+
+
+def make_session(index: int, state: str, rng: random.Random) -> dict:
+    questionnaire = get_questionnaire()
+    now = datetime.now().isoformat()
+    session = {
+        'user': {'full_name': f'Driver {index}', 'email': f'driver{index}@example.com',
+                 'gender': 'Female', 'age_group': '26-35'},
+        'created_at': now,
+        'answers': {},
+        'current_question_index': 0,
+        'version': 0,
+        'completed': False,
+        'question_order': questionnaire.shuffled_order(str(index)),
+        'question_order_hash': questionnaire.content_hash
+    }
+    if state == 'registered':
+        return session
+
+    answered = questionnaire.question_ids if state == 'completed' else questionnaire.question_ids[:20]
+    session['answers'] = {q_id: rng.randint(1, 4) for q_id in answered}
+    session['current_question_index'] = len(answered)
+    session['version'] = 5
+    session['last_saved'] = now
+    if state == 'completed':
+        session['completed'] = True
+        session['completed_at'] = now
+        session['analysis'] = {
+            'status': 'complete',
+            'llm_analysis': {
+                'driving_style': 'You are a confident driver with good vehicle control. '
+                                 'Your reaction speed is above average, though spatial awareness could improve.',
+                'recommended_course': 'Advanced Spatial Awareness Course - mirror use, blind spots and lane positioning.'
+            },
+            'result_id': str(uuid.uuid4()),
+            'completed_at': now
+        }
+    return session
+
+
+def measure(store_factory, sessions) -> int:
+    """Memory retained by a store holding ``sessions`` (session_id, JSON bytes)"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = store_factory()
+    for session_id, payload in sessions:
+        # Fresh objects per session, as when parsed from a request
+        store.set(session_id, json_codec.loads(payload))
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used
+
+
+class DictStore:
+    """The previous representation: (last_access, deep-copied dict) per session"""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+
+    def set(self, session_id, data):
+        self._entries[session_id] = (time.time(), copy.deepcopy(data))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure per-session memory')
+    parser.add_argument('--sessions', type=int, default=5000)
+    args = parser.parse_args()
+
+    get_questionnaire()
+    rng = random.Random(7)
+    print(f"{'state':<12} {'dict bytes':>11} {'compact bytes':>14} {'saved':>7}")
+    for state in ('registered', 'in_progress', 'completed'):
+        sessions = [(str(uuid.uuid4()), json_codec.dumps_bytes(make_session(i, state, rng)))
+                    for i in range(args.sessions)]
+        before = measure(DictStore, sessions) / args.sessions
+        after = measure(lambda: MemorySessionStore(3600, 10 ** 9, 3600, 3600), sessions) / args.sessions
+        print(f"{state:<12} {before:>11.0f} {after:>14.0f} {1 - after / before:>7.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Time to first byte and to the analysis: polling submit vs. streaming submit
+
+Runs the app on a local threaded server (data in a temporary directory, LLM
+replaced by the load test's stub, which spreads its completion over
+``--llm-latency`` seconds) and, for each submission, measures:
+
+- submit + poll:  POST /api/submit, then GET /api/analysis/<id>?wait=30
+- stream:         POST /api/submit/stream, timing the first byte (scores
+                  event), the first token and the final analysis event
+
+Usage (from the backend directory):
+    python benchmarks/stream_latency.py --runs 20 --llm-latency 2
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from statistics import median
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load_test import isolate_data_dir, start_stub_llm
+
+
+def request(conn, method, path, payload=None):
+    body = json.dumps(payload) if payload is not None else None
+    conn.request(method, path, body, {'Content-Type': 'application/json'} if body else {})
+    response = conn.getresponse()
+    return response.status, json.loads(response.read() or b'null')
+
+
+def new_submission(conn, index, rng):
+    status, data = request(conn, 'POST', '/api/register', {
+        'full_name': f'Stream Test {index}',
+        'email': f'stream{index}@example.com',
+        'gender': 'Female',
+        'age_group': '26-35'
+    })
+    session_id = data['session_id']
+    questions = request(conn, 'GET', f'/api/questionnaire?session_id={session_id}')[1]['questions']
+    # Distinct answers per run so the LLM cache (if enabled) never answers
+    return {'session_id': session_id,
+            'answers': {question['id']: rng.randint(1, 4) for question in questions}}
+
+
+def time_polling(conn, payload):
+    start = time.perf_counter()
+    status, data = request(conn, 'POST', '/api/submit', payload)
+    first_byte = time.perf_counter() - start
+    assert status == 202, data
+    status, analysis = request(conn, 'GET', f"/api/analysis/{payload['session_id']}?wait=30")
+    assert analysis['status'] == 'complete', analysis
+    done = time.perf_counter() - start
+    return first_byte, done, done
+
+
+def time_streaming(conn, payload):
+    start = time.perf_counter()
+    conn.request('POST', '/api/submit/stream', json.dumps(payload), {'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    assert response.status == 200, response.read()
+    first_byte = first_token = analysis = None
+    events = []
+    while True:
+        line = response.fp.readline()
+        if not line:
+            break
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+        line = line.rstrip(b'\r\n')
+        if line.startswith(b'event: '):
+            event = line[7:].decode()
+            events.append(event)
+            if event == 'token' and first_token is None:
+                first_token = time.perf_counter() - start
+            elif event == 'analysis':
+                analysis = time.perf_counter() - start
+    assert events[0] == 'scores' and events[-1] == 'saved', events
+    return first_byte, first_token or analysis, analysis
+
+
+def report(name, samples):
+    columns = zip(*samples)
+    first_byte, first_text, done = (median(column) * 1000 for column in columns)
+    print(f"{name:<16} {first_byte:>12.1f} {first_text:>16.1f} {done:>14.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare submit + poll with streaming submit')
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--llm-latency', type=float, default=2.0, help='stub LLM generation time (s)')
+    args = parser.parse_args()
+
+    stub, stub_url = start_stub_llm(0, args.llm_latency)
+    data_dir = tempfile.mkdtemp(prefix='stream-latency-')
+    isolate_data_dir(data_dir)
+    from config import Config
+    Config.OPENAI_API_KEY = 'stream-latency'
+    Config.OPENAI_BASE_URL = stub_url
+    Config.LLM_CACHE_ENABLED = False
+    # Every virtual user registers from the same address
+    Config.RATE_LIMIT_REGISTER_PER_MINUTE = 0
+    Config.LLM_LATENCY_BUDGET_SECONDS = Config.LLM_TIMEOUT_SECONDS = args.llm_latency + 10
+
+    import app as app_module
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    rng = random.Random(1)
+    polling, streaming = [], []
+    try:
+        for i in range(args.runs):
+            conn = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=60)
+            polling.append(time_polling(conn, new_submission(conn, 2 * i, rng)))
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=60)
+            streaming.append(time_streaming(conn, new_submission(conn, 2 * i + 1, rng)))
+            conn.close()
+    finally:
+        server.shutdown()
+        app_module.on_shutdown()
+        stub.shutdown()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    print(f"{args.runs} runs, stub LLM generating for {args.llm_latency}s (median ms)\n")
+    print(f"{'flow':<16} {'first byte':>12} {'first text':>16} {'final':>14}")
+    report('submit + poll', polling)
+    report('stream', streaming)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,22 +8,127 @@ class Config:
     
     # Flask settings
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
-    DEBUG = os.getenv('FLASK_DEBUG', 'True') == 'True'
+    DEBUG = os.getenv('FLASK_DEBUG', 'False') == 'True'
     
     # OpenAI settings
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+    OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL') or None
+    
+    # Shared LLM HTTP connection pool and retry policy
+    LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', 30))
+    LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv('LLM_CONNECT_TIMEOUT_SECONDS', 5))
+    LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', 20))
+    LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('LLM_MAX_KEEPALIVE_CONNECTIONS', 10))
+    LLM_KEEPALIVE_EXPIRY = float(os.getenv('LLM_KEEPALIVE_EXPIRY', 60))
+    LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 2))
+    LLM_RETRY_BACKOFF_BASE = float(os.getenv('LLM_RETRY_BACKOFF_BASE', 0.5))
+    LLM_RETRY_BACKOFF_MAX = float(os.getenv('LLM_RETRY_BACKOFF_MAX', 8))
+    
+    # LLM latency budget (all attempts of one analysis) and circuit breaker
+    LLM_LATENCY_BUDGET_SECONDS = float(os.getenv('LLM_LATENCY_BUDGET_SECONDS', 10))
+    LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv('LLM_BREAKER_FAILURE_THRESHOLD', 5))
+    LLM_BREAKER_RESET_SECONDS = float(os.getenv('LLM_BREAKER_RESET_SECONDS', 30))
+    
+    # Largest accepted request body; bigger bodies get 413 before they are read or parsed
+    MAX_REQUEST_BYTES = int(os.getenv('MAX_REQUEST_BYTES', 64 * 1024))
+    
+    # Admission control (per process) for streaming submits: concurrent streams, bounded
+    # wait queue and queue timeout. Streams (and their waiters) hold a thread for the whole
+    # LLM call, so keep STREAM_MAX_CONCURRENT + STREAM_MAX_QUEUE well below THREADS. Shed
+    # streams are answered like /api/submit (202, analysis queued in the background).
+    STREAM_MAX_CONCURRENT = int(os.getenv('STREAM_MAX_CONCURRENT', 2))
+    STREAM_MAX_QUEUE = int(os.getenv('STREAM_MAX_QUEUE', 0))
+    STREAM_QUEUE_TIMEOUT = float(os.getenv('STREAM_QUEUE_TIMEOUT', 0))
+    
+    # Token-bucket rate limits: requests per minute and burst (0 per minute disables).
+    # Register is keyed by client IP, save-progress and submit by session ID.
+    RATE_LIMIT_REGISTER_PER_MINUTE = float(os.getenv('RATE_LIMIT_REGISTER_PER_MINUTE', 20))
+    RATE_LIMIT_REGISTER_BURST = int(os.getenv('RATE_LIMIT_REGISTER_BURST', 10))
+    RATE_LIMIT_PROGRESS_PER_MINUTE = float(os.getenv('RATE_LIMIT_PROGRESS_PER_MINUTE', 120))
+    RATE_LIMIT_PROGRESS_BURST = int(os.getenv('RATE_LIMIT_PROGRESS_BURST', 30))
+    RATE_LIMIT_SUBMIT_PER_MINUTE = float(os.getenv('RATE_LIMIT_SUBMIT_PER_MINUTE', 6))
+    RATE_LIMIT_SUBMIT_BURST = int(os.getenv('RATE_LIMIT_SUBMIT_BURST', 3))
+    RATE_LIMIT_MAX_KEYS = int(os.getenv('RATE_LIMIT_MAX_KEYS', 100000))
+    
+    # Number of reverse proxies in front of the app whose X-Forwarded-For/-Proto/-Host
+    # headers are trusted (werkzeug ProxyFix). 0 uses the socket peer as the client IP.
+    TRUSTED_PROXIES = int(os.getenv('TRUSTED_PROXIES', 0))
     
     # Server settings
     PORT = int(os.getenv('PORT', 5001))  # Default to 5001 to avoid macOS AirPlay conflict
     HOST = os.getenv('HOST', '0.0.0.0')
     
+    # Production server (gunicorn gthread workers, see gunicorn.conf.py). More than one
+    # worker needs SESSION_BACKEND=sqlite and STATISTICS_BACKEND=sqlite.
+    WORKERS = int(os.getenv('WORKERS', 1))
+    THREADS = int(os.getenv('THREADS', 8))
+    KEEPALIVE_SECONDS = int(os.getenv('KEEPALIVE_SECONDS', 5))
+    WORKER_TIMEOUT_SECONDS = int(os.getenv('WORKER_TIMEOUT_SECONDS', 60))
+    GRACEFUL_TIMEOUT_SECONDS = int(os.getenv('GRACEFUL_TIMEOUT_SECONDS', 30))
+    
     # Data paths
     DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
     QUESTIONNAIRE_PATH = os.path.join(DATA_DIR, 'questionnaire.json')
     RESULTS_DIR = os.path.join(DATA_DIR, 'results')
     STATISTICS_PATH = os.path.join(DATA_DIR, 'statistics.json')
     
+    # Statistics ('memory' for a single process, 'sqlite' to share across workers)
+    STATISTICS_BACKEND = os.getenv('STATISTICS_BACKEND', 'memory')
+    STATISTICS_DB_PATH = os.getenv('STATISTICS_DB_PATH', os.path.join(DATA_DIR, 'statistics.sqlite3'))
+    # Memory backend snapshots (written every N events or every interval seconds)
+    STATISTICS_FLUSH_EVERY = int(os.getenv('STATISTICS_FLUSH_EVERY', 50))
+    STATISTICS_FLUSH_INTERVAL = float(os.getenv('STATISTICS_FLUSH_INTERVAL', 5.0))
+    # Width of the per-domain score histogram buckets (scores run 1.0-4.0)
+    STATISTICS_HISTOGRAM_BUCKET_WIDTH = float(os.getenv('STATISTICS_HISTOGRAM_BUCKET_WIDTH', 0.1))
+    
+    # Results log (append-only JSON Lines segments in RESULTS_DIR)
+    RESULTS_SEGMENT_MAX_BYTES = int(os.getenv('RESULTS_SEGMENT_MAX_BYTES', 64 * 1024 * 1024))
+    RESULTS_FSYNC_EVERY = int(os.getenv('RESULTS_FSYNC_EVERY', 32))
+    RESULTS_FSYNC_INTERVAL = float(os.getenv('RESULTS_FSYNC_INTERVAL', 1.0))
+    
+    # Score-profile cache of LLM analyses
+    LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'True') == 'True'
+    LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', os.path.join(DATA_DIR, 'llm_cache.sqlite3'))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', 10000))
+    LLM_CACHE_TTL_SECONDS = int(os.getenv('LLM_CACHE_TTL_SECONDS', 30 * 24 * 3600))
+    LLM_CACHE_BUCKET = float(os.getenv('LLM_CACHE_BUCKET', 0))  # e.g. 0.1 to share near-identical profiles
+    
+    # Background LLM analysis
+    ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', 4))
+    ANALYSIS_QUEUE_SIZE = int(os.getenv('ANALYSIS_QUEUE_SIZE', 100))
+    ANALYSIS_LONG_POLL_MAX_SECONDS = float(os.getenv('ANALYSIS_LONG_POLL_MAX_SECONDS', 30))
+    ANALYSIS_POLL_INTERVAL = float(os.getenv('ANALYSIS_POLL_INTERVAL', 0.25))
+    # A pending analysis older than this is treated as lost (e.g. its worker restarted)
+    ANALYSIS_STALE_SECONDS = float(os.getenv('ANALYSIS_STALE_SECONDS', 300))
+    # How often each process looks for stale pending analyses nobody is polling (0 disables)
+    ANALYSIS_RECOVERY_INTERVAL = float(os.getenv('ANALYSIS_RECOVERY_INTERVAL', 60))
+    
+    # Batched re-analysis of stored results (reanalyze.py)
+    BATCH_ANALYSIS_SIZE = int(os.getenv('BATCH_ANALYSIS_SIZE', 20))  # profiles per chat completion
+    BATCH_ANALYSIS_CONCURRENCY = int(os.getenv('BATCH_ANALYSIS_CONCURRENCY', 4))
+    BATCH_ANALYSIS_CHECKPOINT = os.getenv('BATCH_ANALYSIS_CHECKPOINT', os.path.join(DATA_DIR, 'reanalysis.checkpoint.jsonl'))
+    
+    # JSON encoder for responses and storage ('auto' uses orjson when installed, or 'stdlib')
+    JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto')
+    
+    # Request/stage timing and counters exposed at /api/metrics
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+    
+    # HTTP caching and compression of read endpoints
+    HTTP_COMPRESSION_MIN_BYTES = int(os.getenv('HTTP_COMPRESSION_MIN_BYTES', 1024))
+    HTTP_COMPRESSION_CACHE_ENTRIES = int(os.getenv('HTTP_COMPRESSION_CACHE_ENTRIES', 1024))
+    STATISTICS_CACHE_MAX_AGE = int(os.getenv('STATISTICS_CACHE_MAX_AGE', 5))
+    
+    # Session storage ('memory' for a single process, 'sqlite' to share across workers)
+    SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'memory')
+    SESSION_DB_PATH = os.getenv('SESSION_DB_PATH', os.path.join(DATA_DIR, 'sessions.sqlite3'))
+    SESSION_TTL_SECONDS = int(os.getenv('SESSION_TTL_SECONDS', 7 * 24 * 3600))  # idle
+    SESSION_ABSOLUTE_TTL_SECONDS = int(os.getenv('SESSION_ABSOLUTE_TTL_SECONDS', 30 * 24 * 3600))
+    SESSION_COMPLETED_TTL_SECONDS = int(os.getenv('SESSION_COMPLETED_TTL_SECONDS', 24 * 3600))  # idle, once completed
+    SESSION_SWEEP_INTERVAL = float(os.getenv('SESSION_SWEEP_INTERVAL', 60))
+    SESSION_MAX_ENTRIES = int(os.getenv('SESSION_MAX_ENTRIES', 100000))
+    
     # Domain scoring thresholds (from Appendix A)
     DOMAIN_THRESHOLDS = {
         'reaction_speed': {
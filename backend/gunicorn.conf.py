@@ -0,0 +1,27 @@
+"""gunicorn settings, read from Config (environment / .env)
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+from config import Config
+
+bind = f'{Config.HOST}:{Config.PORT}'
+worker_class = 'gthread'
+workers = Config.WORKERS
+threads = Config.THREADS
+keepalive = Config.KEEPALIVE_SECONDS
+timeout = Config.WORKER_TIMEOUT_SECONDS
+graceful_timeout = Config.GRACEFUL_TIMEOUT_SECONDS
+
+
+def on_starting(server):
+    if Config.WORKERS > 1 and 'memory' in (Config.SESSION_BACKEND, Config.STATISTICS_BACKEND):
+        server.log.warning(
+            "WORKERS > 1 with a process-local session or statistics backend; "
+            "set SESSION_BACKEND=sqlite and STATISTICS_BACKEND=sqlite"
+        )
+
+
+def worker_exit(server, worker):
+    # Flush results, statistics and queued analyses before the worker goes away
+    from app import on_shutdown
+    on_shutdown()
@@ -0,0 +1,57 @@
+"""
+Re-generate LLM analyses for stored results in batches
+
+Usage:
+    python reanalyze.py [--batch-size N] [--concurrency N] [--checkpoint PATH] [--limit N] [--dry-run]
+
+Safe to interrupt: finished profiles are checkpointed and a re-run resumes
+where the previous one stopped. Delete the checkpoint to start over.
+"""
+import argparse
+import time
+from config import Config
+from services.batch_analysis import BatchAnalyzer
+from services.llm_client import llm_clients
+from utils.results_store import get_results_log
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-analyze stored results with batched LLM requests')
+    parser.add_argument('--batch-size', type=int, default=Config.BATCH_ANALYSIS_SIZE,
+                        help='score profiles per LLM request')
+    parser.add_argument('--concurrency', type=int, default=Config.BATCH_ANALYSIS_CONCURRENCY,
+                        help='LLM requests in flight at once')
+    parser.add_argument('--checkpoint', default=Config.BATCH_ANALYSIS_CHECKPOINT,
+                        help='resumable progress file')
+    parser.add_argument('--limit', type=int, default=None,
+                        help='analyze at most this many new profiles')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='only report how many results and distinct profiles would be analyzed')
+    args = parser.parse_args()
+
+    analyzer = BatchAnalyzer(get_results_log(), args.checkpoint, args.batch_size, args.concurrency)
+    try:
+        if args.dry_run:
+            profiles, members = analyzer.collect_profiles(analyzer.results_log.iter_records())
+            pending = [key for key in profiles if key not in analyzer.checkpoint.analyses]
+            requests = -(-len(pending) // args.batch_size)
+            print(f"{sum(len(ids) for ids in members.values())} results, {len(profiles)} distinct profiles, "
+                  f"{len(pending)} still to analyze in {requests} requests")
+            return
+
+        start = time.monotonic()
+        summary = analyzer.run(limit=args.limit)
+        elapsed = time.monotonic() - start
+        for name, value in summary.items():
+            print(f"{name}: {value}")
+        print(f"elapsed: {elapsed:.1f}s")
+        if summary['unanswered_profiles'] or summary['failed_batches']:
+            print("Some profiles were not analyzed; run again to retry them.")
+    finally:
+        analyzer.close()
+        get_results_log().close()
+        llm_clients.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Rebuild statistics.json from the results archive
+
+Usage:
+    python rebuild_statistics.py [--workers N] [--chunk-mb N] [--output PATH]
+                                 [--started N] [--stored-scores] [--dry-run]
+
+Stop the server first: a running memory backend would overwrite the file on
+its next flush. With STATISTICS_BACKEND=sqlite, delete statistics.sqlite3
+afterwards so it is re-seeded from the rebuilt file.
+
+``total_started`` cannot be derived from results; it is kept from the
+existing file when that is readable (never below the number of completions)
+unless ``--started`` is given.
+"""
+import argparse
+import os
+from config import Config
+from services.statistics_rebuild import rebuild
+from utils import json_codec
+from utils.statistics import write_snapshot
+
+
+def previous_started(path: str) -> int:
+    try:
+        with open(path, 'rb') as f:
+            return int(json_codec.loads(f.read()).get('total_started', 0))
+    except (OSError, ValueError, TypeError, AttributeError) as e:
+        print(f"Could not read total_started from {path} ({str(e)}); using the number of completions")
+        return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild statistics from the stored results')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='worker processes (1 = no pool)')
+    parser.add_argument('--chunk-mb', type=float, default=8,
+                        help='segment bytes per work unit')
+    parser.add_argument('--output', default=Config.STATISTICS_PATH,
+                        help='statistics file to write')
+    parser.add_argument('--started', type=int, default=None,
+                        help='total_started to record (default: keep the existing value)')
+    parser.add_argument('--stored-scores', action='store_true',
+                        help='use the stored scores instead of re-scoring the raw answers')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='aggregate and report, but do not write the file')
+    args = parser.parse_args()
+
+    total, elapsed = rebuild(Config.RESULTS_DIR, args.workers, int(args.chunk_mb * 1024 * 1024),
+                             rescore=not args.stored_scores)
+
+    started = args.started if args.started is not None else previous_started(args.output)
+    stats = total.snapshot(max(started, total.completions))
+
+    rate = total.completions / elapsed if elapsed > 0 else 0.0
+    print(f"results: {total.completions} ({total.rescored} re-scored, {total.invalid} skipped)")
+    print(f"read: {total.bytes_read / 1e6:.1f} MB in {elapsed:.2f}s with {args.workers} worker(s)")
+    print(f"throughput: {rate:,.0f} results/s, {total.bytes_read / 1e6 / elapsed if elapsed > 0 else 0:.1f} MB/s")
+    print(f"total_started: {stats['total_started']}, completion_rate: {stats['completion_rate']}")
+    print(f"driver_styles: {stats['driver_styles']}")
+
+    if args.dry_run:
+        return
+    write_snapshot(args.output, stats)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,16 @@
 """Authentication and registration routes"""
 import uuid
 from datetime import datetime
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, jsonify
 from utils.storage import StorageService
 from utils.sessions import sessions
+from utils import admission, validation
 
 auth_bp = Blueprint('auth', __name__)
 
 
 @auth_bp.route('/api/register', methods=['POST'])
+@admission.rate_limited(admission.register_rate, admission.client_ip)
 def register():
     """
     Register a new user and create a session
@@ -20,26 +22,27 @@ def register():
         "gender": "Male",
         "age_group": "26-35"
     }
-    """
-    data = request.get_json()
     
-    # Validate required fields
-    required_fields = ['full_name', 'email', 'gender', 'age_group']
-    for field in required_fields:
-        if field not in data or not data[field]:
-            return jsonify({'error': f'Missing required field: {field}'}), 400
+    Fields are trimmed and length-checked; unknown fields are not stored.
+    Rate limited per client IP (429 with Retry-After).
+    """
+    try:
+        user = validation.registration(validation.json_body())
+    except validation.ValidationError as e:
+        return jsonify({'error': str(e)}), 400
     
     # Generate unique session ID
     session_id = str(uuid.uuid4())
     
     # Store session data
-    sessions[session_id] = {
-        'user': data,
+    sessions.set(session_id, {
+        'user': user,
         'created_at': datetime.now().isoformat(),
         'answers': {},
         'current_question_index': 0,
+        'version': 0,
         'completed': False
-    }
+    })
     
     # Track that a new questionnaire was started
     StorageService.increment_started_count()
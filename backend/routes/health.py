@@ -1,6 +1,10 @@
 """Health check routes"""
 from datetime import datetime
 from flask import Blueprint, jsonify
+from services.analysis_cache import get_analysis_cache
+from services.analysis_jobs import analysis_jobs
+from services.llm_service import llm_breaker
+from utils import admission
 
 health_bp = Blueprint('health', __name__)
 
@@ -8,7 +12,17 @@ health_bp = Blueprint('health', __name__)
 @health_bp.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({
+    health = {
         'status': 'healthy',
-        'timestamp': datetime.now().isoformat()
-    })
+        'timestamp': datetime.now().isoformat(),
+        'llm_circuit': llm_breaker.snapshot(),
+        'analysis_jobs_pending': analysis_jobs.pending,
+        'analysis_jobs': analysis_jobs.snapshot(),
+        'admission': admission.snapshot()
+    }
+    
+    cache = get_analysis_cache()
+    if cache is not None:
+        health['llm_cache'] = cache.stats()
+    
+    return jsonify(health)
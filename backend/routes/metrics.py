@@ -0,0 +1,22 @@
+"""Metrics routes"""
+from flask import Blueprint, Response, jsonify
+from services.analysis_jobs import analysis_jobs
+from services.llm_service import llm_breaker
+from utils import metrics
+from utils.sessions import sessions
+
+metrics_bp = Blueprint('metrics', __name__)
+
+metrics.gauge('sessions', 'Sessions in the session store', lambda: len(sessions))
+metrics.gauge('analysis_jobs_pending', 'LLM analyses queued or running in this process',
+              lambda: analysis_jobs.pending)
+metrics.gauge('llm_circuit_open', '1 while the LLM circuit breaker is open or half-open',
+              lambda: int(llm_breaker.state != 'closed'))
+
+
+@metrics_bp.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text exposition of this process's metrics"""
+    if not metrics.ENABLED:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
@@ -1,9 +1,12 @@
 """Questionnaire routes"""
-import random
+import hashlib
 from datetime import datetime
 from flask import Blueprint, request, jsonify
-from utils.questionnaire_loader import load_questionnaire
-from utils.sessions import sessions
+from utils.http_cache import cached_json_response, conditional_response
+from utils.questionnaire_loader import get_questionnaire as get_compiled_questionnaire
+from utils.sessions import sessions, StaleVersionError
+from utils import admission, validation
+from utils.validation import AnswerSchema
 
 questionnaire_bp = Blueprint('questionnaire', __name__)
 
@@ -15,61 +18,126 @@ def get_questionnaire():
     
     Query params:
     - session_id: Optional session ID to get consistent shuffled order
+    
+    With a session the order is computed once, stored in the session as a
+    permutation of question indexes, and the response carries an ETag so the
+    client can revalidate with If-None-Match (304). Large bodies are
+    gzip-compressed once per ETag.
     """
     session_id = request.args.get('session_id')
     
-    questionnaire_data = load_questionnaire()
-    
-    # Flatten all questions from all sections
-    all_questions = []
-    for section in questionnaire_data['sections']:
-        for question in section['questions']:
-            # Add section info to each question for reference
-            question_copy = question.copy()
-            question_copy['section'] = section['name']
-            question_copy['section_id'] = section['id']
-            all_questions.append(question_copy)
+    questionnaire = get_compiled_questionnaire()
+    session_data = sessions.get(session_id) if session_id else None
     
-    # Shuffle questions
-    # Use session_id as seed for consistent ordering per session
-    if session_id and session_id in sessions:
-        random.seed(session_id)
+    if session_data is None:
+        # No session: a fresh random order on every request, so nothing to revalidate
+        order = questionnaire.shuffled_order()
+        return cached_json_response(questionnaire.render(order), 'no-store', cache_variants=False)
     
-    random.shuffle(all_questions)
+    order = session_data.get('question_order')
+    if (session_data.get('question_order_hash') != questionnaire.content_hash
+            or not questionnaire.is_valid_order(order)):
+        # Same order as before for this session: the permutation is seeded by the session ID
+        order = questionnaire.shuffled_order(session_id)
+        
+        def store_order(data):
+            data['question_order'] = order
+            data['question_order_hash'] = questionnaire.content_hash
+        
+        sessions.update(session_id, store_order)
     
-    return jsonify({
-        'questions': all_questions,
-        'answers': questionnaire_data['answers'],
-        'total_questions': len(all_questions)
-    })
+    etag = hashlib.sha256(
+        (questionnaire.content_hash + ':' + ','.join(map(str, order))).encode('ascii')
+    ).hexdigest()[:32]
+    return conditional_response(lambda: questionnaire.render(order), etag, 'private, no-cache')
 
 
 @questionnaire_bp.route('/api/save-progress', methods=['POST'])
+@admission.rate_limited(admission.progress_rate, admission.session_or_ip)
 def save_progress():
     """
     Save questionnaire progress for later
     
-    Expected payload:
+    Expected payload (full map):
     {
         "session_id": "uuid",
         "answers": {"RS1": 3, "VC2": 2, ...},
         "current_question_index": 15
     }
-    """
-    data = request.get_json()
     
-    session_id = data.get('session_id')
-    if not session_id or session_id not in sessions:
-        return jsonify({'error': 'Invalid session ID'}), 400
+    Or (delta mode, only the changed answers; null removes an answer):
+    {
+        "session_id": "uuid",
+        "answers_delta": {"VC2": 3, "RS4": null},
+        "version": 7,
+        "current_question_index": 16
+    }
+    
+    "version" is the progress version the client last saw. If given and the
+    stored progress has moved on, the save is rejected with 409 and the
+    current version so the client can resync with a full-map save.
+    Saves are rate limited per session (429 with Retry-After).
+    """
+    questionnaire = get_compiled_questionnaire()
+    schema = AnswerSchema.for_questionnaire(questionnaire)
+    try:
+        data = validation.json_body()
+        session_id = validation.session_id(data)
+        
+        answers = data.get('answers')
+        answers_delta = data.get('answers_delta')
+        if answers is not None and answers_delta is not None:
+            raise validation.ValidationError('Send either answers or answers_delta, not both')
+        if answers_delta is not None:
+            error = schema.check_partial(answers_delta, allow_null=True, field='answers_delta')
+        else:
+            error = schema.check_partial(answers) if answers is not None else None
+        if error:
+            raise validation.ValidationError(error)
+        
+        base_version = validation.optional_int(data, 'version')
+        current_index = validation.optional_int(data, 'current_question_index',
+                                                maximum=questionnaire.total_questions)
+    except validation.ValidationError as e:
+        return jsonify({'error': str(e)}), 400
     
     # Update session data
-    sessions[session_id]['answers'] = data.get('answers', {})
-    sessions[session_id]['current_question_index'] = data.get('current_question_index', 0)
-    sessions[session_id]['last_saved'] = datetime.now().isoformat()
+    def apply_progress(session_data):
+        current_version = session_data.get('version', 0)
+        if base_version is not None and base_version != current_version:
+            raise StaleVersionError(current_version)
+        
+        if answers_delta is not None:
+            merged = session_data['answers']
+            for q_id, value in answers_delta.items():
+                if value is None:
+                    merged.pop(q_id, None)
+                else:
+                    merged[q_id] = value
+            default_index = session_data['current_question_index']
+        else:
+            session_data['answers'] = answers if answers is not None else {}
+            default_index = 0
+        
+        session_data['current_question_index'] = current_index if current_index is not None else default_index
+        session_data['last_saved'] = datetime.now().isoformat()
+        session_data['version'] = current_version + 1
+    
+    try:
+        session_data = sessions.update(session_id, apply_progress)
+    except StaleVersionError as e:
+        return jsonify({
+            'error': 'Progress version is stale',
+            'version': e.current_version
+        }), 409
+    
+    if session_data is None:
+        return jsonify({'error': 'Invalid session ID'}), 400
     
     return jsonify({
         'message': 'Progress saved successfully',
-        'saved_at': sessions[session_id]['last_saved']
+        'saved_at': session_data['last_saved'],
+        'version': session_data['version']
     })
 
 
@@ -78,11 +146,10 @@ def load_progress(session_id):
     """
     Load saved questionnaire progress
     """
-    if session_id not in sessions:
+    session_data = sessions.get(session_id)
+    if session_data is None:
         return jsonify({'error': 'Session not found'}), 404
     
-    session_data = sessions[session_id]
-    
     if session_data.get('completed'):
         return jsonify({'error': 'Questionnaire already completed'}), 400
     
@@ -90,5 +157,6 @@ def load_progress(session_id):
         'user': session_data['user'],
         'answers': session_data['answers'],
         'current_question_index': session_data['current_question_index'],
-        'last_saved': session_data.get('last_saved')
+        'last_saved': session_data.get('last_saved'),
+        'version': session_data.get('version', 0)
     })
@@ -1,94 +1,281 @@
 """Results and statistics routes"""
 from datetime import datetime
-from flask import Blueprint, request, jsonify
-from services.scoring_service import ScoringService
+from flask import Blueprint, Response, request, jsonify
+from config import Config
 from services.llm_service import LLMService
+from services.scoring_service import ScoringService
+from services.analysis_jobs import analysis_jobs, STATUS_COMPLETE, STATUS_FAILED, STATUS_PENDING
 from utils.storage import StorageService
-from utils.questionnaire_loader import load_questionnaire
-from utils.sessions import sessions
+from utils.http_cache import cached_json_response
+from utils import json_codec
+from utils.metrics import span
+from utils.questionnaire_loader import get_questionnaire
+from utils.sessions import sessions, AlreadyCompletedError
+from utils import admission, validation
+from utils.validation import AnswerSchema
 
 results_bp = Blueprint('results', __name__)
 
 
+def _already_submitted(session_id):
+    """409 for a session whose questionnaire was already submitted"""
+    return jsonify({
+        'error': 'Questionnaire already submitted for this session',
+        'analysis_id': session_id
+    }), 409
+
+
+def _accept_submission():
+    """
+    Validate and score the submitted body and mark its session completed
+    
+    The payload is checked against the compiled answer schema before the
+    session is looked up, so malformed submissions cost no storage work.
+    
+    A session can be submitted once; later submits get 409 with the
+    analysis_id of the first one.
+    
+    Returns:
+        (submission, None) with session_id, user, scores, percentiles,
+        answers and completed_at, or (None, error response)
+    """
+    # Compiled questionnaire structure for validation
+    with span('load_questionnaire'):
+        questionnaire = get_questionnaire()
+    
+    # Validate the payload and answers in one pass
+    with span('validate_answers'):
+        try:
+            data = validation.json_body()
+            session_id = validation.session_id(data)
+            answers = data.get('answers', {})
+            error_msg = AnswerSchema.for_questionnaire(questionnaire).check_complete(answers)
+        except validation.ValidationError as e:
+            error_msg = str(e)
+    
+    if error_msg:
+        return None, (jsonify({'error': error_msg}), 400)
+    
+    session_data = sessions.get(session_id)
+    if session_data is None:
+        return None, (jsonify({'error': 'Invalid session ID'}), 400)
+    if session_data.get('completed'):
+        return None, _already_submitted(session_id)
+    
+    # Calculate scores
+    with span('scoring'):
+        scores = ScoringService.calculate_scores(
+            answers,
+            questionnaire.sections
+        )
+    
+    # Mark session as completed; the analysis is still pending
+    completed_at = datetime.now().isoformat()
+    
+    def mark_completed(stored):
+        # Checked again inside the update so concurrent submits cannot both pass
+        if stored.get('completed'):
+            raise AlreadyCompletedError()
+        stored['completed'] = True
+        stored['completed_at'] = completed_at
+        # With the answers and scores a lost or failed job can still be recorded with the fallback
+        stored['answers'] = answers
+        stored['analysis'] = {'status': STATUS_PENDING, 'scores': scores}
+    
+    with span('session_update'):
+        try:
+            updated = sessions.update(session_id, mark_completed)
+        except AlreadyCompletedError:
+            return None, _already_submitted(session_id)
+    if updated is None:
+        return None, (jsonify({'error': 'Invalid session ID'}), 400)
+    
+    # Where each domain score sits among earlier respondents
+    with span('percentiles'):
+        percentiles = StorageService.get_percentiles(
+            {name: data['score'] for name, data in scores.items()}
+        )
+    
+    submission = {
+        'session_id': session_id,
+        'user': session_data['user'],
+        'scores': scores,
+        'percentiles': percentiles,
+        'answers': answers,
+        'completed_at': completed_at
+    }
+    return submission, None
+
+
+def _queue_analysis(submission):
+    """Hand the LLM analysis to the background queue and answer 202 with the scores"""
+    session_id = submission['session_id']
+    
+    # Queue LLM analysis, result persistence and statistics update
+    analysis_jobs.submit(session_id, submission['user'], submission['scores'], submission['answers'])
+    
+    # Prepare response
+    result = {
+        'user': submission['user'],
+        'scores': submission['scores'],
+        'percentiles': submission['percentiles'],
+        'analysis_id': session_id,
+        'analysis_status': STATUS_PENDING,
+        'completed_at': submission['completed_at']
+    }
+    
+    return jsonify(result), 202
+
+
 @results_bp.route('/api/submit', methods=['POST'])
+@admission.rate_limited(admission.submit_rate, admission.session_or_ip)
 def submit_questionnaire():
     """
-    Submit completed questionnaire and get results
+    Submit completed questionnaire and get scores
     
     Expected payload:
     {
         "session_id": "uuid",
         "answers": {"RS1": 3, "VC2": 2, ...}
     }
+    
+    Returns 202 with the scores and an analysis_id; the LLM analysis is
+    fetched from GET /api/analysis/<analysis_id>. Per-session rate limiting
+    answers 429.
     """
-    data = request.get_json()
+    submission, error = _accept_submission()
+    if error is not None:
+        return error
     
-    session_id = data.get('session_id')
-    if not session_id or session_id not in sessions:
-        return jsonify({'error': 'Invalid session ID'}), 400
+    return _queue_analysis(submission)
+
+
+def _sse(event: str, data) -> bytes:
+    """Encode one Server-Sent Event"""
+    return b'event: ' + event.encode('ascii') + b'\ndata: ' + json_codec.dumps_bytes(data) + b'\n\n'
+
+
+@results_bp.route('/api/submit/stream', methods=['POST'])
+@admission.rate_limited(admission.submit_rate, admission.session_or_ip)
+def submit_questionnaire_stream():
+    """
+    Submit completed questionnaire and stream the analysis (Server-Sent Events)
     
-    session_data = sessions[session_id]
-    answers = data.get('answers', {})
+    Same payload as /api/submit. Validation errors are plain JSON 400s;
+    otherwise the response is text/event-stream with, in order:
+    - scores:   user, scores, percentiles, analysis_id, completed_at (sent immediately)
+    - token:    {"text": ...} for each piece of the LLM completion (raw JSON text)
+    - analysis: {"llm_analysis": {...}, "fallback": bool}; supersedes the tokens
+    - saved:    {"result_id": ...} once the result and statistics are stored
     
-    # Load questionnaire structure for validation
-    questionnaire_data = load_questionnaire()
+    If the client disconnects early, the analysis is finished in the
+    background and can still be fetched from GET /api/analysis/<analysis_id>.
     
-    # Validate answers
-    is_valid, error_msg = ScoringService.validate_answers(
-        answers, 
-        questionnaire_data['sections']
-    )
+    Each stream holds one of STREAM_MAX_CONCURRENT slots for the length of
+    the LLM call. When none is free, the submission is handled like
+    /api/submit instead: the analysis is queued in the background and the
+    answer is the same 202 JSON with an analysis_id to poll.
+    """
+    submission, error = _accept_submission()
+    if error is not None:
+        return error
     
-    if not is_valid:
-        return jsonify({'error': error_msg}), 400
+    if not admission.stream_slots.acquire():
+        return _queue_analysis(submission)
     
-    # Calculate scores
-    scores = ScoringService.calculate_scores(
-        answers,
-        questionnaire_data['sections']
-    )
+    session_id = submission['session_id']
+    user_data, scores, answers = submission['user'], submission['scores'], submission['answers']
     
-    # Get LLM analysis
+    def generate():
+        llm_stream = LLMService.stream_with_fallback(scores)
+        llm_response = None
+        result_id = None
+        try:
+            yield _sse('scores', {
+                'user': user_data,
+                'scores': scores,
+                'percentiles': submission['percentiles'],
+                'analysis_id': session_id,
+                'completed_at': submission['completed_at']
+            })
+            
+            for kind, payload in llm_stream:
+                if kind == 'token':
+                    yield _sse('token', {'text': payload})
+                else:
+                    llm_response = payload
+                    yield _sse('analysis', {'llm_analysis': payload, 'fallback': kind == 'fallback'})
+            
+            try:
+                result_id = analysis_jobs.complete(session_id, user_data, scores, answers, llm_response)
+            except Exception as e:
+                print(f"Saving streamed analysis {session_id} failed: {str(e)}")
+                yield _sse('error', {'error': 'Failed to save result'})
+                return
+            yield _sse('saved', {'result_id': result_id})
+        except GeneratorExit:
+            # Client went away: finish the analysis without it
+            llm_stream.close()
+            if llm_response is None:
+                analysis_jobs.submit(session_id, user_data, scores, answers)
+            elif result_id is None:
+                try:
+                    analysis_jobs.complete(session_id, user_data, scores, answers, llm_response)
+                except Exception as e:
+                    print(f"Saving streamed analysis {session_id} failed: {str(e)}")
+            raise
+    
+    response = Response(generate(), mimetype='text/event-stream')
+    # Runs when the server closes the response, even if the stream never started
+    response.call_on_close(admission.stream_slots.release)
+    response.headers['Cache-Control'] = 'no-store'
+    # Tell reverse proxies (nginx) not to buffer the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@results_bp.route('/api/analysis/<analysis_id>', methods=['GET'])
+def get_analysis(analysis_id):
+    """
+    Get the LLM analysis for a submission
+    
+    Query params:
+    - wait: Optional seconds to long-poll for completion (capped by config)
+    
+    Status is 'pending', 'complete', or 'failed' when the job raised or was
+    lost; a failed analysis still carries the rule-based fallback.
+    """
     try:
-        llm_service = LLMService()
-        llm_response = llm_service.analyze_driving_profile(scores)
-    except ValueError as e:
-        # If OpenAI API key not set, use fallback
-        print(f"LLM service error: {str(e)}")
-        llm_service_fallback = LLMService.__new__(LLMService)
-        llm_response = llm_service_fallback._get_fallback_response(scores)
-    except Exception as e:
-        print(f"Unexpected LLM error: {str(e)}")
-        llm_service_fallback = LLMService.__new__(LLMService)
-        llm_response = llm_service_fallback._get_fallback_response(scores)
-    
-    # Save results to file
-    user_data = session_data['user']
-    StorageService.save_result(user_data, scores, llm_response)
-    
-    # Update statistics
-    score_values = {name: data['score'] for name, data in scores.items()}
-    StorageService.update_statistics(score_values, llm_response.get('driving_style', 'Unknown'))
-    
-    # Mark session as completed
-    session_data['completed'] = True
-    session_data['completed_at'] = datetime.now().isoformat()
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        return jsonify({'error': 'wait must be a number'}), 400
+    wait = max(0.0, min(wait, Config.ANALYSIS_LONG_POLL_MAX_SECONDS))
     
-    # Prepare response
-    result = {
-        'user': user_data,
-        'scores': scores,
-        'llm_analysis': llm_response,
-        'completed_at': session_data['completed_at']
+    analysis = analysis_jobs.wait(analysis_id, wait)
+    if analysis is None:
+        return jsonify({'error': 'Analysis not found'}), 404
+    
+    response = {
+        'analysis_id': analysis_id,
+        'status': analysis['status']
     }
+    if analysis['status'] == STATUS_COMPLETE:
+        response['llm_analysis'] = analysis['llm_analysis']
+        response['result_id'] = analysis['result_id']
+    elif analysis['status'] == STATUS_FAILED:
+        response['llm_analysis'] = analysis.get('llm_analysis')
+        response['error'] = analysis.get('error')
     
-    return jsonify(result), 200
+    return jsonify(response)
 
 
 @results_bp.route('/api/statistics', methods=['GET'])
 def get_statistics():
     """
     Get aggregated statistics (optional endpoint for admin/debugging)
+    
+    Served with a content ETag and a short max-age (STATISTICS_CACHE_MAX_AGE).
     """
     stats = StorageService.get_statistics()
-    return jsonify(stats)
+    body = json_codec.dumps_bytes(stats, sort_keys=True)
+    return cached_json_response(body, f'public, max-age={Config.STATISTICS_CACHE_MAX_AGE}')
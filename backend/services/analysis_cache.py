@@ -0,0 +1,171 @@
+"""
+Cache of LLM analyses keyed by score profile
+
+Domain scores are means of 10 answers on a 1-4 scale, so many respondents end
+up with identical profiles and therefore identical prompts. Analyses are cached
+in SQLite (shared by all workers, kept across restarts) under a hash of the
+canonical score/category profile, the model name and the prompt version.
+
+Entries expire after ``Config.LLM_CACHE_TTL_SECONDS`` and the least recently
+used ones are evicted beyond ``Config.LLM_CACHE_MAX_ENTRIES``. With
+``Config.LLM_CACHE_BUCKET`` > 0 scores are snapped to that grid first, so
+near-identical profiles share an entry.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+from config import Config
+
+
+def profile_key(scores: Dict[str, Any], model: str, prompt_version: int,
+                bucket: float = 0.0) -> str:
+    """
+    Canonical cache key for a score profile
+
+    Args:
+        scores: Domain scores as returned by ScoringService.calculate_scores
+        model: LLM model name
+        prompt_version: Version of the prompt template
+        bucket: Optional score grid size for near-neighbour sharing
+
+    Returns:
+        Hex digest identifying the profile
+    """
+    profile = []
+    for domain_name in sorted(scores):
+        data = scores[domain_name]
+        score = data['score']
+        if bucket > 0:
+            score = round(round(score / bucket) * bucket, 2)
+        profile.append([domain_name, score, data['category'], data['category_label']])
+
+    canonical = json.dumps([model, prompt_version, profile], separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class AnalysisCache:
+    """Persistent LRU + TTL cache of LLM analyses"""
+
+    # Hits refresh accessed_at only once it is this fraction of the TTL old, so
+    # most hits are pure reads; LRU order is kept to that granularity
+    TOUCH_FRACTION = 0.05
+
+    def __init__(self, path: str, max_entries: int, ttl_seconds: float, bucket: float):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.bucket = bucket
+        self._touch_after = ttl_seconds * self.TOUCH_FRACTION
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS llm_cache ('
+            ' key TEXT PRIMARY KEY,'
+            ' value TEXT NOT NULL,'
+            ' created_at REAL NOT NULL,'
+            ' accessed_at REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS llm_cache_accessed_at ON llm_cache (accessed_at)')
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def key(self, scores: Dict[str, Any], model: str, prompt_version: int) -> str:
+        """Cache key for a score profile using this cache's bucketing"""
+        return profile_key(scores, model, prompt_version, self.bucket)
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        """Return a cached analysis, or None on a miss"""
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            'SELECT value, accessed_at FROM llm_cache WHERE key = ? AND created_at >= ?',
+            (key, now - self.ttl_seconds)
+        ).fetchone()
+
+        with self._counter_lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if row is None:
+            return None
+
+        if now - row[1] >= self._touch_after:
+            conn.execute('UPDATE llm_cache SET accessed_at = ? WHERE key = ?', (now, key))
+        return json.loads(row[0])
+
+    def put(self, key: str, analysis: Dict[str, str]):
+        """Store an analysis and evict expired / least recently used entries"""
+        now = time.time()
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(analysis, ensure_ascii=False), now, now)
+            )
+            conn.execute('DELETE FROM llm_cache WHERE created_at < ?', (now - self.ttl_seconds,))
+            excess = conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    'DELETE FROM llm_cache WHERE key IN '
+                    '(SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?)',
+                    (excess,)
+                )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process and the current entry count"""
+        with self._counter_lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0,
+            'entries': self._conn().execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0]
+        }
+
+
+_cache: Optional[AnalysisCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_analysis_cache() -> Optional[AnalysisCache]:
+    """Return the shared analysis cache, or None when caching is disabled"""
+    global _cache
+    if not Config.LLM_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AnalysisCache(
+                    Config.LLM_CACHE_PATH,
+                    Config.LLM_CACHE_MAX_ENTRIES,
+                    Config.LLM_CACHE_TTL_SECONDS,
+                    Config.LLM_CACHE_BUCKET
+                )
+    return _cache
@@ -0,0 +1,320 @@
+"""
+Background LLM analysis
+
+``/api/submit`` scores the answers, queues the LLM analysis here and returns
+immediately. Jobs run on a bounded thread pool; when the queue is full the
+rule-based fallback is used straight away so submit never blocks on the LLM.
+
+When a job finishes, the result is saved, statistics are updated and the
+analysis is written into the session record, so ``GET /api/analysis/<id>`` can
+answer from any worker process that shares the session store. The analysis ID
+is the session ID. ``/api/submit/stream`` runs the LLM call itself and uses
+``complete`` for the same bookkeeping.
+
+A job that raises, or that was lost with its worker (the queue is in memory),
+ends as status 'failed' carrying the rule-based fallback analysis, so clients
+never wait on it forever. The fallback is saved and counted like any other
+result; the session keeps the answers and the pending entry the scores for
+this. Lost jobs are found when polled or by a periodic recovery pass
+(``start_recovery``). Whoever first claims the pending entry records the
+result, so a submission is never saved or counted twice.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from config import Config
+from services.llm_service import LLMService
+from services.scoring_service import ScoringService
+from utils.metrics import LLM_FALLBACKS, span
+from utils.sessions import sessions
+from utils.storage import StorageService
+
+
+STATUS_PENDING = 'pending'
+STATUS_COMPLETE = 'complete'
+STATUS_FAILED = 'failed'
+
+
+class AnalysisJobQueue:
+    """Bounded worker pool for LLM analyses"""
+
+    def __init__(self, workers: int, max_pending: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analysis')
+        self.workers = workers
+        self.capacity = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        # analysis_id -> Event set when the job completes (this process only)
+        self._events: Dict[str, threading.Event] = {}
+        self._queued = 0
+        self._shed = 0
+        self._recovery: Optional[threading.Thread] = None
+        self._recovery_stop = threading.Event()
+
+    def submit(self, analysis_id: str, user_data: Dict[str, Any], scores: Dict[str, Any],
+               answers: Dict[str, int]):
+        """
+        Queue an analysis
+
+        The session must already hold a pending 'analysis' entry.
+        """
+        with self._lock:
+            self._events[analysis_id] = threading.Event()
+
+        if self._slots.acquire(blocking=False):
+            with self._lock:
+                self._queued += 1
+            self._executor.submit(self._run, analysis_id, user_data, scores, answers, False)
+        else:
+            with self._lock:
+                self._shed += 1
+            # Queue full: answer with the fallback now rather than queueing unboundedly
+            print(f"Analysis queue full, using fallback for {analysis_id}")
+            self._run(analysis_id, user_data, scores, answers, True)
+
+    def _run(self, analysis_id: str, user_data: Dict[str, Any], scores: Dict[str, Any],
+             answers: Dict[str, int], overflow: bool):
+        try:
+            if overflow:
+                LLM_FALLBACKS.inc('queue_full')
+                llm_response = LLMService.fallback_response(scores)
+            else:
+                with span('llm_analysis'):
+                    llm_response = LLMService.analyze_with_fallback(scores)
+
+            self.complete(analysis_id, user_data, scores, answers, llm_response)
+        except Exception as e:
+            print(f"Analysis job {analysis_id} failed: {str(e)}")
+            self.fail(analysis_id, 'Analysis could not be completed')
+        finally:
+            if not overflow:
+                self._slots.release()
+            with self._lock:
+                event = self._events.pop(analysis_id, None)
+            if event is not None:
+                event.set()
+
+    @staticmethod
+    def _claim(analysis_id: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Atomically claim the right to record a pending analysis
+
+        Returns:
+            (whether the caller records the result, the session afterwards).
+            Without a session there is nothing to guard, so the claim succeeds.
+        """
+        claimed = []
+
+        def mark_claimed(session_data):
+            analysis = session_data.get('analysis')
+            if analysis is None or analysis['status'] != STATUS_PENDING or analysis.get('claimed_at'):
+                return
+            analysis['claimed_at'] = datetime.now().isoformat()
+            claimed.append(True)
+
+        session_data = sessions.update(analysis_id, mark_claimed)
+        return bool(claimed) or session_data is None, session_data
+
+    @staticmethod
+    def _release(analysis_id: str):
+        """Give up a claim whose result could not be saved, so ``fail`` can record it"""
+        def mark_released(session_data):
+            analysis = session_data.get('analysis')
+            if analysis is not None:
+                analysis.pop('claimed_at', None)
+
+        sessions.update(analysis_id, mark_released)
+
+    @classmethod
+    def _record(cls, user_data: Dict[str, Any], scores: Dict[str, Any], answers: Dict[str, int],
+                llm_response: Dict[str, str], claimed_id: Optional[str] = None) -> str:
+        try:
+            with span('save_result'):
+                result_id = StorageService.save_result(user_data, scores, llm_response, answers)
+        except Exception:
+            if claimed_id is not None:
+                cls._release(claimed_id)
+            raise
+
+        score_values = {name: data['score'] for name, data in scores.items()}
+        with span('update_statistics'):
+            StorageService.update_statistics(score_values, ScoringService.style_class(scores))
+        return result_id
+
+    @classmethod
+    def complete(cls, analysis_id: str, user_data: Dict[str, Any], scores: Dict[str, Any],
+                 answers: Dict[str, int], llm_response: Dict[str, str]) -> Optional[str]:
+        """
+        Save the result, update statistics and write the analysis into the session
+
+        Returns:
+            The saved result's ID (the earlier one, or None, if the analysis
+            was already recorded as failed)
+        """
+        claimed, session_data = cls._claim(analysis_id)
+        if not claimed:
+            print(f"Analysis {analysis_id} was already recorded")
+            return (session_data.get('analysis') or {}).get('result_id')
+
+        result_id = cls._record(user_data, scores, answers, llm_response, analysis_id)
+
+        def mark_complete(session_data):
+            session_data['analysis'] = {
+                'status': STATUS_COMPLETE,
+                'llm_analysis': llm_response,
+                'result_id': result_id,
+                'completed_at': datetime.now().isoformat()
+            }
+
+        sessions.update(analysis_id, mark_complete)
+        return result_id
+
+    @classmethod
+    def fail(cls, analysis_id: str, error: str) -> Optional[Dict[str, Any]]:
+        """
+        Mark a still-pending analysis failed, with the rule-based fallback, so
+        clients stop waiting for it
+
+        Unless another job already claimed it, the fallback result is saved
+        and counted in the statistics from the user, answers and scores kept
+        in the session.
+
+        Returns:
+            The session's 'analysis' entry afterwards, or None if the session is unknown
+        """
+        try:
+            claimed, session_data = cls._claim(analysis_id)
+        except Exception as e:
+            print(f"Marking analysis {analysis_id} failed did not succeed: {str(e)}")
+            return None
+        analysis = session_data.get('analysis') if session_data else None
+        if analysis is None or analysis['status'] != STATUS_PENDING:
+            return analysis
+
+        scores = analysis.get('scores')
+        llm_response = LLMService.fallback_response(scores) if scores else None
+        result_id = None
+        if claimed and scores:
+            try:
+                result_id = cls._record(session_data['user'], scores, session_data.get('answers', {}),
+                                        llm_response)
+            except Exception as e:
+                print(f"Saving fallback result for analysis {analysis_id} failed: {str(e)}")
+
+        def mark_failed(session_data):
+            analysis = session_data.get('analysis')
+            if analysis is None or analysis['status'] != STATUS_PENDING:
+                return
+            session_data['analysis'] = {
+                'status': STATUS_FAILED,
+                'llm_analysis': llm_response,
+                'result_id': result_id,
+                'error': error,
+                'completed_at': datetime.now().isoformat()
+            }
+
+        try:
+            session_data = sessions.update(analysis_id, mark_failed)
+        except Exception as e:
+            print(f"Marking analysis {analysis_id} failed did not succeed: {str(e)}")
+            return None
+        return session_data.get('analysis') if session_data else None
+
+    @staticmethod
+    def _is_stale(session_data: Dict[str, Any]) -> bool:
+        # A pending job this old is not running anywhere (e.g. lost in a worker restart)
+        try:
+            queued_at = datetime.fromisoformat(session_data['completed_at'])
+        except (KeyError, TypeError, ValueError):
+            return False
+        return (datetime.now() - queued_at).total_seconds() > Config.ANALYSIS_STALE_SECONDS
+
+    @property
+    def pending(self) -> int:
+        """Analyses queued or running in this process"""
+        with self._lock:
+            return len(self._events)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Queue size and counters for health output; 'shed' jobs overflowed to the fallback"""
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'capacity': self.capacity,
+                'pending': len(self._events),
+                'queued': self._queued,
+                'shed': self._shed
+            }
+
+    def wait(self, analysis_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Wait up to ``timeout`` seconds for an analysis to complete
+
+        A pending analysis that this process is not running and that is older
+        than ANALYSIS_STALE_SECONDS is marked failed (with the fallback
+        analysis) instead of being waited for.
+
+        Returns:
+            The session's 'analysis' entry, or None if the session is unknown
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            event = self._events.get(analysis_id)
+        if event is not None:
+            event.wait(timeout)
+
+        while True:
+            session_data = sessions.get(analysis_id)
+            analysis = session_data.get('analysis') if session_data else None
+            if analysis is None or analysis['status'] != STATUS_PENDING:
+                return analysis
+            if event is None and self._is_stale(session_data):
+                return self.fail(analysis_id, 'Analysis was interrupted')
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return analysis
+            # Job is running in another worker: poll the shared session store
+            time.sleep(min(Config.ANALYSIS_POLL_INTERVAL, remaining))
+
+    def recover_stale(self) -> int:
+        """
+        Mark failed (and record) every stale pending analysis not running in this process
+
+        Returns:
+            How many analyses were marked failed
+        """
+        recovered = 0
+        for analysis_id, session_data in sessions.pending_analyses():
+            with self._lock:
+                running = analysis_id in self._events
+            if not running and self._is_stale(session_data):
+                self.fail(analysis_id, 'Analysis was interrupted')
+                recovered += 1
+        return recovered
+
+    def start_recovery(self, interval: float):
+        """Run ``recover_stale`` every ``interval`` seconds on a daemon thread"""
+        if interval <= 0 or self._recovery is not None:
+            return
+        self._recovery = threading.Thread(target=self._recovery_loop, args=(interval,),
+                                          name='analysis-recovery', daemon=True)
+        self._recovery.start()
+
+    def _recovery_loop(self, interval: float):
+        while not self._recovery_stop.wait(interval):
+            try:
+                recovered = self.recover_stale()
+                if recovered:
+                    print(f"Recovered {recovered} interrupted analyses with the fallback")
+            except Exception as e:
+                print(f"Analysis recovery failed: {str(e)}")
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting jobs and optionally wait for running ones"""
+        self._recovery_stop.set()
+        self._executor.shutdown(wait=wait)
+
+
+analysis_jobs = AnalysisJobQueue(Config.ANALYSIS_WORKERS, Config.ANALYSIS_QUEUE_SIZE)
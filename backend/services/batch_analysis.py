@@ -0,0 +1,233 @@
+"""
+Batched LLM re-analysis of stored results
+
+Regenerating ``llm_analysis`` one chat completion per respondent is slow and
+expensive. ``BatchAnalyzer`` instead:
+
+1. scans the results log and dedupes results by score profile,
+2. packs up to ``batch_size`` distinct profiles into a single chat completion
+   that returns one analysis per profile ID,
+3. runs at most ``concurrency`` of those requests at a time,
+4. appends every finished profile to a JSON Lines checkpoint, so an interrupted
+   run resumes where it stopped, and
+5. writes the new analysis back to every result sharing that profile as an
+   update record in the results log (also checkpointed).
+"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from config import Config
+from services.analysis_cache import profile_key
+from services.llm_client import llm_clients
+from utils.results_store import ResultsLog
+
+
+class BatchCheckpoint:
+    """
+    Append-only record of finished profiles and written-back results
+
+    Written-back results are keyed by (result ID, profile key). The profile key
+    includes the model and prompt version, so after either changes the new
+    analysis is written back over the old one.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.analyses: Dict[str, Dict[str, str]] = {}
+        self.written: set = set()
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            complete = 0
+            with open(path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # torn final line from an interrupted run
+                    complete += len(line)
+                    try:
+                        entry = json.loads(line)
+                        if 'profile' in entry:
+                            self.analyses[entry['profile']] = entry['analysis']
+                        else:
+                            self.written.add((entry['written'], entry.get('for')))
+                    except (ValueError, KeyError, TypeError):
+                        print(f"Skipping unreadable checkpoint line in {path}")
+            if complete < os.path.getsize(path):
+                # Drop the torn line so the next entry starts on a line of its own
+                os.truncate(path, complete)
+
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _append(self, entry: Dict[str, Any]):
+        with self._lock:
+            self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def add_analysis(self, key: str, analysis: Dict[str, str]):
+        self.analyses[key] = analysis
+        self._append({'profile': key, 'analysis': analysis})
+
+    def add_written(self, result_id: str, key: str):
+        self.written.add((result_id, key))
+        self._append({'written': result_id, 'for': key})
+
+    def close(self):
+        self._file.close()
+
+
+class BatchAnalyzer:
+    """Re-generates LLM analyses for stored results in packed batches"""
+
+    # Bump whenever BATCH_SYSTEM_PROMPT or _create_batch_prompt changes
+    PROMPT_VERSION = 1
+
+    BATCH_SYSTEM_PROMPT = (
+        "You are an expert driving instructor analyzing drivers' assessment results. "
+        "For every driver profile you are given, provide clear, constructive feedback about their "
+        "driving style and recommend an appropriate improvement course. Return JSON of the form "
+        "{\"results\": [{\"id\": ..., \"driving_style\": ..., \"recommended_course\": ...}]} with exactly "
+        "one entry per profile ID: 'driving_style' (2-3 sentences) and 'recommended_course' "
+        "(specific course name and brief description)."
+    )
+
+    def __init__(self, results_log: ResultsLog, checkpoint_path: str,
+                 batch_size: int, concurrency: int):
+        self.results_log = results_log
+        self.checkpoint = BatchCheckpoint(checkpoint_path)
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.model = Config.OPENAI_MODEL
+
+    def collect_profiles(self, records: Iterable[Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]],
+                                                                          Dict[str, List[str]]]:
+        """
+        Dedupe results by score profile
+
+        Returns:
+            Tuple of (profile key -> scores, profile key -> result IDs)
+        """
+        profiles: Dict[str, Dict[str, Any]] = {}
+        members: Dict[str, List[str]] = {}
+        for record in records:
+            scores = record.get('scores')
+            if not scores:
+                continue
+            key = profile_key(scores, self.model, self.PROMPT_VERSION)
+            profiles.setdefault(key, scores)
+            members.setdefault(key, []).append(record['id'])
+        return profiles, members
+
+    @staticmethod
+    def _create_batch_prompt(batch: List[Tuple[str, Dict[str, Any]]]) -> str:
+        lines = ["Analyze each of these driver profiles (scores are out of 4.0):\n"]
+        for profile_id, scores in batch:
+            domains = "; ".join(
+                f"{domain_name}: {data['score']:.2f} ({data['category']} - {data['category_label']})"
+                for domain_name, data in scores.items()
+            )
+            lines.append(f"[{profile_id}] {domains}")
+        lines.append(
+            "\nConsider each driver's strengths and areas for improvement. "
+            "Be constructive and encouraging."
+        )
+        return "\n".join(lines)
+
+    def analyze_batch(self, batch: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Dict[str, str]]:
+        """
+        Analyze a batch of (profile key, scores) in one chat completion
+
+        Returns:
+            Profile key -> analysis for every profile the model answered validly
+        """
+        # Short positional IDs keep the prompt small; map them back afterwards
+        local_ids = {str(i + 1): key for i, (key, _) in enumerate(batch)}
+        prompt = self._create_batch_prompt([(str(i + 1), scores) for i, (_, scores) in enumerate(batch)])
+
+        client = llm_clients.get()
+        response = llm_clients.call_with_retries(lambda timeout: client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": self.BATCH_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+            response_format={"type": "json_object"},
+            timeout=timeout
+        ))
+
+        content = json.loads(response.choices[0].message.content)
+        analyses = {}
+        for item in content.get('results', []):
+            key = local_ids.get(str(item.get('id')))
+            if key and item.get('driving_style') and item.get('recommended_course'):
+                analyses[key] = {
+                    'driving_style': item['driving_style'],
+                    'recommended_course': item['recommended_course']
+                }
+        return analyses
+
+    def run(self, limit: Optional[int] = None) -> Dict[str, int]:
+        """
+        Re-analyze all stored results (resuming from the checkpoint)
+
+        Args:
+            limit: Optional maximum number of new profiles to analyze this run
+
+        Returns:
+            Counters describing the run
+        """
+        profiles, members = self.collect_profiles(self.results_log.iter_records())
+        pending = [(key, scores) for key, scores in profiles.items() if key not in self.checkpoint.analyses]
+        if limit is not None:
+            pending = pending[:limit]
+        batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+
+        analyzed = 0
+        failed_batches = 0
+        missing = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='batch-analysis') as pool:
+            futures = {pool.submit(self.analyze_batch, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    analyses = future.result()
+                except Exception as e:
+                    print(f"Batch of {len(batch)} profiles failed: {str(e)}")
+                    failed_batches += 1
+                    continue
+                for key, analysis in analyses.items():
+                    self.checkpoint.add_analysis(key, analysis)
+                analyzed += len(analyses)
+                missing += len(batch) - len(analyses)
+
+        written = 0
+        for key, result_ids in members.items():
+            analysis = self.checkpoint.analyses.get(key)
+            if analysis is None:
+                continue
+            for result_id in result_ids:
+                if (result_id, key) in self.checkpoint.written:
+                    continue
+                self.results_log.append_update(result_id, {
+                    'llm_analysis': analysis,
+                    'analysis_prompt_version': self.PROMPT_VERSION
+                })
+                self.checkpoint.add_written(result_id, key)
+                written += 1
+        self.results_log.sync()
+
+        return {
+            'results': sum(len(ids) for ids in members.values()),
+            'profiles': len(profiles),
+            'analyzed': analyzed,
+            'requests': len(batches),
+            'failed_batches': failed_batches,
+            'unanswered_profiles': missing,
+            'written_back': written
+        }
+
+    def close(self):
+        self.checkpoint.close()
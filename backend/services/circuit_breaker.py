@@ -0,0 +1,90 @@
+"""Circuit breaker for calls to external services"""
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    Classic three-state circuit breaker
+
+    closed:    calls go through; ``failure_threshold`` consecutive failures open it
+    open:      calls are rejected immediately for ``reset_timeout`` seconds
+    half_open: one probe call is let through; success closes the circuit,
+               failure opens it again
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._last_failure: Optional[str] = None
+        self._rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Return True if a call may be attempted now"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self._rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self, error: Optional[BaseException] = None):
+        with self._lock:
+            self._failures += 1
+            self._last_failure = f"{type(error).__name__}: {error}" if error else None
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        """State summary for health output"""
+        with self._lock:
+            state = self._current_state()
+            snapshot = {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'rejected_calls': self._rejected,
+                'last_failure': self._last_failure
+            }
+            if state == OPEN:
+                retry_in = self.reset_timeout - (time.monotonic() - self._opened_at)
+                snapshot['retry_in_seconds'] = round(max(retry_in, 0), 1)
+                snapshot['opened_at'] = datetime.fromtimestamp(
+                    time.time() - (time.monotonic() - self._opened_at)
+                ).isoformat()
+            return snapshot
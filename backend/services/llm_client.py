@@ -0,0 +1,119 @@
+"""
+Shared OpenAI client
+
+One ``OpenAI`` client per process, backed by a tuned ``httpx`` connection pool
+(keep-alive, connection limits, timeouts), is created on first use and reused
+by every request, so submissions no longer pay for TLS and connection setup.
+
+Retries are done here with exponential backoff and jitter from ``Config``
+instead of the SDK's built-in retry loop. ``Config.OPENAI_BASE_URL`` points the
+client at another endpoint, e.g. a local stub server.
+"""
+import os
+import random
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+import httpx
+import openai
+from openai import OpenAI
+from config import Config
+
+
+T = TypeVar('T')
+
+# Errors worth retrying: network problems, timeouts, throttling, 5xx
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class LLMClientManager:
+    """Lazily creates and caches the process-wide OpenAI client"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client: Optional[OpenAI] = None
+        self._pid: Optional[int] = None
+
+    def get(self) -> OpenAI:
+        """Return the shared client, creating it on first use"""
+        client = self._client
+        # A forked worker must not reuse the parent's sockets
+        if client is not None and self._pid == os.getpid():
+            return client
+
+        with self._lock:
+            if self._client is None or self._pid != os.getpid():
+                if not Config.OPENAI_API_KEY:
+                    raise ValueError("OPENAI_API_KEY not set in environment variables")
+                self._client = self._create_client()
+                self._pid = os.getpid()
+            return self._client
+
+    @staticmethod
+    def _create_client() -> OpenAI:
+        http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=Config.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=Config.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=Config.LLM_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(Config.LLM_TIMEOUT_SECONDS, connect=Config.LLM_CONNECT_TIMEOUT_SECONDS)
+        )
+        return OpenAI(
+            api_key=Config.OPENAI_API_KEY,
+            base_url=Config.OPENAI_BASE_URL,
+            max_retries=0,
+            timeout=httpx.Timeout(Config.LLM_TIMEOUT_SECONDS, connect=Config.LLM_CONNECT_TIMEOUT_SECONDS),
+            http_client=http_client
+        )
+
+    def close(self):
+        """Close the pooled connections (on shutdown)"""
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._pid = None
+
+    @staticmethod
+    def call_with_retries(call: Callable[[float], T], budget: Optional[float] = None) -> T:
+        """
+        Run an API call, retrying transient failures with exponential backoff
+
+        Args:
+            call: Function performing the request, given the timeout (seconds)
+                  to use for this attempt
+            budget: Total seconds allowed across all attempts and backoff;
+                    defaults to Config.LLM_TIMEOUT_SECONDS per attempt
+
+        Returns:
+            Whatever ``call`` returns; the last error is raised once retries
+            or the latency budget run out
+        """
+        deadline = time.monotonic() + budget if budget is not None else None
+        attempt = 0
+        while True:
+            timeout = Config.LLM_TIMEOUT_SECONDS
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.monotonic())
+                if timeout <= 0:
+                    raise openai.APITimeoutError(request=httpx.Request('POST', 'llm'))
+            try:
+                return call(timeout)
+            except RETRYABLE_ERRORS:
+                if attempt >= Config.LLM_MAX_RETRIES:
+                    raise
+                delay = min(Config.LLM_RETRY_BACKOFF_BASE * (2 ** attempt), Config.LLM_RETRY_BACKOFF_MAX)
+                delay *= random.uniform(0.5, 1.0)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    # No budget left for another attempt
+                    raise
+                time.sleep(delay)
+                attempt += 1
+
+
+llm_clients = LLMClientManager()
@@ -1,20 +1,50 @@
 import json
-from typing import Dict, Any
-from openai import OpenAI
+import time
+from typing import Any, Dict, Iterator, List, Tuple
 from config import Config
+from services.llm_client import llm_clients
+from services.analysis_cache import get_analysis_cache
+from services.circuit_breaker import CircuitBreaker
+from utils.metrics import LLM_CACHE_LOOKUPS, LLM_FALLBACKS, span
+
+
+# Shared by every request in this process: once the provider keeps failing,
+# submissions get the rule-based fallback instantly instead of waiting
+llm_breaker = CircuitBreaker(
+    'llm',
+    failure_threshold=Config.LLM_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=Config.LLM_BREAKER_RESET_SECONDS
+)
 
 
 class LLMService:
     """Handle LLM integration for driving style analysis"""
     
+    # Bump whenever the system prompt or _create_prompt changes, so cached
+    # analyses produced by the old prompt are no longer served
+    PROMPT_VERSION = 1
+    
     def __init__(self):
-        """Initialize OpenAI client"""
-        if not Config.OPENAI_API_KEY:
-            raise ValueError("OPENAI_API_KEY not set in environment variables")
-        
-        self.client = OpenAI(api_key=Config.OPENAI_API_KEY)
+        """Attach the shared, pooled OpenAI client"""
+        self.client = llm_clients.get()
         self.model = Config.OPENAI_MODEL
     
+    @classmethod
+    def analyze_with_fallback(cls, scores: Dict[str, Any]) -> Dict[str, str]:
+        """
+        Get an analysis, using the rule-based fallback if the LLM is unavailable
+        
+        Never raises; covers a missing API key as well as provider errors.
+        """
+        try:
+            llm_service = cls()
+        except ValueError as e:
+            # If OpenAI API key not set, use fallback
+            print(f"LLM service error: {str(e)}")
+            LLM_FALLBACKS.inc('no_api_key')
+            return cls.fallback_response(scores)
+        return llm_service.analyze_driving_profile(scores)
+    
     def analyze_driving_profile(self, scores: Dict[str, Any]) -> Dict[str, str]:
         """
         Send scores to LLM and get driving style analysis
@@ -25,43 +55,180 @@ class LLMService:
         Returns:
             Dictionary with 'driving_style' and 'recommended_course'
         """
+        cache = get_analysis_cache()
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.key(scores, self.model, self.PROMPT_VERSION)
+            cached = cache.get(cache_key)
+            LLM_CACHE_LOOKUPS.inc('hit' if cached is not None else 'miss')
+            if cached is not None:
+                return cached
+        
         prompt = self._create_prompt(scores)
         
+        if not llm_breaker.allow_request():
+            LLM_FALLBACKS.inc('circuit_open')
+            return self.fallback_response(scores)
+        
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert driving instructor analyzing a driver's assessment results. "
-                                 "Provide clear, constructive feedback about their driving style and recommend "
-                                 "an appropriate improvement course. Return your response as JSON with two fields: "
-                                 "'driving_style' (2-3 sentences) and 'recommended_course' (specific course name and brief description)."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.7,
-                response_format={"type": "json_object"}
-            )
-            
-            content = response.choices[0].message.content
-            result = json.loads(content)
-            
-            # Validate response has required fields
-            if 'driving_style' not in result or 'recommended_course' not in result:
-                return self._get_fallback_response(scores)
+            with span('llm_call'):
+                response = llm_clients.call_with_retries(lambda timeout: self.client.chat.completions.create(
+                    model=self.model,
+                    messages=self._messages(prompt),
+                    temperature=0.7,
+                    response_format={"type": "json_object"},
+                    timeout=timeout
+                ), budget=Config.LLM_LATENCY_BUDGET_SECONDS)
+        except Exception as e:
+            llm_breaker.record_failure(e)
+            print(f"Error calling LLM: {str(e)}")
+            LLM_FALLBACKS.inc('error')
+            return self.fallback_response(scores)
+        
+        llm_breaker.record_success()
+        
+        try:
+            analysis = self._parse_analysis(response.choices[0].message.content)
+        except Exception as e:
+            print(f"Invalid LLM response: {str(e)}")
+            LLM_FALLBACKS.inc('invalid_response')
+            return self.fallback_response(scores)
+        
+        # Only real LLM answers are cached, never the fallback
+        if cache_key is not None:
+            cache.put(cache_key, analysis)
+        
+        return analysis
+    
+    @classmethod
+    def stream_with_fallback(cls, scores: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+        """
+        Stream an analysis, using the rule-based fallback if the LLM is unavailable
+        
+        Yields ('token', text) for each piece of the completion as it arrives,
+        then exactly one ('analysis', result) or ('fallback', result). Never raises.
+        """
+        try:
+            llm_service = cls()
+        except ValueError as e:
+            print(f"LLM service error: {str(e)}")
+            LLM_FALLBACKS.inc('no_api_key')
+            yield 'fallback', cls.fallback_response(scores)
+            return
+        yield from llm_service.stream_driving_profile(scores)
+    
+    def stream_driving_profile(self, scores: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+        """
+        Streaming variant of analyze_driving_profile
+        
+        Tokens already yielded are superseded by the final event: if the stream
+        breaks or the completion is not a valid analysis, that event is the
+        rule-based fallback. Closing the generator early closes the LLM stream.
+        
+        Args:
+            scores: Dictionary of domain scores and categories
             
-            return {
-                'driving_style': result['driving_style'],
-                'recommended_course': result['recommended_course']
-            }
+        Yields:
+            ('token', text)... then ('analysis', result) or ('fallback', result)
+        """
+        cache = get_analysis_cache()
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.key(scores, self.model, self.PROMPT_VERSION)
+            cached = cache.get(cache_key)
+            LLM_CACHE_LOOKUPS.inc('hit' if cached is not None else 'miss')
+            if cached is not None:
+                yield 'analysis', cached
+                return
+        
+        prompt = self._create_prompt(scores)
+        
+        if not llm_breaker.allow_request():
+            LLM_FALLBACKS.inc('circuit_open')
+            yield 'fallback', self.fallback_response(scores)
+            return
+        
+        stream = None
+        parts = []
+        try:
+            # Retries and the latency budget cover opening the stream (time to first byte)
+            with span('llm_stream_open'):
+                stream = llm_clients.call_with_retries(lambda timeout: self.client.chat.completions.create(
+                    model=self.model,
+                    messages=self._messages(prompt),
+                    temperature=0.7,
+                    response_format={"type": "json_object"},
+                    stream=True,
+                    timeout=timeout
+                ), budget=Config.LLM_LATENCY_BUDGET_SECONDS)
+            llm_breaker.record_success()
             
+            deadline = time.monotonic() + Config.LLM_TIMEOUT_SECONDS
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    text = chunk.choices[0].delta.content
+                    parts.append(text)
+                    yield 'token', text
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"LLM stream exceeded {Config.LLM_TIMEOUT_SECONDS}s")
         except Exception as e:
-            print(f"Error calling LLM: {str(e)}")
-            return self._get_fallback_response(scores)
+            llm_breaker.record_failure(e)
+            print(f"Error streaming from LLM: {str(e)}")
+            LLM_FALLBACKS.inc('stream_error')
+            yield 'fallback', self.fallback_response(scores)
+            return
+        finally:
+            if stream is not None:
+                stream.close()
+        
+        try:
+            analysis = self._parse_analysis(''.join(parts))
+        except Exception as e:
+            print(f"Invalid LLM response: {str(e)}")
+            LLM_FALLBACKS.inc('invalid_response')
+            yield 'fallback', self.fallback_response(scores)
+            return
+        
+        if cache_key is not None:
+            cache.put(cache_key, analysis)
+        
+        yield 'analysis', analysis
+    
+    @staticmethod
+    def _messages(prompt: str) -> List[Dict[str, str]]:
+        """Chat messages for an analysis request"""
+        return [
+            {
+                "role": "system",
+                "content": "You are an expert driving instructor analyzing a driver's assessment results. "
+                         "Provide clear, constructive feedback about their driving style and recommend "
+                         "an appropriate improvement course. Return your response as JSON with two fields: "
+                         "'driving_style' (2-3 sentences) and 'recommended_course' (specific course name and brief description)."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+    
+    @staticmethod
+    def _parse_analysis(content: str) -> Dict[str, str]:
+        """
+        Extract the analysis from a completion
+        
+        Raises:
+            ValueError: if the content is not JSON or lacks a required field
+        """
+        result = json.loads(content)
+        
+        # Validate response has required fields
+        if not isinstance(result, dict) or 'driving_style' not in result or 'recommended_course' not in result:
+            raise ValueError("response is missing 'driving_style' or 'recommended_course'")
+        
+        return {
+            'driving_style': result['driving_style'],
+            'recommended_course': result['recommended_course']
+        }
     
     def _create_prompt(self, scores: Dict[str, Any]) -> str:
         """
@@ -92,7 +259,8 @@ class LLMService:
         
         return "\n".join(prompt_parts)
     
-    def _get_fallback_response(self, scores: Dict[str, Any]) -> Dict[str, str]:
+    @staticmethod
+    def fallback_response(scores: Dict[str, Any]) -> Dict[str, str]:
         """
         Generate a rule-based fallback response if LLM fails
         
@@ -1,5 +1,7 @@
-from typing import Dict, List, Any, Tuple
-from config import Config
+from typing import Dict, List, Any, Sequence, Tuple
+import numpy as np
+from services.thresholds import THRESHOLDS
+from utils.validation import AnswerSchema
 
 
 class ScoringService:
@@ -68,6 +70,31 @@ class ScoringService:
         
         return results
     
+    @staticmethod
+    def calculate_scores_batch(answer_sets: Sequence[Dict[str, int]],
+                               questionnaire=None) -> List[Dict[str, Any]]:
+        """
+        Calculate domain scores for many respondents at once
+        
+        Produces exactly the same output as calling ``calculate_scores`` on
+        each answer set, but does the work with a handful of NumPy operations.
+        
+        Args:
+            answer_sets: Sequence of answer dictionaries (question ID -> 1-4)
+            questionnaire: Compiled questionnaire (defaults to the cached one)
+            
+        Returns:
+            List of score dictionaries, one per answer set
+            
+        Raises:
+            ValueError: if any answer is not an integer from 1 to 4
+        """
+        if questionnaire is None:
+            from utils.questionnaire_loader import get_questionnaire
+            questionnaire = get_questionnaire()
+        
+        return BatchScorer.for_questionnaire(questionnaire).score(answer_sets)
+    
     @staticmethod
     def _categorize_score(domain_key: str, score: float) -> Dict[str, str]:
         """
@@ -80,26 +107,28 @@ class ScoringService:
         Returns:
             Dictionary with category level and label
         """
-        thresholds = Config.DOMAIN_THRESHOLDS.get(domain_key, {})
-        
-        # Check against thresholds
-        for category, (min_val, max_val, label) in thresholds.items():
-            if min_val <= score <= max_val:
-                return {
-                    'category': category.capitalize(),
-                    'label': label
-                }
+        return THRESHOLDS.categorize(domain_key, score)
+    
+    @staticmethod
+    def style_class(scores: Dict[str, Any]) -> str:
+        """
+        Map calculated scores to one of the fixed driver style classes
         
-        # Default fallback
-        return {
-            'category': 'Unknown',
-            'label': 'Unknown'
-        }
+        Args:
+            scores: Output of calculate_scores
+            
+        Returns:
+            Style class name, e.g. 'low_spatial_awareness' (see THRESHOLDS.style_classes)
+        """
+        return THRESHOLDS.style_class({data['domain_key']: data['score'] for data in scores.values()})
     
     @staticmethod
     def validate_answers(answers: Dict[str, int], sections: List[Dict[str, Any]]) -> Tuple[bool, str]:
         """
-        Validate that all questions have been answered
+        Validate that every question has exactly one answer in range 1-4
+        
+        Request handlers use the cached AnswerSchema of the compiled
+        questionnaire instead; this builds the rules from the given sections.
         
         Args:
             answers: User's answers dictionary
@@ -108,18 +137,8 @@ class ScoringService:
         Returns:
             Tuple of (is_valid, error_message)
         """
-        total_questions = sum(len(section['questions']) for section in sections)
-        answered_questions = len(answers)
-        
-        if answered_questions < total_questions:
-            return False, f"Only {answered_questions} of {total_questions} questions answered"
-        
-        # Validate answer values are in range 1-4
-        for q_id, value in answers.items():
-            if not isinstance(value, int) or value < 1 or value > 4:
-                return False, f"Invalid answer value for question {q_id}: {value}"
-        
-        return True, ""
+        error = AnswerSchema.from_sections(sections).check_complete(answers)
+        return error is None, error or ""
     
     @staticmethod
     def prepare_llm_input(scores: Dict[str, Any]) -> str:
@@ -140,3 +159,123 @@ class ScoringService:
             lines.append(f"{domain_name}: {score:.2f} ({category} - {label})")
         
         return "\n".join(lines)
+
+
+class BatchScorer:
+    """
+    Precomputed matrices for vectorized scoring of one questionnaire version
+    
+    ``membership`` is a (questions x domains) 0/1 matrix and ``reverse_mask``
+    flags reverse-scored questions. Domain means are looked up in a table of
+    ``round(sum / count, 2)`` so results match the scalar path bit for bit.
+    """
+    
+    MAX_ANSWER = 4
+    
+    _cache: Dict[str, 'BatchScorer'] = {}
+    
+    def __init__(self, sections: List[Dict[str, Any]]):
+        domains = []
+        question_ids = []
+        columns = []
+        reverse = []
+        
+        for section in sections:
+            domain_key = ScoringService.DOMAIN_MAP.get(section['name'])
+            if not domain_key:
+                continue
+            domains.append((section['name'], domain_key))
+            for question in section['questions']:
+                question_ids.append(question['id'])
+                columns.append(len(domains) - 1)
+                reverse.append(bool(question.get('reverse', False)))
+        
+        self.domains = domains
+        self.question_position = {q_id: i for i, q_id in enumerate(question_ids)}
+        self.reverse_mask = np.array(reverse, dtype=bool)
+        self.membership = np.zeros((len(question_ids), len(domains)), dtype=np.int64)
+        self.membership[np.arange(len(question_ids)), columns] = 1
+        
+        # mean_table[count, total] == round(total / count, 2), same as Python
+        max_count = int(self.membership.sum(axis=0).max()) if domains else 0
+        self.mean_table = np.zeros((max_count + 1, max_count * self.MAX_ANSWER + 1))
+        for count in range(1, max_count + 1):
+            for total in range(count * self.MAX_ANSWER + 1):
+                self.mean_table[count, total] = round(total / count, 2)
+    
+    @classmethod
+    def for_questionnaire(cls, questionnaire) -> 'BatchScorer':
+        """Return the cached scorer for a compiled questionnaire version"""
+        scorer = cls._cache.get(questionnaire.content_hash)
+        if scorer is None:
+            scorer = cls(questionnaire.sections)
+            cls._cache = {questionnaire.content_hash: scorer}
+        return scorer
+    
+    def answer_matrix(self, answer_sets: Sequence[Dict[str, int]]) -> np.ndarray:
+        """
+        Pack answer dictionaries into a (respondents x questions) matrix, 0 = missing
+        
+        Raises:
+            ValueError: for a non-integer or out-of-range answer (the scalar path
+                        would score 2.5 as 2.5, so it is rejected, not truncated)
+        """
+        question_ids = list(self.question_position)
+        try:
+            values = np.array(
+                [[answers.get(q_id, 0) for q_id in question_ids] for answers in answer_sets],
+                dtype=np.float64
+            ).reshape(len(answer_sets), len(question_ids))
+        except TypeError as e:
+            raise ValueError(f"Answer values must be integers: {e}") from e
+        
+        # NaN (e.g. a null answer) fails the integer check as well
+        if (values != np.floor(values)).any():
+            raise ValueError("Answer values must be integers")
+        if ((values < 0) | (values > self.MAX_ANSWER)).any():
+            raise ValueError(f"Answer values must be between 1 and {self.MAX_ANSWER}")
+        return values.astype(np.int64)
+    
+    def domain_means(self, matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Compute rounded domain means from an answer matrix
+        
+        Returns:
+            Tuple of (means, answered_counts), both (respondents x domains)
+        """
+        answered = (matrix > 0).astype(np.int64)
+        scored = np.where(self.reverse_mask, (self.MAX_ANSWER + 1) - matrix, matrix) * answered
+        totals = scored @ self.membership
+        counts = answered @ self.membership
+        return self.mean_table[counts, totals], counts
+    
+    def categorize(self, domain_key: str, means: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Vectorized equivalent of ScoringService._categorize_score"""
+        if domain_key not in THRESHOLDS:
+            unknown = np.full(means.shape, 'Unknown', dtype=object)
+            return unknown, unknown.copy()
+        return THRESHOLDS[domain_key].categorize_array(means)
+    
+    def score(self, answer_sets: Sequence[Dict[str, int]]) -> List[Dict[str, Any]]:
+        """Score a batch of answer sets; see ScoringService.calculate_scores_batch"""
+        means, counts = self.domain_means(self.answer_matrix(answer_sets))
+        
+        columns = []
+        for col, (section_name, domain_key) in enumerate(self.domains):
+            categories, labels = self.categorize(domain_key, means[:, col])
+            columns.append((section_name, domain_key, means[:, col].tolist(),
+                            counts[:, col].tolist(), categories, labels))
+        
+        results = []
+        for row in range(len(answer_sets)):
+            result = {}
+            for section_name, domain_key, col_means, col_counts, categories, labels in columns:
+                if col_counts[row]:
+                    result[section_name] = {
+                        'score': col_means[row],
+                        'category': categories[row],
+                        'category_label': labels[row],
+                        'domain_key': domain_key
+                    }
+            results.append(result)
+        return results
@@ -0,0 +1,319 @@
+"""
+Offline rebuild of statistics from the results archive
+
+The archive (``Config.RESULTS_DIR``: legacy ``*.json`` files and
+``seg-*.jsonl`` segments) is split into work units by a generator: batches
+of legacy files, and segments cut into byte ranges of about ``chunk_bytes``
+(a range owns every line that starts inside it). Units are fanned out to a
+process pool with a bounded number in flight; each worker parses its lines,
+re-scores the raw answers with ``BatchScorer`` and returns a
+``PartialAggregate``. Partials are merged as they arrive, so memory stays
+flat however large the archive is.
+
+Everything in a partial is a count or an exact integer sum (scores are kept
+in hundredths), so the merged result does not depend on how the archive was
+split or in which order workers finish.
+"""
+import glob
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from services.scoring_service import BatchScorer, ScoringService
+from services.thresholds import ALL_ROUND, SCORE_MIN, THRESHOLDS, UNCLASSIFIED
+from utils import json_codec
+from utils.questionnaire_loader import get_questionnaire
+from utils.results_store import UPDATE
+from utils.statistics import (HISTOGRAM_BUCKETS, HISTOGRAM_WIDTH, bucket_index, build_snapshot,
+                              style_key)
+
+
+# Work unit: ('files', [paths]) or ('segment', path, start, end)
+Task = Tuple[Any, ...]
+
+LEGACY_FILES_PER_TASK = 500
+
+
+class PartialAggregate:
+    """Mergeable statistics over part of the archive"""
+
+    def __init__(self):
+        self.completions = 0
+        self.score_sums_centi: Dict[str, int] = {}
+        self.score_counts: Dict[str, int] = {}
+        self.histograms: Dict[str, List[int]] = {}
+        self.driver_styles: Dict[str, int] = {}
+        self.last_updated: Optional[str] = None
+        self.bytes_read = 0
+        self.rescored = 0
+        self.invalid = 0
+
+    def add(self, scores: Dict[str, Any], timestamp: Optional[str]):
+        """Count one result's scores (calculate_scores format)"""
+        self.completions += 1
+        domain_scores = {}
+        for domain, data in scores.items():
+            score = data['score']
+            self.score_sums_centi[domain] = self.score_sums_centi.get(domain, 0) + round(score * 100)
+            self.score_counts[domain] = self.score_counts.get(domain, 0) + 1
+            histogram = self.histograms.get(domain)
+            if histogram is None:
+                histogram = self.histograms[domain] = [0] * HISTOGRAM_BUCKETS
+            histogram[bucket_index(score)] += 1
+            domain_key = data.get('domain_key') or ScoringService.DOMAIN_MAP.get(domain)
+            if domain_key:
+                domain_scores[domain_key] = score
+        style = style_key(THRESHOLDS.style_class(domain_scores))
+        self.driver_styles[style] = self.driver_styles.get(style, 0) + 1
+        if timestamp and (self.last_updated is None or timestamp > self.last_updated):
+            self.last_updated = timestamp
+
+    def add_matrix(self, scorer: BatchScorer, matrix: np.ndarray, timestamps: List[Optional[str]]):
+        """
+        Count a batch of answer sets re-scored with ``scorer``: the vectorized
+        equivalent of calling ``add`` with each row's calculate_scores output.
+        Every row must have at least one answered domain.
+        """
+        means, counts = scorer.domain_means(matrix)
+        answered = counts > 0
+        self.completions += len(matrix)
+
+        # Weakest domain below its top band, compared as (band, score) in
+        # THRESHOLDS order like CompiledThresholds.style_class
+        weakest_keys = []
+        weakest_bands = []
+        classified = np.zeros(len(matrix), dtype=bool)
+        for domain_key, domain in THRESHOLDS.domains.items():
+            column = next((i for i, (_, key) in enumerate(scorer.domains) if key == domain_key), None)
+            if column is None:
+                continue
+            known = answered[:, column]
+            classified |= known
+            bands = np.clip(np.searchsorted(domain.lower_bounds, means[:, column], side='right') - 1,
+                            0, len(domain.lower_bounds) - 1)
+            below_top = known & (bands < len(domain.categories) - 1)
+            weakest_keys.append(np.where(below_top, bands * 10.0 + means[:, column], np.inf))
+            weakest_bands.append(bands)
+
+        for column, (section_name, _) in enumerate(scorer.domains):
+            scores = means[answered[:, column], column]
+            if not len(scores):
+                continue
+            self.score_sums_centi[section_name] = (self.score_sums_centi.get(section_name, 0)
+                                                   + int(np.rint(scores * 100).sum()))
+            self.score_counts[section_name] = self.score_counts.get(section_name, 0) + len(scores)
+            buckets = np.clip(np.rint((scores - SCORE_MIN) / HISTOGRAM_WIDTH), 0, HISTOGRAM_BUCKETS - 1)
+            added = np.bincount(buckets.astype(np.int64), minlength=HISTOGRAM_BUCKETS)
+            histogram = self.histograms.get(section_name)
+            if histogram is None:
+                histogram = self.histograms[section_name] = [0] * HISTOGRAM_BUCKETS
+            for i, count in enumerate(added.tolist()):
+                histogram[i] += count
+
+        styles: Dict[str, int] = {}
+        if weakest_keys:
+            keys = np.column_stack(weakest_keys)
+            weakest = keys.argmin(axis=1)
+            has_weakest = np.isfinite(keys[np.arange(len(keys)), weakest])
+            bands = np.column_stack(weakest_bands)[np.arange(len(keys)), weakest]
+            domain_keys = [key for key in THRESHOLDS.domains
+                           if any(key == domain_key for _, domain_key in scorer.domains)]
+            codes, code_counts = np.unique(weakest[has_weakest] * 64 + bands[has_weakest], return_counts=True)
+            for code, count in zip(codes.tolist(), code_counts.tolist()):
+                domain_key = domain_keys[code // 64]
+                name = f"{THRESHOLDS[domain_key].categories[code % 64].lower()}_{domain_key}"
+                styles[name] = styles.get(name, 0) + count
+            all_round = int((~has_weakest & classified).sum())
+        else:
+            all_round = 0
+        if all_round:
+            styles[ALL_ROUND] = all_round
+        unclassified = int((~classified).sum())
+        if unclassified:
+            styles[UNCLASSIFIED] = unclassified
+        for name, count in styles.items():
+            key = style_key(name)
+            self.driver_styles[key] = self.driver_styles.get(key, 0) + count
+
+        latest = max((t for t in timestamps if t), default=None)
+        if latest and (self.last_updated is None or latest > self.last_updated):
+            self.last_updated = latest
+        self.rescored += len(matrix)
+
+    def merge(self, other: 'PartialAggregate'):
+        """Add another partial's counts into this one"""
+        self.completions += other.completions
+        for domain, total in other.score_sums_centi.items():
+            self.score_sums_centi[domain] = self.score_sums_centi.get(domain, 0) + total
+        for domain, count in other.score_counts.items():
+            self.score_counts[domain] = self.score_counts.get(domain, 0) + count
+        for domain, counts in other.histograms.items():
+            histogram = self.histograms.get(domain)
+            if histogram is None:
+                self.histograms[domain] = list(counts)
+            else:
+                for i, count in enumerate(counts):
+                    histogram[i] += count
+        for style, count in other.driver_styles.items():
+            self.driver_styles[style] = self.driver_styles.get(style, 0) + count
+        if other.last_updated and (self.last_updated is None or other.last_updated > self.last_updated):
+            self.last_updated = other.last_updated
+        self.bytes_read += other.bytes_read
+        self.rescored += other.rescored
+        self.invalid += other.invalid
+
+    def snapshot(self, total_started: int) -> Dict[str, Any]:
+        """Statistics in the statistics.json format"""
+        return build_snapshot(
+            total_started,
+            self.completions,
+            {domain: (self.score_sums_centi[domain] / 100, count) for domain, count in self.score_counts.items()},
+            self.histograms,
+            self.driver_styles,
+            self.last_updated
+        )
+
+
+def iter_tasks(directory: str, chunk_bytes: int) -> Iterator[Task]:
+    """Split the archive into work units"""
+    batch = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+        batch.append(path)
+        if len(batch) >= LEGACY_FILES_PER_TASK:
+            yield ('files', batch)
+            batch = []
+    if batch:
+        yield ('files', batch)
+
+    for path in sorted(glob.glob(os.path.join(directory, 'seg-*.jsonl'))):
+        size = os.path.getsize(path)
+        for start in range(0, size, chunk_bytes):
+            yield ('segment', path, start, min(start + chunk_bytes, size))
+
+
+def _read_lines(path: str, start: int, end: int) -> Iterator[bytes]:
+    """Complete lines starting in [start, end)"""
+    with open(path, 'rb') as f:
+        if start:
+            # Skip the line that began in the previous range
+            f.seek(start - 1)
+            f.readline()
+        position = f.tell()
+        while position < end:
+            line = f.readline()
+            if not line.endswith(b'\n'):
+                # Partially written tail
+                return
+            position += len(line)
+            yield line
+
+
+def _read_task(task: Task) -> Iterator[bytes]:
+    if task[0] == 'files':
+        for path in task[1]:
+            with open(path, 'rb') as f:
+                yield f.read()
+    else:
+        _, path, start, end = task
+        yield from _read_lines(path, start, end)
+
+
+def aggregate_task(task: Task, rescore: bool = True) -> PartialAggregate:
+    """
+    Aggregate one work unit (runs in a pool worker)
+
+    Results with raw answers are re-scored against the current questionnaire
+    and thresholds; results without answers (or with answers that do not fit
+    the questionnaire) keep their stored scores.
+    """
+    partial = PartialAggregate()
+    scorer = BatchScorer.for_questionnaire(get_questionnaire()) if rescore else None
+    pending: List[Tuple[Dict[str, int], Dict[str, Any], Optional[str]]] = []
+
+    for raw in _read_task(task):
+        partial.bytes_read += len(raw)
+        try:
+            record = json_codec.loads(raw)
+        except ValueError:
+            partial.invalid += 1
+            continue
+        if not isinstance(record, dict) or record.get('type') == UPDATE:
+            # Updates only replace llm_analysis, which statistics do not use
+            continue
+        stored = record.get('scores')
+        answers = record.get('answers')
+        if scorer is not None and isinstance(answers, dict) and answers:
+            pending.append((answers, stored, record.get('timestamp')))
+        elif isinstance(stored, dict) and stored:
+            partial.add(stored, record.get('timestamp'))
+        else:
+            partial.invalid += 1
+
+    if pending:
+        _add_rescored(partial, scorer, pending)
+    return partial
+
+
+def _add_rescored(partial: PartialAggregate, scorer: BatchScorer,
+                  pending: List[Tuple[Dict[str, int], Dict[str, Any], Optional[str]]]):
+    try:
+        matrix = scorer.answer_matrix([answers for answers, _, _ in pending])
+    except ValueError:
+        # Some answer set is out of range: score one by one to isolate it
+        for answers, stored, timestamp in pending:
+            try:
+                scores = scorer.score([answers])[0]
+            except ValueError:
+                scores = None
+            _add_one(partial, scores, stored, timestamp)
+        return
+
+    # Rows answering no domain of this questionnaire keep their stored scores
+    usable = (matrix > 0).any(axis=1) if len(scorer.domains) else np.zeros(len(matrix), dtype=bool)
+    if usable.any():
+        partial.add_matrix(scorer, matrix[usable], [t for (_, _, t), ok in zip(pending, usable) if ok])
+    for (_, stored, timestamp), ok in zip(pending, usable.tolist()):
+        if not ok:
+            _add_one(partial, None, stored, timestamp)
+
+
+def _add_one(partial: PartialAggregate, scores: Optional[Dict[str, Any]],
+             stored: Any, timestamp: Optional[str]):
+    if scores:
+        partial.rescored += 1
+        partial.add(scores, timestamp)
+    elif isinstance(stored, dict) and stored:
+        partial.add(stored, timestamp)
+    else:
+        partial.invalid += 1
+
+
+def rebuild(directory: str, workers: int, chunk_bytes: int, rescore: bool = True) -> Tuple[PartialAggregate, float]:
+    """
+    Aggregate the whole archive
+
+    Returns:
+        (merged aggregate, elapsed seconds)
+    """
+    start = time.perf_counter()
+    total = PartialAggregate()
+    tasks = iter_tasks(directory, chunk_bytes)
+
+    if workers <= 1:
+        for task in tasks:
+            total.merge(aggregate_task(task, rescore))
+        return total, time.perf_counter() - start
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Keep a couple of units per worker in flight, not the whole archive
+        in_flight = set()
+        for task in tasks:
+            in_flight.add(pool.submit(aggregate_task, task, rescore))
+            if len(in_flight) >= workers * 2:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    total.merge(future.result())
+        for future in in_flight:
+            total.merge(future.result())
+    return total, time.perf_counter() - start
@@ -0,0 +1,142 @@
+"""Compiled domain score thresholds"""
+from bisect import bisect_right
+from typing import Any, Dict, Mapping, Tuple
+import numpy as np
+from config import Config
+
+
+SCORE_MIN = 1.0
+SCORE_MAX = 4.0
+
+UNKNOWN = {'category': 'Unknown', 'label': 'Unknown'}
+
+# Driver style classes that are not "<band>_<domain>"
+ALL_ROUND = 'strong_all_round'
+UNCLASSIFIED = 'unclassified'
+
+
+class DomainThresholds:
+    """
+    Sorted score bands for a single domain
+
+    Each band is identified by its lower bound. A score belongs to the last
+    band whose lower bound is <= score, so values between the configured
+    ranges (e.g. 2.05 between 'low' 1.0-2.0 and 'medium' 2.1-3.2) fall into
+    the lower band and the whole 1.0-4.0 range is covered without gaps.
+    """
+
+    __slots__ = ('domain_key', 'lower_bounds', 'categories', 'labels')
+
+    def __init__(self, domain_key: str, bands: Mapping[str, Tuple[float, float, str]]):
+        self.domain_key = domain_key
+
+        ordered = []
+        for category, band in bands.items():
+            if not isinstance(band, (tuple, list)) or len(band) != 3:
+                raise ValueError(f"Threshold {domain_key}.{category} must be (min, max, label)")
+            min_val, max_val, label = band
+            if not all(isinstance(v, (int, float)) for v in (min_val, max_val)):
+                raise ValueError(f"Threshold {domain_key}.{category} bounds must be numbers")
+            if min_val > max_val:
+                raise ValueError(f"Threshold {domain_key}.{category} has min {min_val} > max {max_val}")
+            if not isinstance(label, str) or not label:
+                raise ValueError(f"Threshold {domain_key}.{category} needs a non-empty label")
+            ordered.append((float(min_val), float(max_val), category.capitalize(), label))
+
+        if not ordered:
+            raise ValueError(f"No thresholds configured for domain {domain_key}")
+
+        ordered.sort()
+        for (_, prev_max, prev_cat, _), (next_min, _, next_cat, _) in zip(ordered, ordered[1:]):
+            if next_min <= prev_max:
+                raise ValueError(
+                    f"Thresholds {domain_key}.{prev_cat} and {domain_key}.{next_cat} overlap"
+                )
+        if ordered[0][0] > SCORE_MIN or ordered[-1][1] < SCORE_MAX:
+            raise ValueError(
+                f"Thresholds for {domain_key} must cover scores {SCORE_MIN}-{SCORE_MAX}"
+            )
+
+        self.lower_bounds = tuple(band[0] for band in ordered)
+        self.categories = tuple(band[2] for band in ordered)
+        self.labels = tuple(band[3] for band in ordered)
+
+    def index(self, score: float) -> int:
+        """Return the band index for a score (clamped to the first/last band)"""
+        return max(bisect_right(self.lower_bounds, score) - 1, 0)
+
+    def categorize(self, score: float) -> Dict[str, str]:
+        """Return the category and label for a score"""
+        i = self.index(score)
+        return {'category': self.categories[i], 'label': self.labels[i]}
+
+    def categorize_array(self, scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Vectorized categorize; returns (categories, labels) object arrays"""
+        idx = np.searchsorted(self.lower_bounds, scores, side='right') - 1
+        idx = np.clip(idx, 0, len(self.lower_bounds) - 1)
+        return (np.array(self.categories, dtype=object)[idx],
+                np.array(self.labels, dtype=object)[idx])
+
+
+class CompiledThresholds:
+    """Validated, lookup-ready thresholds for every domain"""
+
+    def __init__(self, config: Mapping[str, Mapping[str, Tuple[float, float, str]]]):
+        self.domains = {
+            domain_key: DomainThresholds(domain_key, bands)
+            for domain_key, bands in config.items()
+        }
+
+        # Fixed set of driver style classes: the weakest domain below its top
+        # band ("low_reaction_speed", "medium_road_behavior", ...), ALL_ROUND
+        # when every domain is in its top band, UNCLASSIFIED for anything else
+        self.style_classes = (ALL_ROUND,) + tuple(
+            f"{category.lower()}_{domain_key}"
+            for domain_key, domain in self.domains.items()
+            for category in domain.categories[:-1]
+        ) + (UNCLASSIFIED,)
+
+    def __contains__(self, domain_key: str) -> bool:
+        return domain_key in self.domains
+
+    def __getitem__(self, domain_key: str) -> DomainThresholds:
+        return self.domains[domain_key]
+
+    def categorize(self, domain_key: str, score: float) -> Dict[str, Any]:
+        """Categorize a score, or return 'Unknown' for an unconfigured domain"""
+        domain = self.domains.get(domain_key)
+        if domain is None:
+            return dict(UNKNOWN)
+        return domain.categorize(score)
+
+    def style_class(self, domain_scores: Mapping[str, float]) -> str:
+        """
+        Driver style class for a respondent
+
+        The weakest domain is the one in the lowest band (ties: lowest score,
+        then first configured), so the class names the area to work on.
+
+        Args:
+            domain_scores: domain_key -> score
+
+        Returns:
+            One of ``style_classes``
+        """
+        weakest = None
+        known = False
+        for domain_key, domain in self.domains.items():
+            if domain_key not in domain_scores:
+                continue
+            known = True
+            score = domain_scores[domain_key]
+            index = domain.index(score)
+            if index < len(domain.categories) - 1 and (weakest is None or (index, score) < weakest[:2]):
+                weakest = (index, score, domain_key)
+        if weakest is None:
+            return ALL_ROUND if known else UNCLASSIFIED
+        index, _, domain_key = weakest
+        return f"{self.domains[domain_key].categories[index].lower()}_{domain_key}"
+
+
+# Compiled (and validated) once at import, so bad config fails at startup
+THRESHOLDS = CompiledThresholds(Config.DOMAIN_THRESHOLDS)
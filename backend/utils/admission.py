@@ -0,0 +1,222 @@
+"""
+Admission control and load shedding
+
+Two mechanisms, both per process:
+
+- ``ConcurrencyLimiter`` caps how many requests of one endpoint run at once.
+  Up to ``max_queue`` more wait at most ``max_wait`` seconds for a slot; past
+  that they are shed, so a spike on an expensive endpoint cannot tie up every
+  server thread and starve cheap endpoints such as ``/api/health``. Queued
+  waiters hold a server thread too, so limit + queue must stay below THREADS.
+- ``RateLimiter`` is a token bucket per key (client IP or session ID): ``rate``
+  tokens per minute, at most ``burst`` saved up.
+
+Routes use the ``rate_limited`` decorator. The streaming submit calls its
+``ConcurrencyLimiter`` directly and falls back to the background analysis
+queue when shed.
+Counters for admitted, queued and shed requests are reported by
+``/api/health`` via ``snapshot()``.
+
+Under gunicorn every worker process has its own limiters, so the effective
+limits are multiplied by WORKERS.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict
+from flask import jsonify, request
+from config import Config
+from utils.metrics import ADMISSION_REJECTIONS
+from utils.validation import SESSION_ID_MAX_LENGTH
+
+
+class ConcurrencyLimiter:
+    """At most ``limit`` holders, with a bounded queue of waiters"""
+
+    def __init__(self, name: str, limit: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.limit = max(limit, 1)
+        self.max_queue = max(max_queue, 0)
+        self.max_wait = max(max_wait, 0.0)
+
+        self._cond = threading.Condition(threading.Lock())
+        self._in_flight = 0
+        self._waiting = 0
+        self._admitted = 0
+        self._queued = 0
+        self._shed = 0
+
+    def acquire(self) -> bool:
+        """
+        Take a slot, waiting in the queue if there is room
+
+        Returns:
+            True if admitted (call ``release`` when done), False if shed
+        """
+        with self._cond:
+            if self._in_flight < self.limit and not self._waiting:
+                self._in_flight += 1
+                self._admitted += 1
+                return True
+            if self._waiting >= self.max_queue or self.max_wait <= 0:
+                self._shed += 1
+                ADMISSION_REJECTIONS.inc(self.name, 'queue_full')
+                return False
+
+            self._waiting += 1
+            self._queued += 1
+            deadline = time.monotonic() + self.max_wait
+            try:
+                while self._in_flight >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._shed += 1
+                        ADMISSION_REJECTIONS.inc(self.name, 'queue_timeout')
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+            self._in_flight += 1
+            self._admitted += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Limits and counters for health output"""
+        with self._cond:
+            return {
+                'limit': self.limit,
+                'in_flight': self._in_flight,
+                'queue_depth': self._waiting,
+                'max_queue': self.max_queue,
+                'admitted': self._admitted,
+                'queued': self._queued,
+                'shed': self._shed
+            }
+
+
+class RateLimiter:
+    """Token bucket per key; the least recently seen keys are dropped beyond ``max_keys``"""
+
+    def __init__(self, name: str, per_minute: float, burst: int, max_keys: int):
+        self.name = name
+        self.enabled = per_minute > 0
+        self.rate = per_minute / 60.0
+        self.burst = max(burst, 1)
+        self.max_keys = max_keys
+
+        self._lock = threading.Lock()
+        # key -> [tokens, last refill (monotonic)]
+        self._buckets: 'OrderedDict[str, list]' = OrderedDict()
+        self._allowed = 0
+        self._limited = 0
+
+    def acquire(self, key: str) -> float:
+        """
+        Take one token from ``key``'s bucket
+
+        Returns:
+            0.0 if allowed, otherwise seconds until a token is available
+        """
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            if bucket[0] >= 1.0:
+                bucket[0] -= 1.0
+                self._allowed += 1
+                return 0.0
+            self._limited += 1
+            retry_after = (1.0 - bucket[0]) / self.rate
+        ADMISSION_REJECTIONS.inc(self.name, 'rate_limited')
+        return retry_after
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Limits and counters for health output"""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'per_minute': round(self.rate * 60, 3),
+                'burst': self.burst,
+                'tracked_keys': len(self._buckets),
+                'allowed': self._allowed,
+                'limited': self._limited
+            }
+
+
+stream_slots = ConcurrencyLimiter(
+    'submit_stream', Config.STREAM_MAX_CONCURRENT, Config.STREAM_MAX_QUEUE, Config.STREAM_QUEUE_TIMEOUT
+)
+register_rate = RateLimiter(
+    'register', Config.RATE_LIMIT_REGISTER_PER_MINUTE, Config.RATE_LIMIT_REGISTER_BURST,
+    Config.RATE_LIMIT_MAX_KEYS
+)
+progress_rate = RateLimiter(
+    'save_progress', Config.RATE_LIMIT_PROGRESS_PER_MINUTE, Config.RATE_LIMIT_PROGRESS_BURST,
+    Config.RATE_LIMIT_MAX_KEYS
+)
+submit_rate = RateLimiter(
+    'submit', Config.RATE_LIMIT_SUBMIT_PER_MINUTE, Config.RATE_LIMIT_SUBMIT_BURST,
+    Config.RATE_LIMIT_MAX_KEYS
+)
+
+
+def snapshot() -> Dict[str, Any]:
+    """All limiters, for /api/health"""
+    return {
+        'concurrency': {limiter.name: limiter.snapshot() for limiter in (stream_slots,)},
+        'rate_limits': {limiter.name: limiter.snapshot()
+                        for limiter in (register_rate, progress_rate, submit_rate)}
+    }
+
+
+def client_ip() -> str:
+    """Rate-limit key for unauthenticated requests (the proxied client with TRUSTED_PROXIES)"""
+    return request.remote_addr or 'unknown'
+
+
+def session_or_ip() -> str:
+    """Rate-limit key: the body's session ID, or the client IP without one"""
+    data = request.get_json(silent=True)
+    session_id = data.get('session_id') if isinstance(data, dict) else None
+    if isinstance(session_id, str) and 0 < len(session_id) <= SESSION_ID_MAX_LENGTH:
+        return 'session:' + session_id
+    return 'ip:' + client_ip()
+
+
+def _retry_response(message: str, status: int, retry_after: float):
+    seconds = max(math.ceil(retry_after), 1)
+    response = jsonify({'error': message, 'retry_after': seconds})
+    response.status_code = status
+    response.headers['Retry-After'] = str(seconds)
+    return response
+
+
+def rate_limited(limiter: RateLimiter, key: Callable[[], str]):
+    """Answer 429 with Retry-After when ``key()``'s bucket is empty"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            retry_after = limiter.acquire(key())
+            if retry_after:
+                return _retry_response('Too many requests', 429, retry_after)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
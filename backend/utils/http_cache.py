@@ -0,0 +1,132 @@
+"""
+Conditional and compressed JSON responses
+
+``cached_json_response`` adds an ETag and Cache-Control to a JSON body,
+answers a matching ``If-None-Match`` with 304, and gzip-compresses the body
+when the client accepts it (brotli instead, when the optional ``brotli``
+package is installed and the client prefers it). Compressed variants are
+kept in a small LRU keyed by ETag, so a body is compressed once no matter how
+often it is served.
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional, Union
+from flask import Response, request
+from config import Config
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+
+def content_etag(body: bytes) -> str:
+    """ETag for a response body (content hash)"""
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+class CompressedVariants:
+    """LRU cache of compressed response bodies keyed by (etag, encoding)"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()
+
+    @staticmethod
+    def compress(body: bytes, encoding: str) -> bytes:
+        if encoding == 'br':
+            return brotli.compress(body)
+        # mtime=0 keeps the output identical for identical input
+        return gzip.compress(body, compresslevel=6, mtime=0)
+
+    def get(self, etag: str, encoding: str, body: bytes) -> bytes:
+        key = (etag, encoding)
+        with self._lock:
+            compressed = self._entries.get(key)
+            if compressed is not None:
+                self._entries.move_to_end(key)
+                return compressed
+
+        compressed = self.compress(body, encoding)
+        with self._lock:
+            self._entries[key] = compressed
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return compressed
+
+
+compressed_variants = CompressedVariants(Config.HTTP_COMPRESSION_CACHE_ENTRIES)
+
+
+def _choose_encoding(body: bytes) -> Optional[str]:
+    if len(body) < Config.HTTP_COMPRESSION_MIN_BYTES:
+        return None
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br'] and accepted['br'] >= accepted['gzip']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def cached_json_response(body: Union[str, bytes], cache_control: str, etag: Optional[str] = None,
+                         cache_variants: bool = True) -> Response:
+    """
+    Build a JSON response with ETag, Cache-Control and optional compression
+
+    Args:
+        body: Serialized JSON (str or bytes)
+        cache_control: Cache-Control header value
+        etag: Precomputed ETag; defaults to a hash of the body
+        cache_variants: Keep the compressed body for reuse (off for one-off bodies)
+
+    Returns:
+        200 response, or 304 if the client already has this version
+    """
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    if etag is None:
+        etag = content_etag(body)
+    return conditional_response(lambda: body, etag, cache_control, cache_variants)
+
+
+def conditional_response(render: Callable[[], Union[str, bytes]], etag: str,
+                         cache_control: str, cache_variants: bool = True) -> Response:
+    """
+    Like ``cached_json_response`` but only renders the body when it is needed
+
+    Args:
+        render: Callable returning the serialized JSON body (str or bytes)
+        etag: ETag of the uncompressed body
+        cache_control: Cache-Control header value
+        cache_variants: Keep the compressed body for reuse (off for one-off bodies)
+    """
+    # Compressed variants carry their own tag (etag-gzip / etag-br); accept any form
+    matched = next((tag for tag in (etag, f'{etag}-gzip', f'{etag}-br')
+                    if request.if_none_match.contains(tag)), None)
+    if matched is not None:
+        response = Response(status=304)
+        response.set_etag(matched)
+    else:
+        body = render()
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        encoding = _choose_encoding(body)
+        if encoding is not None:
+            if cache_variants:
+                body = compressed_variants.get(etag, encoding, body)
+            else:
+                body = CompressedVariants.compress(body, encoding)
+        response = Response(body, mimetype='application/json')
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+            response.set_etag(f'{etag}-{encoding}')
+        else:
+            response.set_etag(etag)
+
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
@@ -0,0 +1,86 @@
+"""
+Fast JSON encoding for responses and storage
+
+Uses ``orjson`` when it is installed (and ``Config.JSON_BACKEND`` is not
+``stdlib``), otherwise the standard library. Output is always compact UTF-8.
+``FastJSONProvider`` plugs the same encoder into Flask, so ``jsonify`` and
+``request.get_json()`` use it too.
+"""
+import json
+from datetime import date
+from types import MappingProxyType
+from typing import Any
+from flask.json.provider import JSONProvider
+from config import Config
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+if Config.JSON_BACKEND == 'stdlib':
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'stdlib'
+
+
+def _default(obj: Any) -> Any:
+    # Types neither encoder handles natively
+    if isinstance(obj, MappingProxyType):
+        return dict(obj)
+    if isinstance(obj, date):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, 'tolist'):  # numpy scalars and arrays
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps_bytes(obj: Any, sort_keys: bool = False) -> bytes:
+        """Serialize to compact UTF-8 JSON bytes"""
+        option = _OPTIONS | orjson.OPT_SORT_KEYS if sort_keys else _OPTIONS
+        try:
+            return orjson.dumps(obj, default=_default, option=option)
+        except TypeError:
+            # e.g. integers beyond 64 bits, which the stdlib encoder handles
+            return json.dumps(obj, default=_default, sort_keys=sort_keys, ensure_ascii=False,
+                              separators=(',', ':')).encode('utf-8')
+
+    def loads(data):
+        """Parse JSON from str or bytes"""
+        return orjson.loads(data)
+else:
+    def dumps_bytes(obj: Any, sort_keys: bool = False) -> bytes:
+        """Serialize to compact UTF-8 JSON bytes"""
+        return json.dumps(obj, default=_default, sort_keys=sort_keys, ensure_ascii=False,
+                          separators=(',', ':')).encode('utf-8')
+
+    def loads(data):
+        """Parse JSON from str or bytes"""
+        return json.loads(data)
+
+
+def dumps(obj: Any, sort_keys: bool = False) -> str:
+    """Serialize to a compact JSON string"""
+    return dumps_bytes(obj, sort_keys).decode('utf-8')
+
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider backed by this module's encoder"""
+
+    sort_keys = False
+    mimetype = 'application/json'
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return dumps(obj, kwargs.get('sort_keys', self.sort_keys))
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        return loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj, self.sort_keys), mimetype=self.mimetype)
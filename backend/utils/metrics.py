@@ -0,0 +1,216 @@
+"""
+In-process metrics in Prometheus text format
+
+Histograms of request and stage latency, counters and scrape-time gauges are
+kept per process and rendered by ``GET /api/metrics``. Recording is a lock
+and a few integer updates. With ``Config.METRICS_ENABLED`` off, ``span()``
+returns a shared no-op context and nothing is recorded.
+
+    with span('scoring'):
+        scores = ScoringService.calculate_scores(...)
+
+Under gunicorn every worker keeps its own metrics; scrape each worker (or run
+one worker per container) to see all of them.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from typing import Callable, Dict, List, Sequence, Tuple
+from flask import Flask, g, request
+from config import Config
+
+
+ENABLED = Config.METRICS_ENABLED
+
+# Seconds; covers sub-millisecond routes up to LLM round trips
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(f'{self.name}{_labels(self.labelnames, labels)} {_format(value)}')
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram with optional labels"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        if not ENABLED:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        for labels, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = _labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            cumulative += counts[-1]
+            le = _labels(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f'{self.name}_bucket{le} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {_format(total)}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}')
+        return lines
+
+
+class Gauge:
+    """Value read from a callback at scrape time"""
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        try:
+            value = self.callback()
+        except Exception as e:
+            print(f"Metric {self.name} failed: {str(e)}")
+            return []
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} gauge',
+                f'{self.name} {_format(value)}']
+
+
+class Registry:
+    """Ordered collection of metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_DURATION = registry.register(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency', ('method', 'endpoint', 'status')
+))
+STAGE_DURATION = registry.register(Histogram(
+    'stage_duration_seconds', 'Time spent in request and analysis job stages', ('stage',)
+))
+LLM_FALLBACKS = registry.register(Counter(
+    'llm_fallbacks_total', 'Rule-based fallback analyses served', ('reason',)
+))
+LLM_CACHE_LOOKUPS = registry.register(Counter(
+    'llm_cache_lookups_total', 'LLM analysis cache lookups', ('result',)
+))
+ADMISSION_REJECTIONS = registry.register(Counter(
+    'admission_rejections_total', 'Requests shed or rate limited by admission control', ('limiter', 'reason')
+))
+
+
+def gauge(name: str, documentation: str, callback: Callable[[], float]) -> Gauge:
+    """Register a gauge evaluated at scrape time"""
+    return registry.register(Gauge(name, documentation, callback))
+
+
+class _Span:
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        STAGE_DURATION.observe(time.perf_counter() - self.start, self.stage)
+        return False
+
+
+_NULL_SPAN = nullcontext()
+
+
+def span(stage: str):
+    """Context manager timing a stage into stage_duration_seconds"""
+    return _Span(stage) if ENABLED else _NULL_SPAN
+
+
+def init_app(app: Flask):
+    """Time every request into http_request_duration_seconds"""
+    if not ENABLED:
+        return
+
+    @app.before_request
+    def _start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop('request_start', None)
+        if start is not None:
+            # Route templates, not raw paths, keep label cardinality bounded
+            rule = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            REQUEST_DURATION.observe(time.perf_counter() - start, request.method, rule,
+                                     str(response.status_code))
+        return response
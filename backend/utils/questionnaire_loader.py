@@ -1,9 +1,136 @@
-"""Utility for loading questionnaire data"""
+"""Utility for loading questionnaire data
+
+The questionnaire file is parsed once into an immutable ``CompiledQuestionnaire``
+and kept in memory. Each access only stats the file; it is re-read when the
+mtime changes and recompiled only when the content hash actually differs.
+
+Every question is also serialized once, so a response in any per-session
+question order is just a join of pre-encoded strings.
+"""
+import hashlib
 import json
+import os
+import random
+import threading
+from types import MappingProxyType
+from typing import Any, List, Mapping, NamedTuple, Optional, Sequence, Tuple
 from config import Config
 
 
-def load_questionnaire():
-    """Load and return questionnaire data"""
-    with open(Config.QUESTIONNAIRE_PATH, 'r', encoding='utf-8') as f:
-        return json.load(f)
+class QuestionRef(NamedTuple):
+    """Index entry for a single question"""
+    section: str
+    reverse: bool
+    position: int
+
+
+def _freeze(value: Any) -> Any:
+    """Read-only deep copy: dicts become MappingProxyType, lists tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class CompiledQuestionnaire:
+    """Immutable, precomputed view of questionnaire.json"""
+
+    __slots__ = ('data', 'sections', 'questions', 'questions_json', 'question_ids', 'question_index',
+                 'answers', 'answers_json', 'content_hash')
+
+    def __init__(self, raw: bytes):
+        data = json.loads(raw)
+
+        questions = []
+        question_index = {}
+        for section in data['sections']:
+            for question in section['questions']:
+                # Add section info to each question for reference
+                question_copy = dict(question)
+                question_copy['section'] = section['name']
+                question_copy['section_id'] = section['id']
+                question_index[question['id']] = QuestionRef(
+                    section['name'], bool(question.get('reverse', False)), len(questions)
+                )
+                questions.append(MappingProxyType(question_copy))
+
+        self.data: MappingProxyType = _freeze(data)
+        self.sections: Tuple[MappingProxyType, ...] = self.data['sections']
+        self.questions: Tuple[MappingProxyType, ...] = tuple(questions)
+        self.questions_json: Tuple[str, ...] = tuple(
+            json.dumps(dict(question), ensure_ascii=False) for question in questions
+        )
+        self.question_ids: Tuple[str, ...] = tuple(question['id'] for question in questions)
+        self.question_index = MappingProxyType(question_index)
+        self.answers: Tuple[MappingProxyType, ...] = self.data['answers']
+        self.answers_json = json.dumps(data['answers'], ensure_ascii=False)
+        self.content_hash = hashlib.sha256(raw).hexdigest()
+
+    def __setattr__(self, name, value):
+        if hasattr(self, name):
+            raise AttributeError(f"CompiledQuestionnaire.{name} is read-only")
+        object.__setattr__(self, name, value)
+
+    @property
+    def total_questions(self) -> int:
+        return len(self.questions)
+
+    def shuffled_order(self, seed: Optional[str] = None) -> List[int]:
+        """
+        Shuffled permutation of question positions
+
+        Args:
+            seed: Seed for a consistent order (e.g. the session ID); None for a random one
+
+        Returns:
+            List of indexes into ``questions``
+        """
+        # A private RNG: seeding the global random module is racy across threads
+        order = list(range(len(self.questions)))
+        random.Random(seed).shuffle(order)
+        return order
+
+    def is_valid_order(self, order: Any) -> bool:
+        """Check that a stored order is a permutation of this questionnaire's questions"""
+        return isinstance(order, list) and sorted(order) == list(range(len(self.questions)))
+
+    def render(self, order: Sequence[int]) -> str:
+        """JSON body of GET /api/questionnaire with questions in the given order"""
+        return (
+            '{"questions": [' + ', '.join(self.questions_json[i] for i in order)
+            + '], "answers": ' + self.answers_json
+            + ', "total_questions": ' + str(len(order)) + '}'
+        )
+
+
+_lock = threading.Lock()
+_compiled: Optional[CompiledQuestionnaire] = None
+_mtime_ns: Optional[int] = None
+
+
+def get_questionnaire() -> CompiledQuestionnaire:
+    """Return the compiled questionnaire, reloading it if the file changed"""
+    global _compiled, _mtime_ns
+
+    mtime_ns = os.stat(Config.QUESTIONNAIRE_PATH).st_mtime_ns
+    if _compiled is not None and mtime_ns == _mtime_ns:
+        return _compiled
+
+    with _lock:
+        if _compiled is not None and mtime_ns == _mtime_ns:
+            return _compiled
+
+        with open(Config.QUESTIONNAIRE_PATH, 'rb') as f:
+            raw = f.read()
+
+        # A touched but unchanged file keeps the existing compiled object
+        if _compiled is None or hashlib.sha256(raw).hexdigest() != _compiled.content_hash:
+            _compiled = CompiledQuestionnaire(raw)
+        _mtime_ns = mtime_ns
+        return _compiled
+
+
+def load_questionnaire() -> Mapping[str, Any]:
+    """Load and return questionnaire data (a shared read-only view)"""
+    return get_questionnaire().data
@@ -0,0 +1,351 @@
+"""
+Append-only results store
+
+Completed questionnaires are appended as JSON Lines to segment files in
+``Config.RESULTS_DIR`` instead of one pretty-printed file per submission:
+
+    seg-<created_ns>-<pid>.jsonl   one compact JSON record per line
+    seg-<created_ns>-<pid>.idx     one line per record: id, email, date, offset, length
+
+Every process writes to its own segment, so gunicorn workers never interleave
+lines, and a segment is rotated once it reaches ``Config.RESULTS_SEGMENT_MAX_BYTES``.
+Writes are flushed to the OS immediately and fsynced in batches (every
+``Config.RESULTS_FSYNC_EVERY`` records or ``Config.RESULTS_FSYNC_INTERVAL`` seconds).
+
+The ``.idx`` sidecars give an in-memory index by email and date without reading
+the segments; bulk export and re-analysis are a sequential scan via ``iter_records``.
+Legacy ``*.json`` result files in the same directory are included in that scan.
+Results are never rewritten: later changes (e.g. a regenerated analysis) are
+appended as update records and applied when results are read.
+"""
+import glob
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+from config import Config
+from utils import json_codec
+
+
+# Record type of an update to an earlier result
+UPDATE = 'update'
+
+
+class ResultsLog:
+    """Segmented, append-only JSON Lines store for questionnaire results"""
+
+    def __init__(self, directory: str, segment_max_bytes: int,
+                 fsync_every: int, fsync_interval: float):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+
+        self._lock = threading.RLock()
+        self._segment_path: Optional[str] = None
+        self._segment = None
+        self._index_file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._syncer: Optional[threading.Thread] = None
+        self._closed = False
+        self._pid = os.getpid()
+
+        # Index: email / date -> [(segment_path, offset, length)]
+        self._by_email: Dict[str, List[tuple]] = defaultdict(list)
+        self._by_date: Dict[str, List[tuple]] = defaultdict(list)
+        self._by_id: Dict[str, tuple] = {}
+        # result_id -> [location of each update record], oldest first
+        self._updates: Dict[str, List[tuple]] = defaultdict(list)
+        # How far each .idx sidecar has been read
+        self._index_offsets: Dict[str, int] = {}
+        # Segment path -> end of the last indexed record, from the sidecar or tail recovery
+        self._indexed_until: Dict[str, int] = {}
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_index(recover=True)
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def append(self, record: Dict[str, Any]) -> str:
+        """
+        Append a result record
+
+        Args:
+            record: JSON-serializable result; 'id' and 'timestamp' are added if missing
+
+        Returns:
+            The record's result ID
+        """
+        record.setdefault('id', uuid.uuid4().hex)
+        record.setdefault('timestamp', datetime.now().isoformat())
+        line = json_codec.dumps_bytes(record) + b'\n'
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('ResultsLog is closed')
+            if self._pid != os.getpid():
+                # Forked worker: never share the parent's segment or syncer thread
+                self._segment = self._index_file = self._syncer = None
+                self._pid = os.getpid()
+            if self._segment is None or self._segment.tell() + len(line) > self.segment_max_bytes:
+                self._rotate()
+
+            offset = self._segment.tell()
+            self._segment.write(line)
+            self._segment.flush()
+
+            entry = self._index_entry(record, offset, len(line))
+            self._index_file.write(json_codec.dumps(entry) + '\n')
+            self._index_file.flush()
+            self._add_to_index(self._segment_path, entry)
+            self._index_offsets[self._index_path(self._segment_path)] = self._index_file.tell()
+            self._indexed_until[self._segment_path] = offset + len(line)
+
+            self._unsynced += 1
+            if (self._unsynced >= self.fsync_every
+                    or time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._sync_locked()
+            else:
+                self._ensure_syncer()
+
+        return record['id']
+
+    def append_update(self, result_id: str, fields: Dict[str, Any]) -> str:
+        """
+        Record new values for fields of an existing result (e.g. a re-generated
+        llm_analysis). Results are never rewritten; reads apply updates in order.
+
+        Returns:
+            ID of the update record
+        """
+        return self.append({'type': UPDATE, 'result_id': result_id, 'fields': fields})
+
+    def sync(self):
+        """fsync any records written since the last sync"""
+        with self._lock:
+            self._sync_locked()
+
+    def close(self):
+        """Sync and close the active segment"""
+        with self._lock:
+            self._sync_locked()
+            self._close_segment()
+            self._closed = True
+
+    def _sync_locked(self):
+        if self._segment is not None and self._unsynced:
+            os.fsync(self._segment.fileno())
+            os.fsync(self._index_file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _ensure_syncer(self):
+        # Background fsync so a quiet period does not leave records unsynced
+        if self._syncer is None:
+            self._syncer = threading.Thread(target=self._sync_loop, name='results-fsync', daemon=True)
+            self._syncer.start()
+
+    def _sync_loop(self):
+        while True:
+            time.sleep(self.fsync_interval)
+            with self._lock:
+                if self._closed:
+                    return
+                if self._unsynced:
+                    self._sync_locked()
+
+    def _rotate(self):
+        self._sync_locked()
+        self._close_segment()
+        name = f"seg-{time.time_ns()}-{os.getpid()}"
+        self._segment_path = os.path.join(self.directory, name + '.jsonl')
+        self._segment = open(self._segment_path, 'ab')
+        self._index_file = open(self._index_path(self._segment_path), 'a', encoding='utf-8')
+
+    def _close_segment(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._index_file.close()
+            self._segment = None
+            self._index_file = None
+
+    # ------------------------------------------------------------------
+    # Index
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _index_path(segment_path: str) -> str:
+        return segment_path[:-len('.jsonl')] + '.idx'
+
+    @staticmethod
+    def _index_entry(record: Dict[str, Any], offset: int, length: int) -> Dict[str, Any]:
+        entry = {
+            'id': record['id'],
+            'email': (record.get('user') or {}).get('email', ''),
+            'date': record['timestamp'][:10],
+            'offset': offset,
+            'length': length
+        }
+        if record.get('type') == UPDATE:
+            entry['ref'] = record['result_id']
+        return entry
+
+    def _add_to_index(self, segment_path: str, entry: Dict[str, Any]):
+        location = (segment_path, entry['offset'], entry['length'])
+        if 'ref' in entry:
+            self._updates[entry['ref']].append(location)
+            return
+        self._by_email[entry['email'].lower()].append(location)
+        self._by_date[entry['date']].append(location)
+        self._by_id[entry['id']] = location
+
+    def segments(self) -> List[str]:
+        """All segment files, oldest first"""
+        return sorted(glob.glob(os.path.join(self.directory, 'seg-*.jsonl')),
+                      key=lambda p: int(os.path.basename(p).split('-')[1]))
+
+    def _load_index(self, recover: bool = False):
+        """Read new lines from every .idx sidecar (and, on open, unindexed segment tails)"""
+        for segment_path in self.segments():
+            if segment_path == self._segment_path:
+                continue
+            index_path = self._index_path(segment_path)
+            indexed_until = self._indexed_until.get(segment_path, 0)
+            start = self._index_offsets.get(index_path, 0)
+            if os.path.exists(index_path):
+                with open(index_path, 'r', encoding='utf-8') as f:
+                    f.seek(start)
+                    while True:
+                        line = f.readline()
+                        if not line.endswith('\n'):
+                            # Partially written entry: retry on the next refresh
+                            break
+                        entry = json_codec.loads(line)
+                        # Entries for records already picked up by tail recovery are skipped
+                        if entry['offset'] >= indexed_until:
+                            self._add_to_index(segment_path, entry)
+                            indexed_until = entry['offset'] + entry['length']
+                        start = f.tell()
+                self._index_offsets[index_path] = start
+            if recover:
+                indexed_until = self._recover_tail(segment_path, indexed_until)
+            self._indexed_until[segment_path] = indexed_until
+
+    def _recover_tail(self, segment_path: str, indexed_until: int) -> int:
+        """
+        Index records written before a crash whose index entry never made it
+        (or that a live writer has not indexed yet)
+
+        Returns:
+            End of the last indexed record
+        """
+        if os.path.getsize(segment_path) <= indexed_until:
+            return indexed_until
+        offset = indexed_until
+        with open(segment_path, 'rb') as f:
+            f.seek(indexed_until)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json_codec.loads(line)
+                except ValueError:
+                    break
+                self._add_to_index(segment_path, self._index_entry(record, offset, len(line)))
+                offset += len(line)
+        return offset
+
+    def refresh(self):
+        """Pick up records appended by other processes"""
+        with self._lock:
+            self._load_index()
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def _read(self, location: tuple) -> Dict[str, Any]:
+        segment_path, offset, length = location
+        with open(segment_path, 'rb') as f:
+            f.seek(offset)
+            return json_codec.loads(f.read(length))
+
+    def _apply_updates(self, record: Dict[str, Any],
+                       updates: Optional[Dict[str, List[tuple]]] = None) -> Dict[str, Any]:
+        for location in (updates if updates is not None else self._updates).get(record['id'], ()):
+            record.update(self._read(location)['fields'])
+        return record
+
+    def get(self, result_id: str) -> Optional[Dict[str, Any]]:
+        """Look up a single result by ID"""
+        self.refresh()
+        location = self._by_id.get(result_id)
+        return self._apply_updates(self._read(location)) if location else None
+
+    def find_by_email(self, email: str) -> List[Dict[str, Any]]:
+        """All results submitted with an email address (case-insensitive)"""
+        self.refresh()
+        return [self._apply_updates(self._read(loc)) for loc in list(self._by_email.get(email.lower(), ()))]
+
+    def find_by_date(self, date: str) -> List[Dict[str, Any]]:
+        """All results submitted on a date ('YYYY-MM-DD')"""
+        self.refresh()
+        return [self._apply_updates(self._read(loc)) for loc in list(self._by_date.get(date, ()))]
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """
+        Sequentially scan every stored result (legacy JSON files, then segments)
+        with updates applied. Legacy files use their file name as result ID.
+        """
+        self.refresh()
+        with self._lock:
+            updates = {ref: list(locations) for ref, locations in self._updates.items()}
+
+        for path in sorted(glob.glob(os.path.join(self.directory, '*.json'))):
+            with open(path, 'r', encoding='utf-8') as f:
+                record = json_codec.loads(f.read())
+            record.setdefault('id', os.path.splitext(os.path.basename(path))[0])
+            yield self._apply_updates(record, updates)
+
+        for segment_path in self.segments():
+            with open(segment_path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        continue
+                    record = json_codec.loads(line)
+                    if record.get('type') != UPDATE:
+                        yield self._apply_updates(record, updates)
+
+
+_results_log: Optional[ResultsLog] = None
+_results_log_lock = threading.Lock()
+
+
+def get_results_log() -> ResultsLog:
+    """Return the process-wide results log, opening it on first use"""
+    global _results_log
+    if _results_log is None:
+        with _results_log_lock:
+            if _results_log is None:
+                _results_log = ResultsLog(
+                    Config.RESULTS_DIR,
+                    Config.RESULTS_SEGMENT_MAX_BYTES,
+                    Config.RESULTS_FSYNC_EVERY,
+                    Config.RESULTS_FSYNC_INTERVAL
+                )
+    return _results_log
+
+
+def close_results_log():
+    """Sync and close the process-wide results log, if it was opened"""
+    global _results_log
+    with _results_log_lock:
+        if _results_log is not None:
+            _results_log.close()
+            _results_log = None
@@ -1,7 +1,530 @@
 """
 Session management utility
-In-memory storage for sessions (for "Save for Later" functionality)
-In production, consider using Redis or a database
+Session storage for "Save for Later" functionality
+
+Two backends share the ``SessionStore`` interface:
+- ``MemorySessionStore``: process-local, for development and single-worker runs
+- ``SQLiteSessionStore``: a SQLite database in WAL mode, shared by every worker
+  process (and every node that mounts the same data directory)
+
+Sessions expire when idle for ``Config.SESSION_TTL_SECONDS``, when older than
+``Config.SESSION_ABSOLUTE_TTL_SECONDS``, and, once completed, when idle for
+``Config.SESSION_COMPLETED_TTL_SECONDS``. The least recently used ones are
+evicted beyond ``Config.SESSION_MAX_ENTRIES``, and a background sweeper removes
+expired sessions every ``Config.SESSION_SWEEP_INTERVAL`` seconds.
+
+Callers always work with plain JSON-compatible dicts and get copies, so changes
+must go through ``set`` or ``update``. The memory backend keeps each session as
+a compact ``SessionRecord`` (epoch seconds instead of ISO strings, answers
+packed into bytes by question position, nested dicts as JSON bytes).
 """
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config import Config
+from utils import json_codec
+from utils.questionnaire_loader import get_questionnaire
+
+
+SessionData = Dict[str, Any]
+
+
+class StaleVersionError(Exception):
+    """Raised by an update when the client's progress version is out of date"""
+
+    def __init__(self, current_version: int):
+        super().__init__(f"Stale progress version (current is {current_version})")
+        self.current_version = current_version
+
+
+class AlreadyCompletedError(Exception):
+    """Raised by an update when the session's questionnaire was already submitted"""
+
+
+def _to_epoch(value: Any) -> Optional[int]:
+    """ISO timestamp (as produced by datetime.isoformat) -> epoch seconds"""
+    if value is None:
+        return None
+    return int(datetime.fromisoformat(value).timestamp())
+
+
+def _to_iso(value: Optional[int]) -> Optional[str]:
+    return datetime.fromtimestamp(value).isoformat() if value is not None else None
+
+
+def _encode(value: Any) -> bytes:
+    # orjson can hand back a bytes object that keeps its whole 1 KiB write
+    # buffer; copy into an exact-size object before holding on to it
+    return bytes(memoryview(json_codec.dumps_bytes(value)))
+
+
+class SessionRecord:
+    """Compact in-memory form of a session dict"""
+
+    __slots__ = ('accessed_at', 'created_at', 'last_saved', 'completed_at', 'completed',
+                 'version', 'current_question_index', 'user', 'answer_ids', 'answers',
+                 'extra_answers', 'question_order', 'question_order_hash', 'analysis', 'extra')
+
+    # Keys with a dedicated slot; anything else is kept in ``extra``
+    FIELDS = frozenset(('created_at', 'last_saved', 'completed_at', 'completed', 'version',
+                        'current_question_index', 'user', 'answers', 'question_order',
+                        'question_order_hash', 'analysis'))
+    TIMESTAMPS = ('created_at', 'last_saved', 'completed_at')
+
+    @classmethod
+    def from_dict(cls, data: SessionData, accessed_at: float) -> 'SessionRecord':
+        record = cls()
+        record.accessed_at = accessed_at
+        extra = {key: value for key, value in data.items() if key not in cls.FIELDS}
+
+        for key in cls.TIMESTAMPS:
+            value = data.get(key)
+            try:
+                setattr(record, key, _to_epoch(value))
+            except (TypeError, ValueError):
+                # Not an ISO timestamp: keep it verbatim
+                setattr(record, key, None)
+                extra[key] = value
+        if record.created_at is None and 'created_at' not in extra:
+            record.created_at = int(accessed_at)
+
+        record.completed = bool(data.get('completed', False))
+        record.version = data.get('version', 0)
+        record.current_question_index = data.get('current_question_index', 0)
+        record.user = _encode(data['user']) if 'user' in data else None
+        record.analysis = _encode(data['analysis']) if 'analysis' in data else None
+        record.question_order_hash = data.get('question_order_hash')
+
+        order = data.get('question_order')
+        if isinstance(order, list) and all(type(i) is int and 0 <= i < 256 for i in order):
+            order = bytes(order)
+        record.question_order = order
+
+        record.answer_ids, record.answers, extra_answers = cls._pack_answers(data.get('answers'))
+        record.extra_answers = _encode(extra_answers) if extra_answers else None
+        record.extra = _encode(extra) if extra else None
+        return record
+
+    @staticmethod
+    def _pack_answers(answers: Optional[Dict[str, Any]]) -> Tuple[Optional[Tuple[str, ...]], bytes, Dict[str, Any]]:
+        """
+        Pack answers into one byte per question position (0 = unanswered)
+
+        Returns:
+            (question ID layout, packed bytes, answers that do not fit the layout)
+        """
+        if not answers:
+            return None, b'', {}
+        questionnaire = get_questionnaire()
+        index = questionnaire.question_index
+        packed = bytearray(len(questionnaire.question_ids))
+        unpacked = {}
+        for q_id, value in answers.items():
+            ref = index.get(q_id)
+            if ref is not None and type(value) is int and 0 <= value < 255:
+                packed[ref.position] = value + 1
+            else:
+                unpacked[q_id] = value
+        # The layout tuple is shared by every record packed against this questionnaire
+        return questionnaire.question_ids, bytes(packed), unpacked
+
+    def to_dict(self) -> SessionData:
+        data: SessionData = {}
+        if self.user is not None:
+            data['user'] = json_codec.loads(self.user)
+        data['created_at'] = _to_iso(self.created_at)
+
+        answers = {}
+        if self.answer_ids is not None:
+            answers = {q_id: value - 1 for q_id, value in zip(self.answer_ids, self.answers) if value}
+        if self.extra_answers is not None:
+            answers.update(json_codec.loads(self.extra_answers))
+        data['answers'] = answers
+
+        data['current_question_index'] = self.current_question_index
+        data['version'] = self.version
+        data['completed'] = self.completed
+        if self.last_saved is not None:
+            data['last_saved'] = _to_iso(self.last_saved)
+        if self.completed_at is not None:
+            data['completed_at'] = _to_iso(self.completed_at)
+        if self.question_order is not None:
+            order = self.question_order
+            data['question_order'] = list(order) if isinstance(order, bytes) else order
+        if self.question_order_hash is not None:
+            data['question_order_hash'] = self.question_order_hash
+        if self.analysis is not None:
+            data['analysis'] = json_codec.loads(self.analysis)
+        if self.extra is not None:
+            data.update(json_codec.loads(self.extra))
+        return data
+
+
+class SessionStore(ABC):
+    """Interface for session storage backends"""
+
+    def __init__(self):
+        self._sweeper_lock = threading.Lock()
+        self._sweeper: Optional[threading.Thread] = None
+        self._sweeper_stop: Optional[threading.Event] = None
+        self._sweeper_pid: Optional[int] = None
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[SessionData]:
+        """Return a copy of the session, or None if missing or expired"""
+
+    @abstractmethod
+    def set(self, session_id: str, data: SessionData) -> None:
+        """Create or replace a session"""
+
+    @abstractmethod
+    def update(self, session_id: str,
+               mutator: Callable[[SessionData], None]) -> Optional[SessionData]:
+        """
+        Atomically modify a session
+
+        Args:
+            session_id: Session to modify
+            mutator: Called with the current session data to change it in place;
+                     any exception it raises aborts the update and propagates
+
+        Returns:
+            The updated session data, or None if the session does not exist
+        """
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        """Remove a session if it exists"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """Remove expired sessions; returns how many were removed"""
+
+    @abstractmethod
+    def pending_analyses(self) -> List[Tuple[str, SessionData]]:
+        """Live completed sessions whose analysis is still pending, as (session ID, data)"""
+
+    def start_sweeper(self, interval: float):
+        """Run ``sweep`` every ``interval`` seconds on a daemon thread (once per process)"""
+        if interval <= 0:
+            return
+        with self._sweeper_lock:
+            if self._sweeper is not None and self._sweeper_pid == os.getpid():
+                return
+            self._sweeper_stop = threading.Event()
+            self._sweeper = threading.Thread(target=self._sweep_loop, args=(interval, self._sweeper_stop),
+                                             name='session-sweeper', daemon=True)
+            self._sweeper_pid = os.getpid()
+            self._sweeper.start()
+
+    def _sweep_loop(self, interval: float, stop: threading.Event):
+        while not stop.wait(interval):
+            try:
+                removed = self.sweep()
+                if removed:
+                    print(f"Session sweeper removed {removed} expired sessions")
+            except Exception as e:
+                print(f"Session sweep failed: {str(e)}")
+
+    def close(self):
+        """Stop the sweeper"""
+        with self._sweeper_lock:
+            if self._sweeper is not None:
+                self._sweeper_stop.set()
+                self._sweeper = None
+
+
+class MemorySessionStore(SessionStore):
+    """Process-local store of compact records with TTL expiry and LRU eviction"""
+
+    # Sessions checked per lock acquisition while sweeping
+    SWEEP_BATCH = 1000
+
+    def __init__(self, ttl_seconds: float, max_entries: int,
+                 absolute_ttl_seconds: float, completed_ttl_seconds: float):
+        super().__init__()
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.absolute_ttl_seconds = absolute_ttl_seconds
+        self.completed_ttl_seconds = completed_ttl_seconds
+        self._lock = threading.Lock()
+        # session_id -> SessionRecord, least recently used first
+        self._entries: 'OrderedDict[str, SessionRecord]' = OrderedDict()
+
+    def _expired(self, record: SessionRecord, now: float) -> bool:
+        idle = now - record.accessed_at
+        return (idle > self.ttl_seconds
+                or (record.created_at is not None and now - record.created_at > self.absolute_ttl_seconds)
+                or (record.completed and idle > self.completed_ttl_seconds))
+
+    def _live_entry(self, session_id: str, now: float) -> Optional[SessionRecord]:
+        record = self._entries.get(session_id)
+        if record is None:
+            return None
+        if self._expired(record, now):
+            del self._entries[session_id]
+            return None
+        record.accessed_at = now
+        self._entries.move_to_end(session_id)
+        return record
+
+    def get(self, session_id: str) -> Optional[SessionData]:
+        with self._lock:
+            record = self._live_entry(session_id, time.time())
+            return record.to_dict() if record is not None else None
+
+    def set(self, session_id: str, data: SessionData) -> None:
+        now = time.time()
+        record = SessionRecord.from_dict(data, now)
+        with self._lock:
+            self._entries[session_id] = record
+            self._entries.move_to_end(session_id)
+            self._evict(now)
+
+    def update(self, session_id: str,
+               mutator: Callable[[SessionData], None]) -> Optional[SessionData]:
+        with self._lock:
+            now = time.time()
+            record = self._live_entry(session_id, now)
+            if record is None:
+                return None
+            data = record.to_dict()
+            mutator(data)
+            updated = SessionRecord.from_dict(data, now)
+            self._entries[session_id] = updated
+            return updated.to_dict()
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _evict(self, now: float):
+        # Oldest entries are at the front, so stop at the first live one
+        while self._entries:
+            session_id, record = next(iter(self._entries.items()))
+            if len(self._entries) > self.max_entries or now - record.accessed_at > self.ttl_seconds:
+                del self._entries[session_id]
+            else:
+                break
+
+    def sweep(self) -> int:
+        with self._lock:
+            session_ids = list(self._entries)
+        removed = 0
+        # Short lock holds so requests are not stalled behind a full scan
+        for i in range(0, len(session_ids), self.SWEEP_BATCH):
+            now = time.time()
+            with self._lock:
+                for session_id in session_ids[i:i + self.SWEEP_BATCH]:
+                    record = self._entries.get(session_id)
+                    if record is not None and self._expired(record, now):
+                        del self._entries[session_id]
+                        removed += 1
+        return removed
+
+    def pending_analyses(self) -> List[Tuple[str, SessionData]]:
+        now = time.time()
+        with self._lock:
+            candidates = [(session_id, record) for session_id, record in self._entries.items()
+                          if record.completed and record.analysis is not None
+                          and not self._expired(record, now)]
+        # Records are replaced, never changed in place, so they decode safely outside the lock
+        pending = []
+        for session_id, record in candidates:
+            data = record.to_dict()
+            if data['analysis'].get('status') == 'pending':
+                pending.append((session_id, data))
+        return pending
+
+
+class SQLiteSessionStore(SessionStore):
+    """Store shared across processes through a SQLite database in WAL mode"""
+
+    # A session is live while all three TTLs hold
+    LIVE = 'accessed_at >= ? AND created_at >= ? AND (completed = 0 OR accessed_at >= ?)'
+    # Reads refresh accessed_at only once it is this fraction of the shortest idle TTL old,
+    # so most GETs do not write to the WAL
+    TOUCH_FRACTION = 0.05
+
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int,
+                 absolute_ttl_seconds: float, completed_ttl_seconds: float):
+        super().__init__()
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.absolute_ttl_seconds = absolute_ttl_seconds
+        self.completed_ttl_seconds = completed_ttl_seconds
+        self._touch_after = min(ttl_seconds, completed_ttl_seconds) * self.TOUCH_FRACTION
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS sessions ('
+            ' id TEXT PRIMARY KEY,'
+            ' data TEXT NOT NULL,'
+            ' accessed_at REAL NOT NULL,'
+            ' created_at REAL NOT NULL DEFAULT 0,'
+            ' completed INTEGER NOT NULL DEFAULT 0)'
+        )
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(sessions)')}
+        if 'created_at' not in columns:
+            # Databases created before the absolute / completed TTLs existed
+            conn.execute('ALTER TABLE sessions ADD COLUMN created_at REAL NOT NULL DEFAULT 0')
+            conn.execute('ALTER TABLE sessions ADD COLUMN completed INTEGER NOT NULL DEFAULT 0')
+            conn.execute('UPDATE sessions SET created_at = accessed_at')
+        conn.execute('CREATE INDEX IF NOT EXISTS sessions_accessed_at ON sessions (accessed_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS sessions_created_at ON sessions (created_at)')
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _cutoffs(self, now: float) -> Tuple[float, float, float]:
+        return (now - self.ttl_seconds, now - self.absolute_ttl_seconds, now - self.completed_ttl_seconds)
+
+    @staticmethod
+    def _created_at(data: SessionData, now: float) -> float:
+        try:
+            return _to_epoch(data.get('created_at')) or now
+        except (TypeError, ValueError):
+            return now
+
+    def get(self, session_id: str) -> Optional[SessionData]:
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            f'SELECT data, accessed_at FROM sessions WHERE id = ? AND {self.LIVE}',
+            (session_id, *self._cutoffs(now))
+        ).fetchone()
+        if row is None:
+            return None
+        if now - row[1] >= self._touch_after:
+            conn.execute('UPDATE sessions SET accessed_at = ? WHERE id = ?', (now, session_id))
+        return json_codec.loads(row[0])
+
+    def set(self, session_id: str, data: SessionData) -> None:
+        now = time.time()
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO sessions (id, data, accessed_at, created_at, completed) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (session_id, json_codec.dumps(data), now, self._created_at(data, now),
+                 int(bool(data.get('completed'))))
+            )
+            self._evict(conn, now)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def update(self, session_id: str,
+               mutator: Callable[[SessionData], None]) -> Optional[SessionData]:
+        now = time.time()
+        conn = self._conn()
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent
+        # read-modify-write cycles from other workers are serialized
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                f'SELECT data FROM sessions WHERE id = ? AND {self.LIVE}',
+                (session_id, *self._cutoffs(now))
+            ).fetchone()
+            if row is None:
+                conn.execute('ROLLBACK')
+                return None
+            data = json_codec.loads(row[0])
+            mutator(data)
+            conn.execute(
+                'UPDATE sessions SET data = ?, accessed_at = ?, completed = ? WHERE id = ?',
+                (json_codec.dumps(data), now, int(bool(data.get('completed'))), session_id)
+            )
+            conn.execute('COMMIT')
+            return data
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def delete(self, session_id: str) -> None:
+        self._conn().execute('DELETE FROM sessions WHERE id = ?', (session_id,))
+
+    def __len__(self) -> int:
+        return self._conn().execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        conn.execute('DELETE FROM sessions WHERE accessed_at < ?', (now - self.ttl_seconds,))
+        excess = conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute(
+                'DELETE FROM sessions WHERE id IN '
+                '(SELECT id FROM sessions ORDER BY accessed_at LIMIT ?)',
+                (excess,)
+            )
+
+    def sweep(self) -> int:
+        cursor = self._conn().execute(
+            f'DELETE FROM sessions WHERE NOT ({self.LIVE})', self._cutoffs(time.time())
+        )
+        return cursor.rowcount
+
+    def pending_analyses(self) -> List[Tuple[str, SessionData]]:
+        # instr() is a cheap pre-filter; the decoded status decides
+        rows = self._conn().execute(
+            f"SELECT id, data FROM sessions WHERE completed = 1 AND instr(data, '\"pending\"') > 0 "
+            f"AND {self.LIVE}",
+            self._cutoffs(time.time())
+        ).fetchall()
+        pending = []
+        for session_id, raw in rows:
+            data = json_codec.loads(raw)
+            if (data.get('analysis') or {}).get('status') == 'pending':
+                pending.append((session_id, data))
+        return pending
+
+
+def create_session_store() -> SessionStore:
+    """Build the session store selected by Config.SESSION_BACKEND"""
+    if Config.SESSION_BACKEND == 'sqlite':
+        store = SQLiteSessionStore(
+            Config.SESSION_DB_PATH, Config.SESSION_TTL_SECONDS, Config.SESSION_MAX_ENTRIES,
+            Config.SESSION_ABSOLUTE_TTL_SECONDS, Config.SESSION_COMPLETED_TTL_SECONDS
+        )
+    elif Config.SESSION_BACKEND == 'memory':
+        store = MemorySessionStore(
+            Config.SESSION_TTL_SECONDS, Config.SESSION_MAX_ENTRIES,
+            Config.SESSION_ABSOLUTE_TTL_SECONDS, Config.SESSION_COMPLETED_TTL_SECONDS
+        )
+    else:
+        raise ValueError(f"Unknown SESSION_BACKEND: {Config.SESSION_BACKEND}")
+    store.start_sweeper(Config.SESSION_SWEEP_INTERVAL)
+    return store
+
 
-sessions = {}
+sessions = create_session_store()
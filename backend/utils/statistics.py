@@ -0,0 +1,517 @@
+"""
+Statistics aggregation
+
+Two backends share the same interface (``increment_started``,
+``record_completion``, ``snapshot``, ``percentiles``, ``flush``, ``close``), selected with
+``Config.STATISTICS_BACKEND``:
+
+``StatisticsAggregator`` ('memory', per process): counters, per-domain score
+sums and the driver style histogram are updated in memory under a single lock.
+A snapshot in the ``statistics.json`` format is written to disk (temp file +
+rename) every ``Config.STATISTICS_FLUSH_EVERY`` events or
+``Config.STATISTICS_FLUSH_INTERVAL`` seconds, and the aggregator resumes from
+the last snapshot on startup.
+
+Averages are derived from exact sums and counts, which the snapshot keeps in
+``score_totals`` so no rounding error accumulates across restarts.
+
+Both backends are constant-size: driver styles are counted per fixed style
+class (``THRESHOLDS.style_classes``; free-text styles from older snapshots are
+merged into ``unclassified``), and each domain keeps a histogram of scores in
+``Config.STATISTICS_HISTOGRAM_BUCKET_WIDTH`` buckets, from which a
+respondent's percentile is read in constant time.
+
+``SQLiteStatisticsStore`` ('sqlite', shared by all workers): every event is a
+single transaction of atomic ``x = x + 1`` updates in a SQLite database in WAL
+mode. Score sums are stored as integer hundredths (scores are already rounded
+to 2 decimals), so averages are exact.
+"""
+import atexit
+import os
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+from config import Config
+from services.thresholds import SCORE_MAX, SCORE_MIN, THRESHOLDS, UNCLASSIFIED
+from utils import json_codec
+
+
+HISTOGRAM_WIDTH = Config.STATISTICS_HISTOGRAM_BUCKET_WIDTH
+HISTOGRAM_BUCKETS = int(round((SCORE_MAX - SCORE_MIN) / HISTOGRAM_WIDTH)) + 1
+STYLE_CLASSES = frozenset(THRESHOLDS.style_classes)
+
+
+def write_snapshot(path: str, stats: Dict[str, Any]):
+    """Atomically write a statistics snapshot (temp file + rename)"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.statistics-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(json_codec.dumps_bytes(stats))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def completion_rate(total_completions: int, total_started: int) -> float:
+    """Completed / started as a percentage, rounded to 2 decimals"""
+    if total_started > 0:
+        return round((total_completions / total_started) * 100, 2)
+    return 0
+
+
+def style_key(driver_style: str) -> str:
+    """Style class to count a driver style under"""
+    return driver_style if driver_style in STYLE_CLASSES else UNCLASSIFIED
+
+
+def merge_styles(styles: Mapping[str, int]) -> Dict[str, int]:
+    """Fold counts of unknown (e.g. free-text) styles into 'unclassified'"""
+    merged: Dict[str, int] = {}
+    for style, count in styles.items():
+        key = style_key(style)
+        merged[key] = merged.get(key, 0) + count
+    return merged
+
+
+def bucket_index(score: float) -> int:
+    """Histogram bucket of a score; bucket i is centred on SCORE_MIN + i * width"""
+    return min(max(int(round((score - SCORE_MIN) / HISTOGRAM_WIDTH)), 0), HISTOGRAM_BUCKETS - 1)
+
+
+def percentile_rank(counts: Optional[List[int]], score: float) -> Optional[float]:
+    """
+    Percentage of recorded scores below ``score`` (counting half of its own
+    bucket), or None if nothing has been recorded. Cost is bounded by the
+    number of buckets, not the number of respondents.
+    """
+    total = sum(counts) if counts else 0
+    if not total:
+        return None
+    index = bucket_index(score)
+    return round((sum(counts[:index]) + counts[index] / 2) / total * 100, 1)
+
+
+def histograms_snapshot(histograms: Mapping[str, List[int]]) -> Dict[str, Any]:
+    return {
+        'min': SCORE_MIN,
+        'width': HISTOGRAM_WIDTH,
+        'counts': {domain: list(counts) for domain, counts in histograms.items()}
+    }
+
+
+def load_histograms(stats: Dict[str, Any]) -> Dict[str, List[int]]:
+    """Histograms from a snapshot, or empty if missing or bucketed differently"""
+    histograms = stats.get('score_histograms')
+    if not histograms:
+        return {}
+    counts = histograms.get('counts', {})
+    if (histograms.get('min') != SCORE_MIN or histograms.get('width') != HISTOGRAM_WIDTH
+            or any(len(c) != HISTOGRAM_BUCKETS for c in counts.values())):
+        print("Statistics snapshot uses a different histogram bucket width; histograms start empty")
+        return {}
+    return {domain: list(c) for domain, c in counts.items()}
+
+
+def build_snapshot(total_started: int, total_completions: int,
+                   score_totals: Mapping[str, Tuple[float, int]],
+                   histograms: Mapping[str, List[int]],
+                   driver_styles: Mapping[str, int],
+                   last_updated: Optional[str]) -> Dict[str, Any]:
+    """
+    Statistics in the statistics.json format
+
+    Args:
+        score_totals: domain -> (sum of scores, number of scores)
+    """
+    return {
+        'total_completions': total_completions,
+        'total_started': total_started,
+        'completion_rate': completion_rate(total_completions, total_started),
+        'average_scores': {
+            domain: round(total / count, 2) for domain, (total, count) in score_totals.items() if count
+        },
+        'score_totals': {
+            domain: {'sum': total, 'count': count} for domain, (total, count) in score_totals.items()
+        },
+        'score_histograms': histograms_snapshot(histograms),
+        'driver_styles': dict(driver_styles),
+        'last_updated': last_updated
+    }
+
+
+class StatisticsAggregator:
+    """Process-local statistics with periodic snapshots"""
+
+    def __init__(self, path: str, flush_every: int, flush_interval: float):
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = 0
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+        self.total_started = 0
+        self.total_completions = 0
+        self.score_sums: Dict[str, float] = {}
+        self.score_counts: Dict[str, int] = {}
+        self.score_histograms: Dict[str, List[int]] = {}
+        self.driver_styles: Dict[str, int] = {}
+        self.last_updated: Optional[str] = None
+
+        self._recover()
+
+    def _recover(self):
+        """Resume from the last snapshot, if any"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            stats = json_codec.loads(f.read())
+
+        self.total_started = stats.get('total_started', 0)
+        self.total_completions = stats.get('total_completions', 0)
+        self.driver_styles = merge_styles(stats.get('driver_styles', {}))
+        self.score_histograms = load_histograms(stats)
+        self.last_updated = stats.get('last_updated')
+
+        totals = stats.get('score_totals')
+        if totals is not None:
+            for domain, total in totals.items():
+                self.score_sums[domain] = total['sum']
+                self.score_counts[domain] = total['count']
+        else:
+            # Older snapshots only kept rounded running averages
+            for domain, avg in stats.get('average_scores', {}).items():
+                self.score_sums[domain] = avg * self.total_completions
+                self.score_counts[domain] = self.total_completions
+
+    def increment_started(self):
+        """Count a newly started questionnaire"""
+        with self._lock:
+            self.total_started += 1
+            self.last_updated = datetime.now().isoformat()
+            self._pending += 1
+            due = self._pending >= self.flush_every
+        self._after_event(due)
+
+    def record_completion(self, scores: Dict[str, float], driver_style: str):
+        """Count a completed questionnaire with its domain scores and driver style class"""
+        style = style_key(driver_style)
+        with self._lock:
+            self.total_completions += 1
+            for domain, score in scores.items():
+                self.score_sums[domain] = self.score_sums.get(domain, 0.0) + score
+                self.score_counts[domain] = self.score_counts.get(domain, 0) + 1
+                histogram = self.score_histograms.get(domain)
+                if histogram is None:
+                    histogram = self.score_histograms[domain] = [0] * HISTOGRAM_BUCKETS
+                histogram[bucket_index(score)] += 1
+            self.driver_styles[style] = self.driver_styles.get(style, 0) + 1
+            self.last_updated = datetime.now().isoformat()
+            self._pending += 1
+            due = self._pending >= self.flush_every
+        self._after_event(due)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current statistics in the statistics.json format"""
+        with self._lock:
+            return self._snapshot_locked()
+
+    def _snapshot_locked(self) -> Dict[str, Any]:
+        return build_snapshot(
+            self.total_started,
+            self.total_completions,
+            {domain: (self.score_sums[domain], count) for domain, count in self.score_counts.items()},
+            self.score_histograms,
+            self.driver_styles,
+            self.last_updated
+        )
+
+    def percentiles(self, scores: Dict[str, float]) -> Dict[str, Optional[float]]:
+        """Percentile rank of each domain score among recorded completions"""
+        with self._lock:
+            return {
+                domain: percentile_rank(self.score_histograms.get(domain), score)
+                for domain, score in scores.items()
+            }
+
+    def flush(self):
+        """
+        Write a snapshot to disk if anything changed since the last flush
+
+        Raises:
+            OSError: if the write fails; the changes stay pending for the next flush
+        """
+        with self._flush_lock:
+            with self._lock:
+                flushed = self._pending
+                if not flushed:
+                    return
+                stats = self._snapshot_locked()
+            write_snapshot(self.path, stats)
+            with self._lock:
+                # Events recorded during the write stay pending
+                self._pending -= flushed
+
+    def close(self):
+        """Stop the background flusher and write a final snapshot"""
+        self._stop.set()
+        self.flush()
+
+    def _after_event(self, due: bool):
+        if due:
+            # The event is already counted in memory; a failed write is retried later
+            # instead of failing the request
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Statistics flush failed: {str(e)}")
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name='statistics-flush', daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Statistics flush failed: {str(e)}")
+
+
+class SQLiteStatisticsStore:
+    """Statistics shared across worker processes through SQLite (WAL mode)"""
+
+    def __init__(self, path: str, snapshot_path: str):
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS domain_scores ('
+                ' domain TEXT PRIMARY KEY,'
+                ' sum_centi INTEGER NOT NULL,'
+                ' count INTEGER NOT NULL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS score_histogram ('
+                ' domain TEXT NOT NULL,'
+                ' bucket INTEGER NOT NULL,'
+                ' count INTEGER NOT NULL,'
+                ' PRIMARY KEY (domain, bucket))'
+            )
+            conn.execute('CREATE TABLE IF NOT EXISTS driver_styles (style TEXT PRIMARY KEY, count INTEGER NOT NULL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            seeded = conn.execute("SELECT value FROM meta WHERE key = 'seeded'").fetchone()
+            if seeded is None:
+                self._seed(conn)
+            self._migrate(conn)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _seed(self, conn: sqlite3.Connection):
+        """Import the existing statistics.json snapshot into a new database"""
+        previous = StatisticsAggregator(self.snapshot_path, 1, 0)
+        conn.executemany(
+            'INSERT INTO counters (name, value) VALUES (?, ?)',
+            [('total_started', previous.total_started),
+             ('total_completions', previous.total_completions)]
+        )
+        conn.executemany(
+            'INSERT INTO domain_scores (domain, sum_centi, count) VALUES (?, ?, ?)',
+            [(domain, round(previous.score_sums[domain] * 100), count)
+             for domain, count in previous.score_counts.items()]
+        )
+        conn.executemany(
+            'INSERT INTO score_histogram (domain, bucket, count) VALUES (?, ?, ?)',
+            [(domain, bucket, count)
+             for domain, counts in previous.score_histograms.items()
+             for bucket, count in enumerate(counts) if count]
+        )
+        conn.executemany(
+            'INSERT INTO driver_styles (style, count) VALUES (?, ?)',
+            list(previous.driver_styles.items())
+        )
+        conn.execute("INSERT INTO meta (key, value) VALUES ('histogram_width', ?)", (repr(HISTOGRAM_WIDTH),))
+        conn.execute("INSERT INTO meta (key, value) VALUES ('last_updated', ?)", (previous.last_updated,))
+        conn.execute("INSERT INTO meta (key, value) VALUES ('seeded', '1')")
+
+    def _migrate(self, conn: sqlite3.Connection):
+        """Fold free-text driver styles into classes; reset histograms if the bucket width changed"""
+        styles = conn.execute('SELECT style, count FROM driver_styles').fetchall()
+        if any(style not in STYLE_CLASSES for style, _ in styles):
+            conn.execute('DELETE FROM driver_styles')
+            conn.executemany(
+                'INSERT INTO driver_styles (style, count) VALUES (?, ?)',
+                list(merge_styles(dict(styles)).items())
+            )
+
+        width = conn.execute("SELECT value FROM meta WHERE key = 'histogram_width'").fetchone()
+        if width is None or width[0] != repr(HISTOGRAM_WIDTH):
+            if width is not None:
+                print("Statistics histogram bucket width changed; histograms start empty")
+            conn.execute('DELETE FROM score_histogram')
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('histogram_width', ?)",
+                (repr(HISTOGRAM_WIDTH),)
+            )
+
+    def _touch(self, conn: sqlite3.Connection):
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('last_updated', ?)",
+            (datetime.now().isoformat(),)
+        )
+
+    def increment_started(self):
+        """Count a newly started questionnaire"""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute("UPDATE counters SET value = value + 1 WHERE name = 'total_started'")
+            self._touch(conn)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def record_completion(self, scores: Dict[str, float], driver_style: str):
+        """Count a completed questionnaire with its domain scores and driver style class"""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute("UPDATE counters SET value = value + 1 WHERE name = 'total_completions'")
+            conn.executemany(
+                'INSERT INTO domain_scores (domain, sum_centi, count) VALUES (?, ?, 1) '
+                'ON CONFLICT (domain) DO UPDATE SET '
+                ' sum_centi = sum_centi + excluded.sum_centi, count = count + 1',
+                [(domain, round(score * 100)) for domain, score in scores.items()]
+            )
+            conn.executemany(
+                'INSERT INTO score_histogram (domain, bucket, count) VALUES (?, ?, 1) '
+                'ON CONFLICT (domain, bucket) DO UPDATE SET count = count + 1',
+                [(domain, bucket_index(score)) for domain, score in scores.items()]
+            )
+            conn.execute(
+                'INSERT INTO driver_styles (style, count) VALUES (?, 1) '
+                'ON CONFLICT (style) DO UPDATE SET count = count + 1',
+                (style_key(driver_style),)
+            )
+            self._touch(conn)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current statistics in the statistics.json format"""
+        conn = self._conn()
+        # One read transaction so all tables come from the same point in time
+        conn.execute('BEGIN')
+        try:
+            counters = dict(conn.execute('SELECT name, value FROM counters'))
+            domains = conn.execute('SELECT domain, sum_centi, count FROM domain_scores').fetchall()
+            histograms = self._histograms(conn)
+            styles = dict(conn.execute('SELECT style, count FROM driver_styles'))
+            last_updated = conn.execute("SELECT value FROM meta WHERE key = 'last_updated'").fetchone()
+        finally:
+            conn.execute('COMMIT')
+
+        return build_snapshot(
+            counters.get('total_started', 0),
+            counters.get('total_completions', 0),
+            {domain: (sum_centi / 100, count) for domain, sum_centi, count in domains},
+            histograms,
+            styles,
+            last_updated[0] if last_updated else None
+        )
+
+    @staticmethod
+    def _histograms(conn: sqlite3.Connection) -> Dict[str, List[int]]:
+        histograms: Dict[str, List[int]] = {}
+        for domain, bucket, count in conn.execute('SELECT domain, bucket, count FROM score_histogram'):
+            counts = histograms.get(domain)
+            if counts is None:
+                counts = histograms[domain] = [0] * HISTOGRAM_BUCKETS
+            if 0 <= bucket < HISTOGRAM_BUCKETS:
+                counts[bucket] = count
+        return histograms
+
+    def percentiles(self, scores: Dict[str, float]) -> Dict[str, Optional[float]]:
+        """Percentile rank of each domain score among recorded completions"""
+        histograms = self._histograms(self._conn())
+        return {domain: percentile_rank(histograms.get(domain), score) for domain, score in scores.items()}
+
+    def flush(self):
+        """Export the current statistics to statistics.json for offline readers"""
+        write_snapshot(self.snapshot_path, self.snapshot())
+
+    def close(self):
+        self.flush()
+
+
+StatisticsBackend = Union[StatisticsAggregator, SQLiteStatisticsStore]
+
+_backend: Optional[StatisticsBackend] = None
+_backend_lock = threading.Lock()
+
+
+def create_statistics_backend() -> StatisticsBackend:
+    """Build the statistics backend selected by Config.STATISTICS_BACKEND"""
+    if Config.STATISTICS_BACKEND == 'sqlite':
+        return SQLiteStatisticsStore(Config.STATISTICS_DB_PATH, Config.STATISTICS_PATH)
+    if Config.STATISTICS_BACKEND == 'memory':
+        return StatisticsAggregator(
+            Config.STATISTICS_PATH,
+            Config.STATISTICS_FLUSH_EVERY,
+            Config.STATISTICS_FLUSH_INTERVAL
+        )
+    raise ValueError(f"Unknown STATISTICS_BACKEND: {Config.STATISTICS_BACKEND}")
+
+
+def get_statistics_backend() -> StatisticsBackend:
+    """Return the process-wide statistics backend, creating it on first use"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_statistics_backend()
+                atexit.register(_backend.close)
+    return _backend
+
+
+def close_statistics_backend():
+    """Flush and close the process-wide statistics backend, if it was created"""
+    global _backend
+    with _backend_lock:
+        if _backend is not None:
+            atexit.unregister(_backend.close)
+            _backend.close()
+            _backend = None
@@ -0,0 +1,171 @@
+"""
+Request payload validation
+
+Rules are compiled once instead of being re-derived per request:
+``AnswerSchema`` holds the frozenset of question IDs, the expected answer
+count and the allowed values of a questionnaire version, and
+``REGISTRATION_FIELDS`` the registration field rules. Each check is a single
+pass over the payload and stops at the first problem, so malformed requests
+are rejected before they reach the session store, scoring or the LLM.
+
+Bodies larger than ``Config.MAX_REQUEST_BYTES`` never get here: Flask's
+``MAX_CONTENT_LENGTH`` rejects them with 413 before they are read.
+"""
+import re
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional
+from flask import request
+from utils.questionnaire_loader import CompiledQuestionnaire
+
+
+SESSION_ID_MAX_LENGTH = 64
+_INT_ONLY = {int}
+
+
+class ValidationError(Exception):
+    """Invalid request payload; the message is returned to the client"""
+
+
+def json_body() -> Dict[str, Any]:
+    """
+    The request's JSON object
+
+    Raises:
+        ValidationError: if the body is not valid JSON or not an object
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise ValidationError('Request body must be a JSON object')
+    return data
+
+
+def session_id(data: Dict[str, Any]) -> str:
+    """
+    The payload's session ID
+
+    Raises:
+        ValidationError: if it is missing or not a plausible ID string
+    """
+    value = data.get('session_id')
+    if not value or not isinstance(value, str) or len(value) > SESSION_ID_MAX_LENGTH:
+        raise ValidationError('Invalid session ID')
+    return value
+
+
+def optional_int(data: Dict[str, Any], field: str, minimum: int = 0,
+                 maximum: Optional[int] = None) -> Optional[int]:
+    """An optional integer field within [minimum, maximum]"""
+    value = data.get(field)
+    if value is None:
+        return None
+    if type(value) is not int or value < minimum or (maximum is not None and value > maximum):
+        bounds = f"{minimum}-{maximum}" if maximum is not None else f">= {minimum}"
+        raise ValidationError(f"{field} must be an integer ({bounds})")
+    return value
+
+
+class AnswerSchema:
+    """Compiled answer rules for one questionnaire version"""
+
+    _cache: Dict[str, 'AnswerSchema'] = {}
+
+    def __init__(self, question_ids, values):
+        self.question_ids: FrozenSet[str] = frozenset(question_ids)
+        self.expected = len(self.question_ids)
+        self.values: FrozenSet[int] = frozenset(values)
+
+    @classmethod
+    def for_questionnaire(cls, questionnaire: CompiledQuestionnaire) -> 'AnswerSchema':
+        """Return the cached schema for a compiled questionnaire version"""
+        schema = cls._cache.get(questionnaire.content_hash)
+        if schema is None:
+            values = [option['value'] for option in questionnaire.answers] or range(1, 5)
+            schema = cls(questionnaire.question_ids, values)
+            cls._cache = {questionnaire.content_hash: schema}
+        return schema
+
+    @classmethod
+    def from_sections(cls, sections: List[Dict[str, Any]], values=range(1, 5)) -> 'AnswerSchema':
+        """Build an uncached schema from raw questionnaire sections"""
+        return cls((question['id'] for section in sections for question in section['questions']), values)
+
+    def _check_value(self, q_id: Any, value: Any, allow_null: bool) -> Optional[str]:
+        if q_id not in self.question_ids:
+            return f"Unknown question ID: {q_id}"
+        if value is None and allow_null:
+            return None
+        # bool is an int subclass, so compare the exact type
+        if type(value) is not int or value not in self.values:
+            return f"Invalid answer value for question {q_id}: {value}"
+        return None
+
+    def check_complete(self, answers: Any) -> Optional[str]:
+        """
+        Error message for a submission, or None if every question has exactly
+        one valid answer
+        """
+        if not isinstance(answers, dict):
+            return 'answers must be an object'
+        # Fast path for a valid submission: set operations that run in C.
+        # bool and float compare equal to ints, so the value types are checked
+        # too, first, since issuperset would raise on unhashable dicts or lists.
+        values = answers.values()
+        if (answers.keys() == self.question_ids and set(map(type, values)) == _INT_ONLY
+                and self.values.issuperset(values)):
+            return None
+        # Otherwise find the first problem for the error message
+        for q_id, value in answers.items():
+            error = self._check_value(q_id, value, False)
+            if error:
+                return error
+        # Every key is a distinct known ID, so the count alone shows completeness
+        if len(answers) != self.expected:
+            return f"Only {len(answers)} of {self.expected} questions answered"
+        return None
+
+    def check_partial(self, answers: Any, allow_null: bool = False, field: str = 'answers') -> Optional[str]:
+        """Error message for saved progress (any subset of questions), or None"""
+        if not isinstance(answers, dict):
+            return f'{field} must be an object'
+        for q_id, value in answers.items():
+            error = self._check_value(q_id, value, allow_null)
+            if error:
+                return error
+        return None
+
+
+class FieldRule(NamedTuple):
+    """A required string field"""
+    max_length: int
+    pattern: Optional[re.Pattern] = None
+
+
+REGISTRATION_FIELDS = {
+    'full_name': FieldRule(200),
+    'email': FieldRule(254, re.compile(r'[^\s@]+@[^\s@]+\.[^\s@]+')),
+    'gender': FieldRule(50),
+    'age_group': FieldRule(20),
+}
+
+
+def registration(data: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Validated registration fields, trimmed; unknown fields are dropped
+
+    Raises:
+        ValidationError: for a missing, empty, too long or malformed field
+    """
+    user = {}
+    for field, rule in REGISTRATION_FIELDS.items():
+        value = data.get(field)
+        if isinstance(value, str):
+            value = value.strip()
+        if not value:
+            raise ValidationError(f'Missing required field: {field}')
+        if not isinstance(value, str):
+            raise ValidationError(f'{field} must be a string')
+        if len(value) > rule.max_length:
+            raise ValidationError(f'{field} is too long (max {rule.max_length} characters)')
+        if rule.pattern is not None and not rule.pattern.fullmatch(value):
+            raise ValidationError(f'Invalid {field}')
+        user[field] = value
+    return user
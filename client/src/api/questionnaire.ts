@@ -3,18 +3,37 @@
  */
 
 import type {
+  AnalysisResponse,
+  LLMAnalysis,
   QuestionnaireResponse,
   RegisterPayload,
   RegisterResponse,
+  SaveProgressDeltaPayload,
   SaveProgressPayload,
+  SaveProgressResponse,
+  SubmitAcceptedResponse,
   SubmitPayload,
   SubmitResponse,
 } from './types'
 
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:5001'
+const SUBMIT_ATTEMPTS = 4
+const ANALYSIS_WAIT_MS = 90_000
+
+// Shown when no analysis (not even the server's fallback) arrives in time
+const FALLBACK_ANALYSIS: LLMAnalysis = {
+  driving_style:
+    'Your personalized analysis is not available right now. Your domain scores above show where you are strongest and where to focus.',
+  recommended_course: 'Driver Improvement Course - Focus on the domains with your lowest scores.',
+}
 
 class QuestionnaireAPI {
   private baseUrl: string
+  private syncedProgress: {
+    sessionId: string
+    answers: Record<string, number>
+    version: number
+  } | null = null
 
   constructor(baseUrl: string = API_BASE_URL) {
     this.baseUrl = baseUrl
@@ -59,20 +78,60 @@ class QuestionnaireAPI {
 
   /**
    * Save progress for later
+   *
+   * After the first full save only the changed answers are sent, tagged with
+   * the last version the server acknowledged. If the server reports that the
+   * version is stale, fall back to a full-map save to resync.
    */
   async saveProgress(data: SaveProgressPayload): Promise<void> {
-    const response = await fetch(`${this.baseUrl}/api/save-progress`, {
+    const synced = this.syncedProgress
+    if (synced && synced.sessionId === data.session_id) {
+      const delta: Record<string, number | null> = {}
+      for (const [id, value] of Object.entries(data.answers)) {
+        if (synced.answers[id] !== value) delta[id] = value
+      }
+      for (const id of Object.keys(synced.answers)) {
+        if (!(id in data.answers)) delta[id] = null
+      }
+
+      const response = await this.postProgress({
+        session_id: data.session_id,
+        answers_delta: delta,
+        version: synced.version,
+        current_question_index: data.current_question_index,
+      })
+      if (response.status !== 409) {
+        await this.recordSave(response, data)
+        return
+      }
+    }
+
+    await this.recordSave(await this.postProgress(data), data)
+  }
+
+  private postProgress(body: SaveProgressPayload | SaveProgressDeltaPayload): Promise<Response> {
+    return fetch(`${this.baseUrl}/api/save-progress`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
       },
-      body: JSON.stringify(data),
+      body: JSON.stringify(body),
     })
+  }
 
+  private async recordSave(response: Response, data: SaveProgressPayload): Promise<void> {
     if (!response.ok) {
+      this.syncedProgress = null
       const error = await response.json()
       throw new Error(error.error || 'Failed to save progress')
     }
+
+    const result: SaveProgressResponse = await response.json()
+    this.syncedProgress = {
+      sessionId: data.session_id,
+      answers: { ...data.answers },
+      version: result.version,
+    }
   }
 
   /**
@@ -83,6 +142,7 @@ class QuestionnaireAPI {
     answers: Record<string, number>
     current_question_index: number
     last_saved?: string
+    version: number
   }> {
     const response = await fetch(`${this.baseUrl}/api/load-progress/${sessionId}`)
 
@@ -96,22 +156,76 @@ class QuestionnaireAPI {
 
   /**
    * Submit completed questionnaire
+   *
+   * The backend returns the scores immediately and runs the LLM analysis in
+   * the background; long-poll for it so callers still get a full result.
    */
   async submit(data: SubmitPayload): Promise<SubmitResponse> {
-    const response = await fetch(`${this.baseUrl}/api/submit`, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify(data),
-    })
+    const response = await this.postSubmit(data)
 
     if (!response.ok) {
       const error = await response.json()
       throw new Error(error.error || 'Failed to submit questionnaire')
     }
 
-    return response.json()
+    const submitted: SubmitAcceptedResponse = await response.json()
+    const analysis = await this.waitForAnalysis(submitted.analysis_id)
+
+    return {
+      user: submitted.user,
+      scores: submitted.scores,
+      llm_analysis: analysis.llm_analysis,
+      completed_at: submitted.completed_at,
+    }
+  }
+
+  /**
+   * POST the submission, retrying while it is rate limited
+   *
+   * 429 (rate limited) carries Retry-After; wait that long and try again a
+   * few times before giving up.
+   */
+  private async postSubmit(data: SubmitPayload): Promise<Response> {
+    for (let attempt = 1; ; attempt++) {
+      const response = await fetch(`${this.baseUrl}/api/submit`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(data),
+      })
+      if (response.status !== 429 || attempt >= SUBMIT_ATTEMPTS) {
+        return response
+      }
+      const retryAfter = Number(response.headers.get('Retry-After')) || 1
+      await new Promise((resolve) => setTimeout(resolve, retryAfter * 1000))
+    }
+  }
+
+  /**
+   * Long-poll until the background analysis for a submission is done
+   *
+   * A failed analysis comes with the server's rule-based fallback. If the
+   * analysis is still pending after ANALYSIS_WAIT_MS, stop polling and show a
+   * generic fallback instead of waiting forever.
+   */
+  async waitForAnalysis(analysisId: string): Promise<AnalysisResponse & { llm_analysis: LLMAnalysis }> {
+    const deadline = Date.now() + ANALYSIS_WAIT_MS
+    while (Date.now() < deadline) {
+      const wait = Math.max(1, Math.min(25, Math.ceil((deadline - Date.now()) / 1000)))
+      const response = await fetch(`${this.baseUrl}/api/analysis/${analysisId}?wait=${wait}`)
+
+      if (!response.ok) {
+        const error = await response.json()
+        throw new Error(error.error || 'Failed to load analysis')
+      }
+
+      const analysis: AnalysisResponse = await response.json()
+      if (analysis.status !== 'pending') {
+        return { ...analysis, llm_analysis: analysis.llm_analysis || FALLBACK_ANALYSIS }
+      }
+    }
+    return { analysis_id: analysisId, status: 'failed', llm_analysis: FALLBACK_ANALYSIS }
   }
 
   /**
@@ -39,6 +39,19 @@ export interface SaveProgressPayload {
   current_question_index: number
 }
 
+export interface SaveProgressDeltaPayload {
+  session_id: string
+  answers_delta: Record<string, number | null>
+  version: number
+  current_question_index: number
+}
+
+export interface SaveProgressResponse {
+  message: string
+  saved_at: string
+  version: number
+}
+
 export interface SubmitPayload {
   session_id: string
   answers: Record<string, number>
@@ -56,12 +69,30 @@ export interface RecommendedCourseObject {
   description: string
 }
 
+export interface LLMAnalysis {
+  driving_style: string
+  recommended_course: string | RecommendedCourseObject
+}
+
 export interface SubmitResponse {
   user: RegisterPayload
   scores: Record<string, DomainScore>
-  llm_analysis: {
-    driving_style: string
-    recommended_course: string | RecommendedCourseObject
-  }
+  llm_analysis: LLMAnalysis
+  completed_at: string
+}
+
+export interface SubmitAcceptedResponse {
+  user: RegisterPayload
+  scores: Record<string, DomainScore>
+  analysis_id: string
+  analysis_status: 'pending' | 'complete'
   completed_at: string
 }
+
+export interface AnalysisResponse {
+  analysis_id: string
+  status: 'pending' | 'complete' | 'failed'
+  llm_analysis?: LLMAnalysis | null
+  result_id?: string
+  error?: string
+}